@@ -0,0 +1,52 @@
+import time
+import random
+import argparse
+from ..utils import encoding, result_cache
+from ..utils.session import ReasonerSession
+from ..utils.executor import QueryExecutor
+from .load_test import DRUGS, AES
+
+def sequential(session, queries):
+    out = []
+    for drug, aes in queries:
+        try:
+            out.append(session.query(drug, aes))
+        except ValueError as e:
+            out.append(e)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of a query loop vs the pipelined QueryExecutor.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--drugs", nargs="+", default=DRUGS)
+    parser.add_argument("--aes", nargs="+", default=AES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Distinct AE wordings per query so the embedding cache does not hide the encoding stage
+    queries = [(rng.choice(args.drugs), [f"{ae} {i}" for ae in rng.sample(args.aes, rng.randint(1, 3))])
+               for i in range(args.queries)]
+    session = ReasonerSession()
+    result_cache.result_cache = None
+    encoding.set_store(None)
+    encoding.get_model()
+
+    encoding.embedding_cache.clear()
+    start = time.perf_counter()
+    expected = sequential(session, queries)
+    base = time.perf_counter() - start
+    print(f"{'loop':<14}{len(queries) / base:>10.1f} q/s")
+    for workers in args.workers:
+        encoding.embedding_cache.clear()
+        start = time.perf_counter()
+        with QueryExecutor(session, workers=workers, max_pending=args.max_pending) as ex:
+            got = list(ex.map(queries, return_exceptions=True))
+        seconds = time.perf_counter() - start
+        same = all(type(a) is type(b) if isinstance(a, Exception) else a == b for a, b in zip(got, expected))
+        print(f"{'workers=' + str(workers):<14}{len(queries) / seconds:>10.1f} q/s  x{base / seconds:.2f}  same={same}")
+
+if __name__ == "__main__":
+    main()
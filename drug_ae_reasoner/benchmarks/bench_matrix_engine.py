@@ -0,0 +1,48 @@
+import argparse
+import time
+import numpy as np
+from ..config import RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH
+from ..data.cadec_loader import collect_cadec_ae_pairs
+from ..utils.matrix_engine import MatrixEngine
+from ..utils.path_reasoner import top_drug_to_input_ae_paths
+from ..utils.session import ReasonerSession
+
+def per_drug_scores(session, drugs, aes, n_cadec, threshold, max_hops):
+    # One query per (drug, AE) cell through the path search, kept as the baseline
+    oae_inputs = [session.build_input_ae_oae_list([ae], 5, threshold) for ae in aes]
+    scores = np.full((len(drugs), len(aes)), -np.inf)
+    for r, drug in enumerate(drugs):
+        pairs = collect_cadec_ae_pairs([drug], session.cadec_kg)
+        _, cadec_ae_oae = session.drug_context(drug[1], n_cadec, threshold, pairs)
+        for c, oae_input in enumerate(oae_inputs):
+            top = top_drug_to_input_ae_paths(drug[1], cadec_ae_oae, oae_input, session.oae_graph, 1,
+                                             max_hops, session.oae_reach)
+            if top:
+                scores[r, c] = top[0][3]
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-drug path search vs the sparse-matrix engine for drug x AE screening.")
+    parser.add_argument("--aes", nargs="+", default=["nausea", "vomiting", "headache", "dizziness", "rash", "fatigue"])
+    parser.add_argument("--n-cadec", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--max-hops", type=int, default=1)
+    args = parser.parse_args()
+
+    session = ReasonerSession(RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH)
+    start = time.perf_counter()
+    engine = MatrixEngine(session, args.n_cadec, args.threshold, args.max_hops)
+    t_build = time.perf_counter() - start
+    start = time.perf_counter()
+    got = engine.score(args.aes, 5, args.threshold)
+    t_score = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = per_drug_scores(session, engine.drugs, args.aes, args.n_cadec, args.threshold, args.max_hops)
+    t_loop = time.perf_counter() - start
+
+    print(f"{len(engine.drugs)} drugs x {len(args.aes)} AEs")
+    print(f"per-drug loop: {t_loop:.2f}s  engine build: {t_build:.2f}s  engine score: {t_score:.3f}s")
+    print(f"same: {np.array_equal(got, expected)}")
+
+if __name__ == "__main__":
+    main()
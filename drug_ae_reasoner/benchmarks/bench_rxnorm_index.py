@@ -0,0 +1,49 @@
+import argparse
+import time
+from ..config import RX_PATH
+from ..data.rxnorm_loader import load_rxnorm
+from ..data.rxnorm_index import RxNormIndex, index_dir_for, is_index_current
+
+DEFAULT_DRUGS = ["metformin", "lipitor", "atorvastatin", "ibuprofen", "diclofenac",
+                 "arthrotec", "voltaren", "simvastatin", "aspirin", "zocor", "xyz", "ol"]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+def linear_scan(drug, mapping):
+    norm = drug.lower()
+    return {c for c, names in mapping.items() if any(norm in nm for nm in names)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the RxNorm trigram index against the linear name scan.")
+    parser.add_argument("--rx-dir", default=RX_PATH, help="Folder containing RXNCONSO.RRF")
+    parser.add_argument("--drugs", nargs="+", default=DEFAULT_DRUGS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    mapping, t_load = timed(load_rxnorm, args.rx_dir)
+    print(f"load_rxnorm: {t_load:.2f}s ({len(mapping)} CUIs)")
+
+    index_dir = index_dir_for(args.rx_dir)
+    if not is_index_current(index_dir, args.rx_dir):
+        index, t_build = timed(RxNormIndex.from_rrf, args.rx_dir)
+        index.save(index_dir, args.rx_dir)
+        print(f"index build: {t_build:.2f}s")
+    index, t_open = timed(RxNormIndex.load, index_dir)
+    print(f"index open (mmap): {t_open * 1000:.2f}ms")
+
+    print(f"\n{'drug':<16}{'cuis':>8}{'scan ms':>12}{'index ms':>12}{'speedup':>10}  same")
+    for drug in args.drugs:
+        scan_t = idx_t = float("inf")
+        for _ in range(args.repeat):
+            expected, t = timed(linear_scan, drug, mapping)
+            scan_t = min(scan_t, t)
+            got, t = timed(index.lookup, drug)
+            idx_t = min(idx_t, t)
+        speedup = scan_t / idx_t if idx_t > 0 else float("inf")
+        print(f"{drug:<16}{len(expected):>8}{scan_t * 1000:>12.2f}{idx_t * 1000:>12.3f}{speedup:>9.0f}x  {got == expected}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import random
+import time
+import numpy as np
+from ..config import OAE_INDEX_PATH, OAE_LABEL_MAP_PATH
+from ..utils.encoding import encode_batch, encode_text
+from ..utils.similarity_search import load_oae_index, search_cadec_ae_oae_mapping
+
+def per_label_mapping(ae_list, index, oae_labels, n_cadec, threshold):
+    # The former one-query-per-label loop, kept as the baseline
+    mapping = {}
+    for ae_label in ae_list:
+        q = np.array([encode_text(ae_label).astype('float32')])
+        D, I = index.search(q, n_cadec)
+        sims = 1.0 - D[0] / 2.0
+        mapping[ae_label] = [(oae_labels[idx], float(sim)) for sim, idx in zip(sims, I[0]) if sim >= threshold]
+    return mapping
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query latency of per-label vs batched FAISS AE->OAE mapping.")
+    parser.add_argument("--index", default=OAE_INDEX_PATH)
+    parser.add_argument("--labels", default=OAE_LABEL_MAP_PATH)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--n-cadec", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    index, oae_labels = load_oae_index(args.index, args.labels)
+    rng = random.Random(0)
+    pool = list(oae_labels)
+    rng.shuffle(pool)
+    queries = (pool * (max(args.sizes) // max(len(pool), 1) + 1))[:max(args.sizes)]
+    queries = [f"{q} {i}" if i >= len(pool) else q for i, q in enumerate(queries)]
+    # Encode once up front so both variants measure search cost, not SapBERT
+    encode_batch(queries)
+
+    print(f"{'n_aes':>8}{'loop ms':>12}{'batch ms':>12}{'loop us/q':>12}{'batch us/q':>12}  same")
+    for n in args.sizes:
+        ae_list = queries[:n]
+        expected, t_loop = best_of(args.repeat, per_label_mapping, ae_list, index, oae_labels, args.n_cadec, args.threshold)
+        got, t_batch = best_of(args.repeat, search_cadec_ae_oae_mapping, ae_list, index, oae_labels, args.n_cadec, args.threshold)
+        print(f"{n:>8}{t_loop * 1e3:>12.2f}{t_batch * 1e3:>12.2f}{t_loop * 1e6 / n:>12.1f}{t_batch * 1e6 / n:>12.1f}  {got == expected}")
+
+if __name__ == "__main__":
+    main()
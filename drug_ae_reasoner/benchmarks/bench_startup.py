@@ -0,0 +1,48 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["faiss", "torch", "sentence_transformers", "networkx", "rdflib"]
+
+TARGETS = {
+    "import drug_ae_reasoner": "import drug_ae_reasoner",
+    "import main": "import drug_ae_reasoner.main",
+    "import path_reasoner": "import drug_ae_reasoner.utils.path_reasoner",
+    "import session": "import drug_ae_reasoner.utils.session",
+    "import encoding": "import drug_ae_reasoner.utils.encoding",
+}
+
+PROBE = "import sys, json; {stmt}; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+
+def time_command(cmd, repeat):
+    times = []
+    out = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        out = proc.stdout
+    return times, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and CLI startup cost of drug_ae_reasoner.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = time_command([sys.executable, "-c", "pass"], args.repeat)
+    print(f"{'target':<26}{'min ms':>10}{'median ms':>12}  heavy modules loaded")
+    print(f"{'python -c pass':<26}{min(baseline) * 1e3:>10.1f}{statistics.median(baseline) * 1e3:>12.1f}")
+
+    for name, stmt in TARGETS.items():
+        times, out = time_command([sys.executable, "-c", PROBE.format(stmt=stmt, heavy=HEAVY_MODULES)], args.repeat)
+        loaded = json.loads(out.strip().splitlines()[-1]) if out.strip() else ["<import failed>"]
+        print(f"{name:<26}{min(times) * 1e3:>10.1f}{statistics.median(times) * 1e3:>12.1f}  {', '.join(loaded) or '-'}")
+
+    times, _ = time_command([sys.executable, "-m", "drug_ae_reasoner.main", "--help"], args.repeat)
+    print(f"{'drug_ae_reasoner --help':<26}{min(times) * 1e3:>10.1f}{statistics.median(times) * 1e3:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import random
+import time
+from ..config import OAE_GRAPH_PATH
+from ..data.csr_graph import load_graph
+from ..utils.path_reasoner import rank_drug_ae_paths, search_drug_to_input_ae_paths, top_drug_to_input_ae_paths
+
+def exhaustive(cadec_ae_oae, oae_input, G, n_paths, max_hops):
+    # Materialize every connected path, then sort: the former ranking, kept as the baseline
+    raw_paths = search_drug_to_input_ae_paths("drug", cadec_ae_oae, oae_input, G, max_hops)
+    return rank_drug_ae_paths(raw_paths, cadec_ae_oae, oae_input, n_paths)
+
+def best_first(cadec_ae_oae, oae_input, G, n_paths, max_hops):
+    return top_drug_to_input_ae_paths("drug", cadec_ae_oae, oae_input, G, n_paths, max_hops)
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive vs best-first top-k path ranking on random candidate lists.")
+    parser.add_argument("--graph", default=OAE_GRAPH_PATH)
+    parser.add_argument("--n-cadec-aes", type=int, default=50, help="CADEC AEs per query")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="OAE candidates per AE (n_cadec = n_input)")
+    parser.add_argument("--n-input-aes", type=int, default=5)
+    parser.add_argument("--n-paths", type=int, default=5)
+    parser.add_argument("--max-hops", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    G = load_graph(args.graph)
+    nodes = list(G.nodes())
+    rng = random.Random(0)
+    print(f"{'n':>6}{'hops':>6}{'full ms':>12}{'top-k ms':>12}  same")
+    for n in args.sizes:
+        cadec_ae_oae = {f"ae{a}": sorted(((rng.choice(nodes), rng.uniform(0.7, 1.0)) for _ in range(n)),
+                                         key=lambda x: -x[1])
+                        for a in range(args.n_cadec_aes)}
+        oae_input = [(f"input{a}", rng.choice(nodes), rng.uniform(0.7, 1.0))
+                     for a in range(args.n_input_aes) for _ in range(n)]
+        for hops in args.max_hops:
+            expected, t_full = best_of(args.repeat, exhaustive, cadec_ae_oae, oae_input, G, args.n_paths, hops)
+            got, t_topk = best_of(args.repeat, best_first, cadec_ae_oae, oae_input, G, args.n_paths, hops)
+            print(f"{n:>6}{hops:>6}{t_full * 1e3:>12.2f}{t_topk * 1e3:>12.2f}  {got == expected}")
+
+if __name__ == "__main__":
+    main()
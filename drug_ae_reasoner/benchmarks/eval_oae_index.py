@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from ..config import OAE_INDEX_PATH
+from ..utils.oae_index import INDEX_TYPES, build_index, apply_search_params
+
+def load_vectors(oae_dir: str) -> np.ndarray:
+    """The label embeddings written by build_oae_index (memmap)."""
+    with open(os.path.join(oae_dir, "oae_vectors.json"), encoding="utf-8") as f:
+        ckpt = json.load(f)
+    return np.memmap(os.path.join(oae_dir, "oae_vectors.f32"), dtype=np.float32, mode="r",
+                     shape=(ckpt["n"], ckpt["dim"]))
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Clustered unit vectors, closer to label embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    x = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def make_queries(xb: np.ndarray, n: int, noise: float, seed: int = 0) -> np.ndarray:
+    # Perturbed database rows: each query has close but not identical neighbours
+    rng = np.random.default_rng(seed + 1)
+    q = np.asarray(xb[rng.integers(0, len(xb), n)], dtype=np.float32)
+    q = q + noise * rng.standard_normal(q.shape).astype(np.float32)
+    return np.ascontiguousarray(q / np.linalg.norm(q, axis=1, keepdims=True))
+
+def recall_at(I: np.ndarray, truth: np.ndarray, k: int) -> float:
+    return float(np.mean([len(set(a[:k]) & set(t[:k])) / k for a, t in zip(I.tolist(), truth.tolist())]))
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, ks, n_single: int = 200) -> dict:
+    k = max(ks)
+    start = time.perf_counter()
+    _, I = index.search(queries, k)
+    batch_s = time.perf_counter() - start
+    single = []
+    for q in queries[:n_single]:
+        start = time.perf_counter()
+        index.search(q[None, :], k)
+        single.append(time.perf_counter() - start)
+    return {f"recall@{kk}": recall_at(I, truth, kk) for kk in ks} | {
+        "batch_us_per_query": batch_s * 1e6 / len(queries),
+        "single_query_p50_us": float(np.percentile(single, 50)) * 1e6,
+        "single_query_p99_us": float(np.percentile(single, 99)) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and per-query latency of each OAE index type against the exact index.")
+    parser.add_argument("--oae-dir", default=os.path.dirname(OAE_INDEX_PATH), help="Where build_oae_index wrote oae_vectors.f32")
+    parser.add_argument("--synthetic", type=int, nargs=2, metavar=("N", "DIM"),
+                        help="Evaluate on N random clustered DIM-d vectors instead of the built embeddings")
+    parser.add_argument("--types", nargs="+", choices=list(INDEX_TYPES), default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to sampled rows to form queries")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64], help="IVF-PQ values to sweep")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128, 256], help="HNSW values to sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    import faiss
+    xb = synthetic_vectors(*args.synthetic, seed=args.seed) if args.synthetic else load_vectors(args.oae_dir)
+    queries = make_queries(xb, args.queries, args.noise, args.seed)
+    exact, _ = build_index("flat_ip", xb)
+    _, truth = exact.search(queries, max(args.k))
+    print(f"{len(xb)} vectors x {xb.shape[1]} dims, {len(queries)} queries")
+
+    header = f"{'type':<9}{'knob':<14}{'size MB':>9}{'build s':>9}" + "".join(f"{'R@' + str(k):>8}" for k in args.k)
+    print(header + f"{'batch us/q':>12}{'p50 us':>10}{'p99 us':>10}")
+    results = []
+    for index_type in args.types:
+        start = time.perf_counter()
+        index, meta = build_index(index_type, xb, seed=args.seed)
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+        knobs = ([{"nprobe": v} for v in args.nprobe if v <= meta["params"]["nlist"]] if index_type == "ivfpq" else
+                 [{"ef_search": v} for v in args.ef_search] if index_type == "hnsw" else [{}])
+        for knob in knobs:
+            apply_search_params(index, meta, **knob)
+            row = dict(type=index_type, params=dict(meta["params"], **knob), size_mb=size_mb, build_s=build_s,
+                       **evaluate(index, queries, truth, args.k))
+            results.append(row)
+            label = ",".join(f"{k}={v}" for k, v in knob.items()) or "-"
+            print(f"{index_type:<9}{label:<14}{size_mb:>9.2f}{build_s:>9.2f}"
+                  + "".join(f"{row[f'recall@{k}']:>8.3f}" for k in args.k)
+                  + f"{row['batch_us_per_query']:>12.1f}{row['single_query_p50_us']:>10.1f}{row['single_query_p99_us']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"n": len(xb), "dim": int(xb.shape[1]), "queries": len(queries), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+from ..config import SERVE_HOST, SERVE_PORT
+
+DRUGS = ["lipitor", "metformin", "arthrotec", "voltaren", "zocor", "crestor"]
+AES = ["nausea", "vomiting", "muscle pain", "headache", "stomach pain", "joint pain", "dizziness",
+       "fatigue", "rash", "muscle cramps", "diarrhea", "back pain"]
+
+async def request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def client(args, queries, latencies, statuses):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while queries:
+            drug, aes = queries.pop()
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, args.host, "POST", "/query",
+                                      {"drug": drug, "aes": aes, "max_hops": args.max_hops})
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run(args):
+    rng = random.Random(args.seed)
+    queries = [(rng.choice(args.drugs), rng.sample(args.aes, rng.randint(1, min(3, len(args.aes)))))
+               for _ in range(args.requests)]
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, queries, latencies, statuses) for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+
+    lat = np.array(latencies) * 1e3
+    p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+    print(f"requests={len(lat)} concurrency={args.concurrency} wall={wall:.2f}s throughput={len(lat) / wall:.1f} req/s")
+    print(f"latency ms: p50={p50:.1f} p90={p90:.1f} p99={p99:.1f} max={lat.max():.1f}  status={statuses}")
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, metrics = await request(reader, writer, args.host, "GET", "/metrics")
+    writer.close()
+    print(f"server encoder: {metrics['encoder']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test against `drug_ae_reasoner serve`.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--drugs", nargs="+", default=DRUGS)
+    parser.add_argument("--aes", nargs="+", default=AES)
+    parser.add_argument("--max-hops", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        asyncio.run(run(argparse.Namespace(**dict(vars(args), concurrency=concurrency))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import random
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+SYLLABLES = ["ba", "cor", "da", "fen", "gli", "ka", "lor", "mi", "nex", "pra", "quin", "ro", "sta", "tor",
+             "vi", "xa", "zol", "pine", "tin", "vast", "mab", "pril", "lol", "cin", "dro", "zep"]
+BODY_PARTS = ["muscle", "joint", "back", "stomach", "chest", "head", "leg", "skin", "eye", "throat", "liver", "knee"]
+SYMPTOMS = ["pain", "ache", "cramps", "swelling", "rash", "weakness", "itching", "burning", "stiffness", "bleeding"]
+STANDALONE = ["nausea", "vomiting", "dizziness", "fatigue", "insomnia", "diarrhea", "headache", "anxiety",
+              "constipation", "tremor", "fever", "palpitations"]
+DOSE_FORMS = ["10 MG Oral Tablet", "20 MG Oral Tablet", "Oral Capsule", "Injectable Solution", "Topical Cream"]
+
+# Named presets; every size scales the matching input file
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"rx_concepts": 2000, "drugs": 50, "aes": 200, "docs": 500, "oae_classes": 500},
+    "medium": {"rx_concepts": 20000, "drugs": 200, "aes": 1000, "docs": 5000, "oae_classes": 5000},
+    "large": {"rx_concepts": 200000, "drugs": 1000, "aes": 5000, "docs": 50000, "oae_classes": 50000},
+}
+
+def _words(rng: random.Random, n: int, min_syl: int = 2, max_syl: int = 4, taken=()) -> List[str]:
+    seen, out = set(taken), []
+    while len(out) < n:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(min_syl, max_syl)))
+        if word not in seen:
+            seen.add(word)
+            out.append(word)
+    return out
+
+def make_vocabulary(n_drugs: int, n_aes: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """
+    Drug names and adverse-effect phrases shared by the generated RxNorm, CADEC and
+    OAE files, so that drug lookups resolve and CADEC AEs map onto OAE classes.
+    """
+    rng = random.Random(seed)
+    drugs = _words(rng, n_drugs, 3, 4)
+    aes = list(STANDALONE) + [f"{part} {symptom}" for part in BODY_PARTS for symptom in SYMPTOMS]
+    rng.shuffle(aes)
+    if n_aes > len(aes):
+        aes += [f"{w} {rng.choice(SYMPTOMS)}" for w in _words(rng, n_aes - len(aes), 2, 3, drugs)]
+    return drugs, aes[:n_aes]
+
+def _rrf_row(cui: str, lang: str, name: str, suppress: str) -> str:
+    # RXNCONSO.RRF: 18 pipe-separated fields, STR at index 14 and SUPPRESS at index 16
+    fields = [cui, lang] + ["x"] * 12 + [name, "x", suppress, "4096"]
+    return "|".join(fields) + "|\n"
+
+def write_rxnconso(rrf_dir: str, drugs: List[str], n_concepts: int, names_per_concept: int = 4,
+                   seed: int = 0) -> str:
+    """
+    Write an RXNCONSO.RRF-format file with `n_concepts` CUIs. The first concepts carry
+    the names in `drugs` (plain, branded and dose-form variants); the rest are filler.
+    Non-English and suppressed rows are mixed in, as in a real release.
+    """
+    rng = random.Random(seed)
+    os.makedirs(rrf_dir, exist_ok=True)
+    path = os.path.join(rrf_dir, "RXNCONSO.RRF")
+    filler = iter(_words(rng, max(0, n_concepts - len(drugs)), 2, 4, drugs))
+    with open(path, "w", encoding="utf-8") as f:
+        for c in range(max(n_concepts, len(drugs))):
+            cui = f"C{c:07d}"
+            base = drugs[c] if c < len(drugs) else next(filler)
+            names = [base.upper(), f"{base} {rng.choice(DOSE_FORMS)}", f"{base} oral"][:names_per_concept]
+            names += [f"{base} {rng.choice(DOSE_FORMS)}" for _ in range(names_per_concept - len(names))]
+            for name in names:
+                f.write(_rrf_row(cui, "ENG", name, "Y" if rng.random() < 0.05 else "N"))
+            if rng.random() < 0.2:
+                f.write(_rrf_row(cui, "SPA", f"{base} oral (es)", "N"))
+    return path
+
+def write_cadec_conll(path: str, drugs: List[str], aes: List[str], n_docs: int, max_adrs: int = 4,
+                      seed: int = 0) -> str:
+    """
+    Write `n_docs` CADEC-style CoNLL documents: a `DRUG.<n>` header, then one token per
+    line with the ADR BIO tag in column 1 and the Drug tag in column 3. Some documents
+    name no drug and fall back to the header; a few repeat an ADR.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Skewed drug popularity, as in the forum posts
+    weights = [1.0 / (i + 1) for i in range(len(drugs))]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_docs):
+            drug = rng.choices(drugs, weights)[0]
+            f.write(f"{drug.upper()}.{i}\n")
+            adrs = rng.sample(aes, rng.randint(1, max_adrs))
+            if rng.random() < 0.1:
+                adrs.append(adrs[0])
+            for adr in adrs:
+                for j, word in enumerate(adr.split()):
+                    f.write(f"{word}\t{'B' if j == 0 else 'I'}-ADR\tO\tO\tO\tO\n")
+                f.write("and\tO\tO\tO\tO\tO\n")
+            if rng.random() < 0.7:
+                f.write(f"{drug}\tO\tO\tB-Drug\tO\tO\n")
+            f.write("\n")
+    return path
+
+def write_oae_owl(path: str, aes: List[str], n_classes: int, seed: int = 0) -> str:
+    """
+    Write an RDF/XML ontology of `n_classes` OAE-style classes: one per AE phrase
+    (labelled "<ae> AE") plus filler classes, arranged under "adverse event" as a
+    random DAG (each class subclasses one or two earlier classes). Classes also carry
+    restriction blank nodes, which the reader must skip.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    labels = ["adverse event"] + [f"{ae} AE" for ae in aes]
+    labels += [f"{w} AE" for w in _words(rng, max(0, n_classes - len(labels)), 2, 3, aes)]
+    labels = labels[:max(n_classes, 1)]
+    base = "http://example.org/oae"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0"?>\n'
+                f'<rdf:RDF xmlns="{base}#" xml:base="{base}" '
+                'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+                'xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#" '
+                'xmlns:owl="http://www.w3.org/2002/07/owl#">\n'
+                f'<owl:Ontology rdf:about="{base}"/>\n')
+        for i, label in enumerate(labels):
+            f.write(f'<owl:Class rdf:about="{base}/OAE_{i:07d}">\n'
+                    f'  <rdfs:label xml:lang="en">{escape(label)}</rdfs:label>\n')
+            if i:
+                # Parents come from a window of earlier classes, so depth grows with size
+                parents = {rng.randrange(max(0, i - 50), i) for _ in range(1 if rng.random() < 0.8 else 2)}
+                for p in sorted(parents):
+                    f.write(f'  <rdfs:subClassOf rdf:resource="{base}/OAE_{p:07d}"/>\n')
+            if rng.random() < 0.3:
+                f.write('  <rdfs:subClassOf><owl:Restriction>'
+                        f'<owl:onProperty rdf:resource="{base}/has_outcome"/>'
+                        f'<owl:someValuesFrom rdf:resource="{base}/OAE_0000000"/>'
+                        '</owl:Restriction></rdfs:subClassOf>\n')
+            f.write('</owl:Class>\n')
+        f.write('</rdf:RDF>\n')
+    return path
+
+def generate_dataset(root: str, sizes: Dict[str, int], seed: int = 0) -> Dict[str, object]:
+    """
+    Write RxNorm, CADEC and OAE inputs under `root` in the layout the builders expect
+    (rxnorm/, cadec/, oae/) and return their paths plus the shared vocabulary.
+    """
+    drugs, aes = make_vocabulary(sizes["drugs"], sizes["aes"], seed)
+    rx_dir = os.path.join(root, "rxnorm")
+    return {
+        "rx_dir": rx_dir,
+        "rrf_path": write_rxnconso(rx_dir, drugs, sizes["rx_concepts"], seed=seed),
+        "conll_path": write_cadec_conll(os.path.join(root, "cadec", "train.conll"), drugs, aes, sizes["docs"],
+                                        seed=seed),
+        "owl_path": write_oae_owl(os.path.join(root, "oae", "oae_merged.owl"), aes, sizes["oae_classes"], seed),
+        "drugs": drugs,
+        "aes": aes,
+    }
@@ -0,0 +1,212 @@
+import gc
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+from ...utils.profiling import max_rss_bytes
+from .generators import SCALES, generate_dataset
+
+class HashingEncoder:
+    """
+    Offline stand-in for SapBERT: hashed character-trigram counts. Deterministic and
+    cheap, and similar strings still get similar vectors, so searches return hits.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            padded = f"  {text.lower()} ".encode("utf-8")
+            for j in range(len(padded) - 2):
+                out[i, zlib.crc32(padded[j:j + 3]) % self.dim] += 1.0
+        return out
+
+def measure(fn: Callable[[], object], repeat: int):
+    """Run `fn` `repeat` times for wall time, then once more under tracemalloc for peak Python memory."""
+    times = []
+    out = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return out, times, peak
+
+def _git_commit() -> Dict[str, object]:
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit.stdout.strip(), "dirty": bool(dirty.stdout.strip())}
+
+def run_scale(scale: str, sizes: Dict[str, int], root: str, args) -> List[Dict[str, object]]:
+    from ...data.rxnorm_loader import load_rxnorm, get_input_cuis
+    from ...data.rxnorm_index import RxNormIndex, index_dir_for
+    from ...data.cadec_loader import find_cadec_drug_nodes, collect_cadec_ae_pairs
+    from ...data.builder.ingest_owl import ingest_owl
+    from ...data.builder.build_oae_index import encode_labels_to_memmap
+    from ...data.builder.normalize_cadec_kg import normalize_graph
+    from ...utils.encoding import encode_batch
+    from ...utils.similarity_search import search_cadec_ae_oae_mapping, search_input_ae_oae_list
+    from ...utils.path_reasoner import rank_drug_ae_paths, search_drug_to_input_ae_paths, top_drug_to_input_ae_paths
+    from ...utils.verbalizer import verbalize_drug_to_input_ae_paths
+    from ...utils.verbalizer_utils import CadecKGBuilder, iter_cadec_documents
+    import faiss
+
+    start = time.perf_counter()
+    data = generate_dataset(root, sizes, args.seed)
+    print(f"\n[{scale}] {sizes} generated in {time.perf_counter() - start:.1f}s")
+
+    results = []
+
+    def bench(stage: str, fn: Callable[[], object], size: Callable[[object], int] = None):
+        out, times, peak = measure(fn, args.repeat)
+        n_out = size(out) if size else len(out) if hasattr(out, "__len__") else None
+        results.append({"scale": scale, "sizes": sizes, "stage": stage, "repeat": args.repeat,
+                        "seconds_min": min(times), "seconds_median": statistics.median(times),
+                        "peak_mb": peak / 2 ** 20, "n_out": n_out})
+        print(f"  {stage:<34}{min(times) * 1e3:>12.2f} ms{statistics.median(times) * 1e3:>12.2f} ms"
+              f"{peak / 2 ** 20:>10.1f} MB  n={n_out}")
+        return out
+
+    rx_dir, drug = data["rx_dir"], data["drugs"][0]
+    index_dir = index_dir_for(rx_dir)
+    bench("rxnorm.load_rxnorm", lambda: load_rxnorm(rx_dir))
+    # No index on disk yet, so this is the RRF scan
+    bench("rxnorm.get_input_cuis[scan]", lambda: get_input_cuis(drug, rx_dir))
+    bench("rxnorm.build_index", lambda: RxNormIndex.from_rrf(rx_dir).save(index_dir, rx_dir))
+    bench("rxnorm.get_input_cuis[index]", lambda: get_input_cuis(drug, rx_dir))
+    rx_index = RxNormIndex.load(index_dir)
+
+    conll_path = data["conll_path"]
+    G_cadec = bench("cadec.build_kg", lambda: CadecKGBuilder().add_docs(iter_cadec_documents(conll_path)).to_graph())
+    bench("cadec.normalize", lambda: normalize_graph(G_cadec, rx_index))
+
+    labels, G_oae, _ = bench("oae.ingest_owl", lambda: ingest_owl(data["owl_path"]), lambda out: len(out[0]))
+    oae_dir = os.path.dirname(data["owl_path"])
+
+    def build_index():
+        vectors_path, checkpoint_path = os.path.join(oae_dir, "vectors.f32"), os.path.join(oae_dir, "vectors.json")
+        for path in (vectors_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        xb = encode_labels_to_memmap(labels, vectors_path, checkpoint_path)
+        index = faiss.IndexFlatL2(xb.shape[1])
+        index.add(np.ascontiguousarray(xb))
+        return index
+
+    index = bench("oae.build_index", build_index, lambda out: out.ntotal)
+
+    cadec_pairs = collect_cadec_ae_pairs(find_cadec_drug_nodes(rx_index.lookup(drug), G_cadec), G_cadec)
+    cadec_aes = sorted({ae for _, ae, _ in cadec_pairs})
+    rng = random.Random(args.seed)
+    # Half the inputs are AEs the drug is reported with, half are drawn from the whole vocabulary
+    input_aes = list(dict.fromkeys(rng.sample(cadec_aes, min(len(cadec_aes), args.n_input_aes // 2)) +
+                                   rng.sample(data["aes"], min(len(data["aes"]), args.n_input_aes))))[:args.n_input_aes]
+    # Embeddings are computed once up front: the search stages time FAISS, not the encoder
+    encode_batch(cadec_aes + input_aes)
+
+    cadec_ae_oae = bench("search.cadec_ae_oae_mapping", lambda: search_cadec_ae_oae_mapping(
+        cadec_aes, index, labels, args.n_cadec, args.threshold))
+    oae_input = bench("search.input_ae_oae_list", lambda: search_input_ae_oae_list(
+        input_aes, index, labels, args.n_input, args.threshold))
+
+    top = bench("paths.top_k", lambda: top_drug_to_input_ae_paths(
+        drug, cadec_ae_oae, oae_input, G_oae, args.n_paths, args.max_hops))
+    raw_paths = bench("paths.search_all", lambda: search_drug_to_input_ae_paths(
+        drug, cadec_ae_oae, oae_input, G_oae, args.max_hops))
+    bench("paths.rank", lambda: rank_drug_ae_paths(raw_paths, cadec_ae_oae, oae_input, args.n_paths))
+    bench("verbalize", lambda: verbalize_drug_to_input_ae_paths(drug, cadec_pairs, cadec_ae_oae, oae_input, top))
+    return results
+
+def compare(old: Dict[str, object], new: Dict[str, object]):
+    """Print min-time and peak-memory ratios (new / old) for every (scale, stage) present in both runs."""
+    before = {(r["scale"], r["stage"]): r for r in old["results"]}
+    print(f"\nvs {old['meta'].get('commit')}:")
+    print(f"{'scale':<8}{'stage':<34}{'old ms':>12}{'new ms':>12}{'time x':>8}{'mem x':>8}")
+    for r in new["results"]:
+        o = before.get((r["scale"], r["stage"]))
+        if o is None:
+            continue
+        t_ratio = r["seconds_min"] / o["seconds_min"] if o["seconds_min"] else float("nan")
+        m_ratio = r["peak_mb"] / o["peak_mb"] if o["peak_mb"] else float("nan")
+        print(f"{r['scale']:<8}{r['stage']:<34}{o['seconds_min'] * 1e3:>12.2f}{r['seconds_min'] * 1e3:>12.2f}"
+              f"{t_ratio:>8.2f}{m_ratio:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage on synthetic data.")
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-cadec", type=int, default=5)
+    parser.add_argument("--n-input", type=int, default=5)
+    parser.add_argument("--n-input-aes", type=int, default=6, help="Input AEs per query")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--n-paths", type=int, default=5)
+    parser.add_argument("--max-hops", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json", help="Machine-readable results (JSON)")
+    parser.add_argument("--compare", help="Results JSON from another commit to compare against")
+    parser.add_argument("--workdir", help="Keep the generated data here instead of a temporary directory")
+    parser.add_argument("--sapbert", action="store_true", help="Use the real SapBERT model instead of the offline encoder")
+    args = parser.parse_args(argv)
+
+    from ...utils import encoding
+    if args.sapbert:
+        # Time the encoder, not hits on vectors stored by earlier runs
+        encoding.set_store(None)
+    else:
+        encoding.set_model(HashingEncoder())
+
+    results = []
+    print(f"{'stage':<36}{'min':>15}{'median':>15}{'peak':>13}")
+    for scale in args.scales:
+        if args.workdir:
+            results += run_scale(scale, SCALES[scale], os.path.join(args.workdir, scale), args)
+        else:
+            with tempfile.TemporaryDirectory(prefix=f"dar_bench_{scale}_") as root:
+                results += run_scale(scale, SCALES[scale], root, args)
+        encoding.embedding_cache.clear()
+
+    import faiss
+    peak = max_rss_bytes()
+    report = {
+        "meta": dict(_git_commit(), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"), argv=sys.argv[1:],
+                     python=platform.python_version(), platform=platform.platform(), numpy=np.__version__,
+                     faiss=getattr(faiss, "__version__", None),
+                     encoder="sapbert" if args.sapbert else "hashing-256",
+                     max_rss_mb=None if peak is None else peak / 2 ** 20),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
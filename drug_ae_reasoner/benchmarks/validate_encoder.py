@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import tempfile
+import numpy as np
+from ..config import OAE_LABEL_MAP_PATH, ONNX_MODEL_DIR
+from ..utils.encoding import MODEL_DIR, _normalize_rows
+from ..utils.encoder_backends import export_onnx, load_encoder, make_tiny_bert
+
+# Used as the label set with --tiny-random when no OAE label map has been built
+SAMPLE_AES = [
+    "nausea", "vomiting", "headache", "dizziness", "fatigue", "insomnia", "rash", "pruritus", "diarrhea",
+    "constipation", "abdominal pain", "muscle pain", "joint pain", "back pain", "chest pain", "dry mouth",
+    "weight gain", "weight loss", "hair loss", "blurred vision", "anxiety", "depression", "drowsiness",
+    "palpitations", "hypertension", "hypotension", "liver injury", "elevated liver enzymes", "kidney failure",
+    "muscle weakness", "muscle cramps", "memory loss", "confusion", "tremor", "fever", "cough", "swelling",
+    "shortness of breath", "loss of appetite", "stomach upset",
+]
+
+def load_texts(path: str):
+    if path.endswith(".pkl"):
+        with open(path, "rb") as f:
+            return list(pickle.load(f))
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def timed_encode(model, texts, batch_size):
+    start = time.perf_counter()
+    vecs = _normalize_rows(model.encode(list(texts), batch_size=batch_size))
+    return vecs, time.perf_counter() - start
+
+def top_k(queries: np.ndarray, labels: np.ndarray, k: int):
+    sims = queries @ labels.T
+    idx = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+    return idx, np.take_along_axis(sims, idx, axis=1)
+
+def compare(base_q, base_labels, q, k):
+    """Cosine to the fp32 vectors, and agreement of top-k label mappings against the fp32 label matrix."""
+    cos = np.sum(base_q * q, axis=1)
+    ref_idx, ref_sim = top_k(base_q, base_labels, k)
+    idx, sim = top_k(q, base_labels, k)
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_idx.tolist(), idx.tolist())]
+    return {
+        "cosine_mean": float(cos.mean()), "cosine_min": float(cos.min()), "cosine_p1": float(np.percentile(cos, 1)),
+        "top1_agreement": float(np.mean(ref_idx[:, 0] == idx[:, 0])), f"overlap@{k}": float(np.mean(overlap)),
+        "max_sim_delta": float(np.abs(ref_sim - sim).max()),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ONNX / int8 SapBERT backends against the fp32 SentenceTransformer.")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="fp32 SentenceTransformer (the baseline)")
+    parser.add_argument("--onnx-dir", default=ONNX_MODEL_DIR, help="Output of export_sapbert_onnx")
+    parser.add_argument("--backends", nargs="+", choices=["onnx", "onnx_int8"], default=["onnx", "onnx_int8"])
+    parser.add_argument("--labels", default=OAE_LABEL_MAP_PATH, help="Label set to map onto (.pkl list or one per line)")
+    parser.add_argument("--queries", help="Query texts (one per line); default: a sample of --labels")
+    parser.add_argument("--n-queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--tiny-random", action="store_true",
+                        help="Build, export and validate a tiny randomly initialized BERT (no network, no SapBERT)")
+    parser.add_argument("--min-cosine", type=float, help="Exit 1 if any backend's minimum cosine to fp32 is below this")
+    parser.add_argument("--min-top1", type=float, help="Exit 1 if any backend's top-1 agreement is below this")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    labels = load_texts(args.labels) if os.path.exists(args.labels) else SAMPLE_AES
+    if args.tiny_random:
+        tmp = tempfile.mkdtemp(prefix="tiny_bert_")
+        args.model_dir, args.onnx_dir = os.path.join(tmp, "model"), os.path.join(tmp, "onnx")
+        texts = labels + (load_texts(args.queries) if args.queries else [])
+        make_tiny_bert(args.model_dir, texts)
+        export_onnx(args.model_dir, args.onnx_dir)
+    rng = random.Random(0)
+    queries = load_texts(args.queries) if args.queries else rng.sample(labels, min(args.n_queries, len(labels)))
+    k = min(args.k, len(labels))
+
+    base = load_encoder("torch", args.model_dir, args.onnx_dir)
+    base_labels, _ = timed_encode(base, labels, args.batch_size)
+    base_q, base_s = timed_encode(base, queries, args.batch_size)
+    print(f"{len(labels)} labels, {len(queries)} queries, k={k}")
+    print(f"{'backend':<11}{'cos mean':>10}{'cos min':>10}{'top1 agr':>10}{'overlap@' + str(k):>12}{'max dsim':>10}{'ms/text':>10}")
+    print(f"{'torch':<11}{1.0:>10.4f}{1.0:>10.4f}{1.0:>10.3f}{1.0:>12.3f}{0.0:>10.4f}{1e3 * base_s / len(queries):>10.3f}")
+
+    results = {"torch": {"ms_per_text": 1e3 * base_s / len(queries)}}
+    failed = False
+    for backend in args.backends:
+        model = load_encoder(backend, args.model_dir, args.onnx_dir)
+        q, seconds = timed_encode(model, queries, args.batch_size)
+        row = dict(compare(base_q, base_labels, q, k), ms_per_text=1e3 * seconds / len(queries))
+        results[backend] = row
+        print(f"{backend:<11}{row['cosine_mean']:>10.4f}{row['cosine_min']:>10.4f}{row['top1_agreement']:>10.3f}"
+              f"{row[f'overlap@{k}']:>12.3f}{row['max_sim_delta']:>10.4f}{row['ms_per_text']:>10.3f}")
+        failed |= args.min_cosine is not None and row["cosine_min"] < args.min_cosine
+        failed |= args.min_top1 is not None and row["top1_agreement"] < args.min_top1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"labels": len(labels), "queries": len(queries), "k": k, "results": results}, f, indent=2)
+    if failed:
+        print("Validation failed", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
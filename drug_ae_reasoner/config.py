@@ -8,3 +8,49 @@ CADEC_KG_PATH = os.path.join(PACKAGE_DIR, "data", "cadec", "cadec_normalized_kg.
 OAE_INDEX_PATH = os.path.join(PACKAGE_DIR, "data", "oae", "oae_sapbert_index.faiss")
 OAE_LABEL_MAP_PATH = os.path.join(PACKAGE_DIR, "data", "oae", "oae_labels.pkl")
 OAE_GRAPH_PATH = os.path.join(PACKAGE_DIR, "data", "oae", "oae_graph.gpickle")  # ✅ Add this line
+
+# Memory-mapped CSR copies of the two graphs (accepted anywhere a graph path is)
+CADEC_KG_CSR_PATH = os.path.join(PACKAGE_DIR, "data", "cadec", "cadec_normalized_kg.csr")
+OAE_GRAPH_CSR_PATH = os.path.join(PACKAGE_DIR, "data", "oae", "oae_graph.csr")
+
+# Precomputed top-N OAE candidates per CADEC adverse effect; queries with n_cadec <= top_n
+# and cadec_ae_threshold >= min_sim are answered from it instead of FAISS
+CADEC_OAE_MAP_PATH = os.path.join(PACKAGE_DIR, "data", "cadec", "cadec_oae_map")
+CADEC_OAE_TOP_N = 20
+CADEC_OAE_MIN_SIM = 0.5
+
+# Precomputed subClassOf reachability over the OAE graph, used for multi-hop path search
+OAE_CLOSURE_PATH = os.path.join(PACKAGE_DIR, "data", "oae", "oae_closure")
+
+# OAE FAISS index type built by build_oae_index (see utils/oae_index.INDEX_TYPES);
+# its metadata sits next to the index in OAE_INDEX_PATH + ".json"
+OAE_INDEX_TYPE = "flat_l2"
+
+# SapBERT encoding
+# "torch" (SentenceTransformer, fp32), "onnx" or "onnx_int8" (ONNX Runtime, exported by
+# data/builder/export_sapbert_onnx into ONNX_MODEL_DIR)
+ENCODER_BACKEND = "torch"
+ONNX_MODEL_DIR = os.path.join(PACKAGE_DIR, "local_models", "sapbert_onnx")
+EMBED_BATCH_SIZE = 64
+EMBED_CACHE_SIZE = 50000
+
+# Per-user cache directory for the on-disk result and embedding stores, outside the package
+# (which may be read-only or shared)
+USER_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                              "drug_ae_reasoner")
+
+EMBED_STORE_DIR = os.path.join(USER_CACHE_DIR, "embeddings")  # None disables the on-disk store
+
+# Query results (connected flag, paths, fallbacks, verbalizations) keyed by the normalized query,
+# its parameters and the artifact fingerprints; rebuilding any artifact invalidates its entries
+RESULT_CACHE_SIZE = 1024  # in-process entries; 0 disables the in-process tier
+RESULT_CACHE_DIR = os.path.join(USER_CACHE_DIR, "result_cache")  # None disables the on-disk tier
+RESULT_CACHE_MAX_BYTES = 256 * 2 ** 20
+
+# HTTP service (`drug_ae_reasoner serve`)
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8080
+ENCODE_MAX_BATCH = 256  # texts per micro-batched SapBERT call
+ENCODE_MAX_LATENCY_MS = 5.0  # longest a request waits for its micro-batch to fill
+SERVE_MAX_TOP_N = 1000  # largest n_cadec / n_input a request may ask for
+SERVE_MAX_HOPS = 4  # largest max_hops a request may ask for
@@ -1,36 +1,59 @@
 import os
 import pickle
 import random
+import argparse
+from multiprocessing import Pool
 from drug_ae_reasoner.utils.verbalizer_utils import (
-    read_cadec_documents, build_cadec_kg_from_docs,
-    dedupe_cadec, list_all_unique_drugs
+    index_cadec_documents, read_cadec_spans,
+    CadecKGBuilder, list_all_unique_drugs
 )
 
-def main():
+def build_shard(args):
+    raw_path, spans = args
+    return CadecKGBuilder().add_docs(read_cadec_spans(raw_path, spans))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split CADEC and build the verbalizer KG from the held-out documents.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes building KG shards (1 = build in this process)")
+    parser.add_argument("--shard-size", type=int, default=2000, help="Documents per KG shard")
+    args = parser.parse_args(argv)
+
     random.seed(42)
     raw_path = os.path.join("drug_ae_reasoner", "data", "cadec", "train.conll")
     out_dir = os.path.join("drug_ae_reasoner", "data", "cadec")
     os.makedirs(out_dir, exist_ok=True)
 
-    documents = read_cadec_documents(raw_path)
-    print(f"Total documents: {len(documents)}")
+    # Shuffle byte spans instead of documents: shuffle draws depend only on the length,
+    # so the split is the same as shuffling the loaded documents with this seed
+    spans = index_cadec_documents(raw_path)
+    print(f"Total documents: {len(spans)}")
 
-    random.shuffle(documents)
-    split_idx = int(0.3 * len(documents))
-    train_docs = documents[:split_idx]
-    test_docs = documents[split_idx:]
+    random.shuffle(spans)
+    split_idx = int(0.3 * len(spans))
+    train_spans = spans[:split_idx]
+    test_spans = spans[split_idx:]
 
     train_out = os.path.join(out_dir, "train_30.jsonl")
     with open(train_out, "w", encoding="utf-8") as f:
-        for doc_id, tokens in train_docs:
+        for doc_id, tokens in read_cadec_spans(raw_path, train_spans):
             f.write(f"{doc_id}\n")
             for parts in tokens:
                 f.write("\t".join(parts) + "\n")
             f.write("\n")
     print(f"Saved 30% training split to: {train_out}")
 
-    G = build_cadec_kg_from_docs(test_docs)
-    G = dedupe_cadec(G)
+    # Shards are consecutive runs of the test order, merged back in that order
+    shards = [(raw_path, test_spans[i:i + args.shard_size]) for i in range(0, len(test_spans), args.shard_size)]
+    kg = CadecKGBuilder()
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            for shard in pool.imap(build_shard, shards):
+                kg.merge(shard)
+    else:
+        for shard in shards:
+            kg.merge(build_shard(shard))
+    G = kg.to_graph()
+
     kg_out = os.path.join(out_dir, "cadec_verbalizer_kg.gpickle")
     with open(kg_out, "wb") as f:
         pickle.dump(G, f)
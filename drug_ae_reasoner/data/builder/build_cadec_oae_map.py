@@ -0,0 +1,44 @@
+import os
+import argparse
+from drug_ae_reasoner.config import CADEC_OAE_TOP_N, CADEC_OAE_MIN_SIM
+from drug_ae_reasoner.data.csr_graph import load_graph
+from drug_ae_reasoner.utils.cadec_oae_map import CadecOAEMap, source_stamp
+from drug_ae_reasoner.utils.similarity_search import load_oae_index
+
+def cadec_ae_labels(G):
+    # Same key as collect_cadec_ae_pairs uses for the per-query search
+    return sorted({data["label"].lower() for _, data in G.nodes(data=True) if data.get("type") == "adverse_effect"})
+
+def is_up_to_date(map_path, labels, index_path, label_map_path, top_n, min_sim):
+    if not os.path.isdir(map_path):
+        return False
+    existing = CadecOAEMap.load(map_path)
+    return (existing.is_current(index_path, label_map_path) and existing.top_n == top_n
+            and existing.min_sim == min_sim and all(label in existing for label in labels))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute top-N OAE candidates for every CADEC adverse effect.")
+    parser.add_argument("--top-n", type=int, default=CADEC_OAE_TOP_N, help="Candidates kept per AE (largest n_cadec served)")
+    parser.add_argument("--min-sim", type=float, default=CADEC_OAE_MIN_SIM, help="Lowest cadec_ae_threshold served")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the existing map is up to date")
+    args = parser.parse_args(argv)
+
+    cadec_dir = os.path.join("drug_ae_reasoner", "data", "cadec")
+    oae_dir = os.path.join("drug_ae_reasoner", "data", "oae")
+    kg_path = os.path.join(cadec_dir, "cadec_normalized_kg.gpickle")
+    index_path = os.path.join(oae_dir, "oae_sapbert_index.faiss")
+    label_map_path = os.path.join(oae_dir, "oae_labels.pkl")
+    map_path = os.path.join(cadec_dir, "cadec_oae_map")
+
+    labels = cadec_ae_labels(load_graph(kg_path))
+    if not args.force and is_up_to_date(map_path, labels, index_path, label_map_path, args.top_n, args.min_sim):
+        print(f"CADEC AE -> OAE map is up to date: {map_path}")
+        return
+
+    index, _ = load_oae_index(index_path, label_map_path)
+    cadec_map = CadecOAEMap.build(labels, index, args.top_n, args.min_sim, source_stamp(index_path, label_map_path))
+    cadec_map.save(map_path)
+    print(f"CADEC AE -> OAE map saved: {map_path} ({len(labels)} AE labels, top {args.top_n}, sim >= {args.min_sim})")
+
+if __name__ == "__main__":
+    main()
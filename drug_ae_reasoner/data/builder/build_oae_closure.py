@@ -0,0 +1,21 @@
+import os
+import argparse
+from drug_ae_reasoner.data.csr_graph import load_graph
+from drug_ae_reasoner.utils.reachability import ReachabilityIndex
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute OAE subClassOf reachability for multi-hop path search.")
+    parser.add_argument("--max-depth", type=int, default=None, help="Hop limit (default: full transitive closure)")
+    args = parser.parse_args(argv)
+
+    oae_dir = os.path.join("drug_ae_reasoner", "data", "oae")
+    graph_path = os.path.join(oae_dir, "oae_graph.gpickle")
+    closure_path = os.path.join(oae_dir, "oae_closure")
+
+    reach = ReachabilityIndex.build(load_graph(graph_path), args.max_depth)
+    reach.save(closure_path)
+
+    print(f"OAE closure saved: {closure_path} ({len(reach.targets)} reachable pairs)")
+
+if __name__ == "__main__":
+    main()
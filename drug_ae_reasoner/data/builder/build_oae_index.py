@@ -1,42 +1,146 @@
 import os
+import json
 import pickle
-import faiss
+import hashlib
+import argparse
 import numpy as np
-import rdflib
-from rdflib.namespace import RDFS
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
+from drug_ae_reasoner.config import EMBED_BATCH_SIZE, ENCODER_BACKEND, ONNX_MODEL_DIR, OAE_INDEX_TYPE
+from drug_ae_reasoner.utils import encoding
+from drug_ae_reasoner.utils.encoding import MODEL_NAME, encode_texts
+from drug_ae_reasoner.utils.oae_index import INDEX_TYPES, build_index, save_index
+from drug_ae_reasoner.data.builder.ingest_owl import iter_owl_triples
 
-model = SentenceTransformer("cambridgeltl/SapBERT-from-PubMedBERT-fulltext")
+def extract_labels(owl_path):
+    return sorted({str(o).strip().lower() for kind, _, o in iter_owl_triples(owl_path) if kind == "label"})
 
-def encode(text):
-    vec = model.encode([text])[0]
-    return vec / np.linalg.norm(vec)
+def load_labels(oae_dir, owl_path):
+    # Reuse the label list written by ingest_owl unless the OWL file is newer
+    label_list_path = os.path.join(oae_dir, "oae_label_list.pkl")
+    if os.path.exists(label_list_path) and os.path.getmtime(label_list_path) >= os.path.getmtime(owl_path):
+        with open(label_list_path, "rb") as f:
+            return pickle.load(f)
+    return extract_labels(owl_path)
 
-def extract_labels(owl_path):
-    g = rdflib.Graph()
-    g.parse(owl_path, format='xml')
-    return sorted({str(o).strip().lower() for s, _, o in g.triples((None, RDFS.label, None))})
+def _labels_digest(labels):
+    h = hashlib.sha256()
+    for label in labels:
+        h.update(label.encode("utf-8") + b"\n")
+    return h.hexdigest()
+
+def _read_checkpoint(checkpoint_path, expected):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        ckpt = json.load(f)
+    if any(ckpt.get(k) != v for k, v in expected.items()):
+        return None
+    return ckpt
+
+def _write_checkpoint(checkpoint_path, ckpt):
+    tmp = checkpoint_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f, indent=2)
+    os.replace(tmp, checkpoint_path)
+
+def _init_worker(threads):
+    # Load the configured backend up front, capped at this worker's share of the cores
+    if ENCODER_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    else:
+        from drug_ae_reasoner.utils.encoder_backends import OnnxEncoder
+        encoding.set_model(OnnxEncoder(ONNX_MODEL_DIR, ENCODER_BACKEND, threads), encoding.STORE_KEY)
+    encoding.get_model()
+
+def _encode_chunk(job):
+    start, labels, batch_size = job
+    return start, encode_texts(labels, batch_size)
+
+def encode_labels_to_memmap(labels, vectors_path, checkpoint_path, chunk_size=4096,
+                            batch_size=EMBED_BATCH_SIZE, workers=0):
+    """
+    Encode `labels` chunk by chunk into a float32 memmap at `vectors_path`.
+
+    After every chunk the memmap is flushed and `checkpoint_path` records how many
+    rows are done, so an interrupted build resumes at the first missing chunk.
+    Only one chunk per worker is held in memory at a time.
+    """
+    n = len(labels)
+    expected = {"model": MODEL_NAME, "backend": ENCODER_BACKEND, "n": n, "labels_sha256": _labels_digest(labels)}
+    ckpt = _read_checkpoint(checkpoint_path, expected) if os.path.exists(vectors_path) else None
+    done = ckpt["done"] if ckpt else 0
+    dim = ckpt["dim"] if ckpt else None
+    mm = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(n, dim)) if ckpt else None
+    if done:
+        print(f"Resuming from checkpoint: {done}/{n} labels already encoded")
+
+    jobs = ((start, labels[start:start + chunk_size], batch_size) for start in range(done, n, chunk_size))
+    pool = None
+    if workers > 1:
+        import multiprocessing as mp
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(threads,))
+        results = pool.imap(_encode_chunk, jobs)
+    else:
+        results = map(_encode_chunk, jobs)
+
+    try:
+        with tqdm(total=n, initial=done, desc="Encoding") as bar:
+            for start, vecs in results:
+                if mm is None:
+                    dim = int(vecs.shape[1])
+                    mm = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(n, dim))
+                mm[start:start + len(vecs)] = vecs
+                mm.flush()
+                _write_checkpoint(checkpoint_path, dict(expected, dim=dim, done=start + len(vecs)))
+                bar.update(len(vecs))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if mm is None:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(n, dim))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode OAE labels with SapBERT and build the FAISS index.")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Labels encoded between checkpoints")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="SapBERT forward-pass batch size")
+    parser.add_argument("--workers", type=int, default=0, help="Encoding processes (0 = encode in this process)")
+    parser.add_argument("--index-type", choices=list(INDEX_TYPES), default=OAE_INDEX_TYPE,
+                        help="flat_l2/flat_ip are exact; hnsw, ivfpq, sq8 and fp16 trade recall for memory and speed")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, help="HNSW build-time search depth")
+    parser.add_argument("--ef-search", type=int, help="HNSW query-time search depth (recall vs latency)")
+    parser.add_argument("--nlist", type=int, help="IVF-PQ inverted lists (default ~4*sqrt(n))")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ sub-quantizers; must divide the embedding dimension")
+    parser.add_argument("--nbits", type=int, help="IVF-PQ bits per sub-quantizer code")
+    parser.add_argument("--nprobe", type=int, help="IVF-PQ lists scanned per query (recall vs latency)")
+    args = parser.parse_args(argv)
 
-def main():
     oae_dir = os.path.join("drug_ae_reasoner", "data", "oae")
     owl_path = os.path.join(oae_dir, "oae_merged.owl")
-    labels = extract_labels(owl_path)
+    labels = load_labels(oae_dir, owl_path)
 
-    vecs = [encode(label).astype(np.float32) for label in tqdm(labels, desc="Encoding")]
-    xb = np.vstack(vecs)
+    vectors_path = os.path.join(oae_dir, "oae_vectors.f32")
+    checkpoint_path = os.path.join(oae_dir, "oae_vectors.json")
+    xb = encode_labels_to_memmap(labels, vectors_path, checkpoint_path,
+                                 args.chunk_size, args.batch_size, args.workers)
 
-    index = faiss.IndexFlatL2(xb.shape[1])
-    index.add(xb)
+    index, meta = build_index(args.index_type, xb, args.chunk_size, m=args.hnsw_m,
+                              ef_construction=args.ef_construction, ef_search=args.ef_search, nlist=args.nlist,
+                              pq_m=args.pq_m, nbits=args.nbits, nprobe=args.nprobe)
 
     index_path = os.path.join(oae_dir, "oae_sapbert_index.faiss")
     label_path = os.path.join(oae_dir, "oae_labels.pkl")
 
-    faiss.write_index(index, index_path)
+    save_index(index, dict(meta, model=MODEL_NAME, backend=ENCODER_BACKEND), index_path)
     with open(label_path, "wb") as f:
         pickle.dump(labels, f)
 
-    print(f"FAISS index saved: {index_path}")
+    print(f"FAISS index saved: {index_path} ({meta['type']}, {meta['params'] or 'exact'})")
     print(f"Label map saved: {label_path}")
 
 if __name__ == "__main__":
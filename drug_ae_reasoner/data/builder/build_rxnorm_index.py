@@ -0,0 +1,15 @@
+import os
+from drug_ae_reasoner.data.rxnorm_index import RxNormIndex, index_dir_for
+
+def main():
+    rx_dir = os.path.join("drug_ae_reasoner", "data", "rxnorm")
+    index_dir = index_dir_for(rx_dir)
+
+    index = RxNormIndex.from_rrf(rx_dir)
+    index.save(index_dir, rx_dir)
+
+    print(f"Indexed {len(index.names)} names for {len(index.cuis)} CUIs")
+    print(f"RxNorm index saved: {index_dir}")
+
+if __name__ == "__main__":
+    main()
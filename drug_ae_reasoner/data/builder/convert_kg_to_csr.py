@@ -0,0 +1,19 @@
+import os
+import pickle
+from drug_ae_reasoner.data.csr_graph import CSRGraph
+
+def convert(gpickle_path, csr_path):
+    with open(gpickle_path, "rb") as f:
+        G = pickle.load(f)
+    csr = CSRGraph.from_networkx(G)
+    csr.save(csr_path)
+    print(f"CSR graph saved: {csr_path} ({csr.number_of_nodes()} nodes, {csr.number_of_edges()} edges)")
+
+def main():
+    cadec_dir = os.path.join("drug_ae_reasoner", "data", "cadec")
+    oae_dir = os.path.join("drug_ae_reasoner", "data", "oae")
+    convert(os.path.join(cadec_dir, "cadec_normalized_kg.gpickle"), os.path.join(cadec_dir, "cadec_normalized_kg.csr"))
+    convert(os.path.join(oae_dir, "oae_graph.gpickle"), os.path.join(oae_dir, "oae_graph.csr"))
+
+if __name__ == "__main__":
+    main()
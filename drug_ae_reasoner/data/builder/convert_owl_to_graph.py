@@ -1,24 +1,9 @@
 import os
 import pickle
-import rdflib
-import networkx as nx
-from rdflib.namespace import RDFS
+from drug_ae_reasoner.data.builder.ingest_owl import ingest_owl
 
 def owl_to_graph(owl_path):
-    g = rdflib.Graph()
-    g.parse(owl_path, format='xml')
-    G = nx.MultiDiGraph()
-    ent_to_label = {}
-
-    for s, _, o in g.triples((None, RDFS.label, None)):
-        lbl = str(o).strip().lower()
-        ent_to_label[s] = lbl
-        G.add_node(lbl)
-
-    for c, _, p in g.triples((None, RDFS.subClassOf, None)):
-        if c in ent_to_label and p in ent_to_label:
-            G.add_edge(ent_to_label[c], ent_to_label[p], relation='subClassOf')
-
+    _, G, _ = ingest_owl(owl_path)
     return G
 
 def main():
@@ -0,0 +1,24 @@
+import os
+import argparse
+from drug_ae_reasoner.config import ONNX_MODEL_DIR
+from drug_ae_reasoner.utils.encoding import MODEL_DIR
+from drug_ae_reasoner.utils.encoder_backends import export_onnx
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the local SapBERT model to ONNX (fp32 + dynamic int8) for ENCODER_BACKEND.")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Saved SentenceTransformer to export (default: local_models/sapbert)")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-int8", action="store_true", help="Skip the int8-quantized model")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.model_dir, "config.json")):
+        raise SystemExit(f"No model in {args.model_dir}; run any encoding step once with ENCODER_BACKEND = 'torch' to download it")
+    meta = export_onnx(args.model_dir, args.out, args.opset, quantize=not args.no_int8)
+    for backend, name in meta["files"].items():
+        path = os.path.join(args.out, name)
+        print(f"{backend} model saved: {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+    print(f"Validate with: python -m drug_ae_reasoner.benchmarks.validate_encoder --onnx-dir {args.out}")
+
+if __name__ == "__main__":
+    main()
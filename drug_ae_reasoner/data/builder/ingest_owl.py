@@ -0,0 +1,119 @@
+import os
+import pickle
+import itertools
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+import networkx as nx
+
+RDF = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+RDFS = "{http://www.w3.org/2000/01/rdf-schema#}"
+XML_BASE = "{http://www.w3.org/XML/1998/namespace}base"
+
+LABEL = RDFS + "label"
+SUBCLASS_OF = RDFS + "subClassOf"
+
+def iter_owl_triples(owl_path):
+    """
+    Stream the rdfs:label and rdfs:subClassOf statements of an RDF/XML file.
+
+    Yields ("label", subject_iri, text) and ("subClassOf", child_iri, parent_iri)
+    tuples in document order. Elements are cleared as soon as they have been
+    read, so memory does not grow with the size of the ontology.
+    """
+    blank_ids = itertools.count()
+    # One entry per open element: (kind, subject, base). Node and parseType="Resource"
+    # elements carry the subject they describe; property elements remember the
+    # subject of a nested node element, which is their object.
+    stack = []
+    root = None
+    for event, elem in ET.iterparse(owl_path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+                stack.append(("root", None, elem.get(XML_BASE, "")))
+                continue
+            parent_kind, parent_subject, base = stack[-1]
+            base = urljoin(base, elem.get(XML_BASE)) if elem.get(XML_BASE) else base
+            if parent_kind in ("root", "property"):
+                if elem.get(RDF + "about") is not None:
+                    subject = urljoin(base, elem.get(RDF + "about"))
+                elif elem.get(RDF + "ID") is not None:
+                    subject = base + "#" + elem.get(RDF + "ID")
+                elif elem.get(RDF + "nodeID") is not None:
+                    subject = "_:" + elem.get(RDF + "nodeID")
+                else:
+                    subject = f"_:b{next(blank_ids)}"
+                if parent_kind == "property":
+                    stack[-1] = ("property", subject, stack[-1][2])
+                stack.append(("node", subject, base))
+            elif parent_kind in ("node", "resource"):
+                parse_type = elem.get(RDF + "parseType")
+                if parse_type == "Resource":
+                    # Property whose children describe a fresh blank node directly
+                    stack.append(("resource", f"_:b{next(blank_ids)}", base))
+                elif parse_type == "Literal":
+                    stack.append(("literal", None, base))
+                else:
+                    stack.append(("property", None, base))
+            else:
+                stack.append(("literal", None, base))
+            continue
+
+        kind, obj, base = stack.pop()
+        if kind in ("property", "resource") and stack[-1][0] in ("node", "resource"):
+            subject = stack[-1][1]
+            resource = elem.get(RDF + "resource")
+            if elem.tag == LABEL:
+                yield "label", subject, urljoin(base, resource) if resource is not None else (elem.text or "")
+            elif elem.tag == SUBCLASS_OF:
+                parent = urljoin(base, resource) if resource is not None else obj
+                if parent is not None:
+                    yield "subClassOf", subject, parent
+        if kind == "node" and len(stack) == 1:
+            root.clear()
+
+def ingest_owl(owl_path):
+    """
+    Read `owl_path` once and return (labels, G, ent_to_label): the sorted set of
+    lower-cased labels, the subClassOf graph over labels, and the entity IRI to
+    label map.
+    """
+    ent_to_label = {}
+    all_labels = {}
+    subclass_pairs = {}
+    for kind, s, o in iter_owl_triples(owl_path):
+        if kind == "label":
+            ent_to_label[s] = str(o).strip().lower()
+            all_labels[ent_to_label[s]] = None
+        else:
+            subclass_pairs[(s, o)] = None
+
+    labels = sorted(all_labels)
+    G = nx.MultiDiGraph()
+    G.add_nodes_from(all_labels)
+    for c, p in subclass_pairs:
+        if c in ent_to_label and p in ent_to_label:
+            G.add_edge(ent_to_label[c], ent_to_label[p], relation='subClassOf')
+    return labels, G, ent_to_label
+
+def main():
+    oae_dir = os.path.join("drug_ae_reasoner", "data", "oae")
+    owl_path = os.path.join(oae_dir, "oae_merged.owl")
+    graph_path = os.path.join(oae_dir, "oae_graph.gpickle")
+    label_list_path = os.path.join(oae_dir, "oae_label_list.pkl")
+    entity_path = os.path.join(oae_dir, "oae_entity_labels.pkl")
+
+    labels, G, ent_to_label = ingest_owl(owl_path)
+    with open(graph_path, "wb") as f:
+        pickle.dump(G, f)
+    with open(label_list_path, "wb") as f:
+        pickle.dump(labels, f)
+    with open(entity_path, "wb") as f:
+        pickle.dump(ent_to_label, f)
+
+    print(f"OAE graph saved to: {graph_path} ({G.number_of_nodes()} nodes, {G.number_of_edges()} edges)")
+    print(f"OAE label list saved to: {label_list_path} ({len(labels)} labels)")
+    print(f"OAE entity labels saved to: {entity_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
 import os
 import pickle
+from drug_ae_reasoner.data.rxnorm_index import RxNormIndex, index_dir_for, is_index_current
 
-def load_rxnorm(rrf_dir):
-    cui_to_names = {}
-    with open(os.path.join(rrf_dir, "RXNCONSO.RRF"), encoding="utf-8") as f:
-        for ln in f:
-            parts = ln.split("|")
-            cui, lang, supp, name = parts[0], parts[1], parts[16], parts[14]
-            if lang == "ENG" and supp != "Y":
-                cui_to_names.setdefault(cui, set()).add(name.lower())
-    return cui_to_names
+def load_rxnorm_index(rrf_dir):
+    index_dir = index_dir_for(rrf_dir)
+    if is_index_current(index_dir, rrf_dir):
+        return RxNormIndex.load(index_dir)
+    return RxNormIndex.from_rrf(rrf_dir)
+
+def normalize_graph(G, rx_index):
+    """Set the `cuis` of every drug node in place, looking up each distinct label once."""
+    resolved = {}
+    for n, data in G.nodes(data=True):
+        if data.get("type") == "drug":
+            label = data.get("label", "").lower()
+            if label not in resolved:
+                resolved[label] = rx_index.lookup(label)
+            data["cuis"] = set(resolved[label])
+    return G
 
 def normalize():
     cadec_dir = os.path.join("drug_ae_reasoner", "data", "cadec")
@@ -18,13 +26,7 @@ def normalize():
     out_kg = os.path.join(cadec_dir, "cadec_normalized_kg.gpickle")
 
     G = pickle.load(open(in_kg, "rb"))
-    rx_map = load_rxnorm(rx_dir)
-
-    for n, data in G.nodes(data=True):
-        if data.get("type") == "drug":
-            label = data.get("label", "")
-            cuis = {cui for cui, names in rx_map.items() if any(label.lower() in name for name in names)}
-            data["cuis"] = cuis
+    normalize_graph(G, load_rxnorm_index(rx_dir))
 
     with open(out_kg, "wb") as f:
         pickle.dump(G, f)
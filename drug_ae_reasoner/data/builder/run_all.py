@@ -1,15 +1,235 @@
-import subprocess
-
-def run(script):
-    print(f"\n[RUNNING] {script} ...")
-    subprocess.run(["python", f"drug_ae_reasoner/data/builder/{script}.py"], check=True)
-
-def main():
-    run("build_cadec_kg")
-    run("normalize_cadec_kg")
-    run("build_oae_index")
-    run("convert_owl_to_graph")
-    print("\n✅ All steps complete.")
+import os
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Sequence
+from drug_ae_reasoner.config import CADEC_OAE_TOP_N, CADEC_OAE_MIN_SIM, ENCODER_BACKEND, OAE_INDEX_TYPE
+from drug_ae_reasoner.utils.encoding import MODEL_NAME
+
+DATA_DIR = os.path.join("drug_ae_reasoner", "data")
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
+BUILDER_PACKAGE = "drug_ae_reasoner.data.builder"
+
+_print_lock = threading.Lock()
+
+def log(message: str):
+    # Stages print from worker threads; keep each line whole
+    with _print_lock:
+        print(message, flush=True)
+
+def data_path(*parts):
+    return os.path.join(DATA_DIR, *parts)
+
+def path_fingerprint(path: str):
+    """Size and mtime of a file, of every file under a directory, or None if the path is missing."""
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if os.path.isdir(path):
+        stamps = {}
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                stamps[os.path.relpath(full, path)] = path_fingerprint(full)
+        return stamps
+    return None
+
+def module_digest(modules: Sequence[str]) -> str:
+    """Digest of the source of `modules` (dotted names) taken together."""
+    h = hashlib.sha256()
+    for module in modules:
+        with open(importlib.util.find_spec(module).origin, "rb") as f:
+            h.update(module.encode("utf-8") + b"\0" + f.read())
+    return h.hexdigest()
+
+# Package modules whose code shapes a stage's outputs, beyond the stage's own builder
+STRINGS = ["drug_ae_reasoner.utils.string_table"]
+CSR = ["drug_ae_reasoner.data.csr_graph"] + STRINGS
+RXNORM_INDEX = ["drug_ae_reasoner.data.rxnorm_index"] + STRINGS
+ENCODER = ["drug_ae_reasoner.utils.encoding", "drug_ae_reasoner.utils.encoder_backends"]
+OAE_INDEX = ["drug_ae_reasoner.utils.oae_index"]
+
+class Stage:
+    """
+    One builder step: `run` is called in-process once every stage in `deps` is done.
+    Its fingerprint covers the source of the builder and of the package modules in
+    `sources`, `params` and the files in `inputs`.
+    """
+
+    def __init__(self, name: str, module: str, inputs: Sequence[str], outputs: Sequence[str],
+                 deps: Sequence[str] = (), params: Dict[str, object] = None, run: Callable[[], None] = None,
+                 sources: Sequence[str] = ()):
+        self.name = name
+        self.module = module
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.params = params or {}
+        self.sources = [f"{BUILDER_PACKAGE}.{module}"] + list(sources)
+        self._run = run
+
+    def fingerprint(self) -> Dict[str, object]:
+        missing = [p for p in self.inputs if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Stage {self.name!r} is missing inputs: {', '.join(missing)}")
+        fp = {"code": module_digest(self.sources), "params": self.params,
+              "inputs": {p: path_fingerprint(p) for p in self.inputs}}
+        # Normalize through JSON so it compares equal to what the manifest stores
+        return json.loads(json.dumps(fp))
+
+    def outputs_fingerprint(self) -> Dict[str, object]:
+        return {p: path_fingerprint(p) for p in self.outputs}
+
+    def is_up_to_date(self, record: Optional[Dict[str, object]]) -> bool:
+        if record is None or record.get("fingerprint") != self.fingerprint():
+            return False
+        outputs = self.outputs_fingerprint()
+        return all(v is not None for v in outputs.values()) and record.get("outputs") == outputs
+
+    def run(self):
+        if self._run is not None:
+            self._run()
+        else:
+            importlib.import_module(f"{BUILDER_PACKAGE}.{self.module}").main()
+
+def _convert_csr(gpickle_path, csr_path):
+    from drug_ae_reasoner.data.builder.convert_kg_to_csr import convert
+    return lambda: convert(gpickle_path, csr_path)
+
+def _with_args(module, argv):
+    return lambda: importlib.import_module(f"{BUILDER_PACKAGE}.{module}").main(argv)
+
+def default_stages() -> List[Stage]:
+    conll = data_path("cadec", "train.conll")
+    rrf = data_path("rxnorm", "RXNCONSO.RRF")
+    owl = data_path("oae", "oae_merged.owl")
+    raw_kg = data_path("cadec", "cadec_verbalizer_kg.gpickle")
+    kg = data_path("cadec", "cadec_normalized_kg.gpickle")
+    rx_index = data_path("rxnorm", "rxnorm_index")
+    oae_graph = data_path("oae", "oae_graph.gpickle")
+    label_list = data_path("oae", "oae_label_list.pkl")
+    faiss_index = data_path("oae", "oae_sapbert_index.faiss")
+    oae_labels = data_path("oae", "oae_labels.pkl")
+    kg_csr = data_path("cadec", "cadec_normalized_kg.csr")
+    oae_csr = data_path("oae", "oae_graph.csr")
+    # Stages that read a graph wait for its CSR copy, which `load_graph` prefers over the pickle
+    return [
+        # CADEC branch
+        Stage("cadec_kg", "build_cadec_kg", [conll], [raw_kg, data_path("cadec", "train_30.jsonl")],
+              run=_with_args("build_cadec_kg", []), sources=["drug_ae_reasoner.utils.verbalizer_utils"]),
+        Stage("rxnorm_index", "build_rxnorm_index", [rrf], [rx_index], sources=RXNORM_INDEX),
+        Stage("normalize_cadec_kg", "normalize_cadec_kg", [raw_kg, rrf, rx_index], [kg],
+              deps=["cadec_kg", "rxnorm_index"],
+              run=lambda: importlib.import_module(f"{BUILDER_PACKAGE}.normalize_cadec_kg").normalize(),
+              sources=RXNORM_INDEX),
+        Stage("cadec_csr", "convert_kg_to_csr", [kg], [kg_csr],
+              deps=["normalize_cadec_kg"], run=_convert_csr(kg, kg_csr), sources=CSR),
+        # OAE branch
+        Stage("ingest_owl", "ingest_owl", [owl],
+              [oae_graph, label_list, data_path("oae", "oae_entity_labels.pkl")]),
+        Stage("oae_csr", "convert_kg_to_csr", [oae_graph], [oae_csr],
+              deps=["ingest_owl"], run=_convert_csr(oae_graph, oae_csr), sources=CSR),
+        Stage("oae_closure", "build_oae_closure", [oae_graph, oae_csr], [data_path("oae", "oae_closure")],
+              deps=["ingest_owl", "oae_csr"], params={"max_depth": None}, run=_with_args("build_oae_closure", []),
+              sources=CSR + ["drug_ae_reasoner.utils.reachability"]),
+        Stage("oae_index", "build_oae_index", [label_list, owl],
+              [faiss_index, faiss_index + ".json", oae_labels, data_path("oae", "oae_vectors.f32")],
+              deps=["ingest_owl"],
+              params={"model": MODEL_NAME, "backend": ENCODER_BACKEND, "index_type": OAE_INDEX_TYPE},
+              run=_with_args("build_oae_index", []),
+              sources=ENCODER + OAE_INDEX + [f"{BUILDER_PACKAGE}.ingest_owl"]),
+        # Joins both branches
+        Stage("cadec_oae_map", "build_cadec_oae_map", [kg, kg_csr, faiss_index, oae_labels],
+              [data_path("cadec", "cadec_oae_map")], deps=["cadec_csr", "oae_index"],
+              params={"model": MODEL_NAME, "backend": ENCODER_BACKEND, "top_n": CADEC_OAE_TOP_N,
+                      "min_sim": CADEC_OAE_MIN_SIM},
+              run=_with_args("build_cadec_oae_map", ["--force"]),
+              sources=CSR + ENCODER + OAE_INDEX + ["drug_ae_reasoner.utils.cadec_oae_map",
+                                                   "drug_ae_reasoner.utils.similarity_search"]),
+    ]
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, object]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: Dict[str, object], path: str = MANIFEST_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def run_pipeline(stages: List[Stage], force: Sequence[str] = (), jobs: int = 2,
+                 manifest_path: str = MANIFEST_PATH) -> Dict[str, str]:
+    """
+    Run `stages` in dependency order, up to `jobs` at a time, skipping any stage whose
+    fingerprint and outputs match the manifest unless it is named in `force` (or
+    `force` contains "all"). Returns {stage name: "ran" | "skipped"}.
+    """
+    manifest = load_manifest(manifest_path)
+    lock = threading.Lock()
+    force = set(force)
+
+    def execute(stage: Stage) -> str:
+        if "all" not in force and stage.name not in force and stage.is_up_to_date(manifest.get(stage.name)):
+            log(f"[SKIP] {stage.name} (up to date)")
+            return "skipped"
+        log(f"\n[RUNNING] {stage.name} ...")
+        fingerprint = stage.fingerprint()
+        start = time.perf_counter()
+        stage.run()
+        record = {"fingerprint": fingerprint, "outputs": stage.outputs_fingerprint(),
+                  "seconds": round(time.perf_counter() - start, 3)}
+        with lock:
+            manifest[stage.name] = record
+            save_manifest(manifest, manifest_path)
+        log(f"[DONE] {stage.name} in {record['seconds']:.1f}s")
+        return "ran"
+
+    pending = {s.name: s for s in stages}
+    status: Dict[str, str] = {}
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+        while (pending and error is None) or running:
+            if error is None:
+                for name, stage in list(pending.items()):
+                    if all(d in status for d in stage.deps):
+                        del pending[name]
+                        running[pool.submit(execute, stage)] = name
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    status[name] = future.result()
+                except Exception as e:
+                    error = error or e
+                    log(f"[FAILED] {name}: {e}")
+    if error is not None:
+        raise error
+    return status
+
+def main(argv=None):
+    stages = default_stages()
+    names = [s.name for s in stages]
+    parser = argparse.ArgumentParser(description="Build every data artifact, skipping stages that are up to date.")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", choices=names + ["all"],
+                        help=f"Re-run these stages even if up to date ({', '.join(names)}, or all)")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run concurrently (the CADEC and OAE branches)")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    args = parser.parse_args(argv)
+
+    status = run_pipeline(stages, args.force, args.jobs, args.manifest)
+    ran = [n for n in names if status.get(n) == "ran"]
+    print(f"\n✅ All steps complete. Ran: {', '.join(ran) or 'nothing'}.")
 
 if __name__ == "__main__":
     main()
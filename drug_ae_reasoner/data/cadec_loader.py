@@ -1,15 +1,16 @@
-import pickle
 from typing import List, Tuple, Set
 import logging
+from .csr_graph import load_graph
 
 logger = logging.getLogger(__name__)
 
 def get_cadec_drug_nodes(drug: str, rx_path: str, kg_path: str) -> List[Tuple[str, str, Set[str]]]:
     from .rxnorm_loader import get_input_cuis
     cuis = get_input_cuis(drug, rx_path)
-    with open(kg_path, "rb") as f:
-        G_cadec = pickle.load(f)
+    G_cadec = load_graph(kg_path)
+    return find_cadec_drug_nodes(cuis, G_cadec)
 
+def find_cadec_drug_nodes(cuis: Set[str], G_cadec) -> List[Tuple[str, str, Set[str]]]:
     matches = []
     for node_id, data in G_cadec.nodes(data=True):
         if data.get("type") == "drug" and data.get("cuis", set()) & cuis:
@@ -19,9 +20,10 @@ def get_cadec_drug_nodes(drug: str, rx_path: str, kg_path: str) -> List[Tuple[st
     return matches
 
 def get_cadec_ae_pairs(drug_nodes: List[Tuple[str, str, Set[str]]], kg_path: str) -> List[Tuple[str, str, str]]:
-    with open(kg_path, "rb") as f:
-        G = pickle.load(f)
+    G = load_graph(kg_path)
+    return collect_cadec_ae_pairs(drug_nodes, G)
 
+def collect_cadec_ae_pairs(drug_nodes: List[Tuple[str, str, Set[str]]], G) -> List[Tuple[str, str, str]]:
     pairs = []
     for node_id, drug_label, cuis in drug_nodes:
         cui_str = ", ".join(sorted(cuis))
@@ -0,0 +1,275 @@
+import os
+import json
+import pickle
+from typing import Dict, Iterator, List, Optional, Set
+import numpy as np
+from ..utils.string_table import StringTable
+
+class _StrColumn:
+    """Dictionary-coded string attribute: a table of distinct values plus one code per row (-1 = absent)."""
+
+    def __init__(self, values: StringTable, codes: np.ndarray):
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def build(cls, rows: List[object]) -> "_StrColumn":
+        table: Dict[str, int] = {}
+        codes = np.full(len(rows), -1, dtype=np.int32)
+        for i, v in enumerate(rows):
+            if v is not None:
+                codes[i] = table.setdefault(v, len(table))
+        return cls(StringTable.from_strings(table), codes)
+
+    def save(self, prefix: str):
+        self.values.save(prefix)
+        np.save(f"{prefix}_codes.npy", self.codes)
+
+    @classmethod
+    def load(cls, prefix: str) -> "_StrColumn":
+        return cls(StringTable.load(prefix), np.load(f"{prefix}_codes.npy", mmap_mode="r"))
+
+    def get(self, i: int):
+        code = self.codes[i]
+        return None if code < 0 else self.values[code]
+
+class _SetColumn:
+    """Set-of-strings attribute stored as CSR rows of codes into a value table, plus a presence mask."""
+
+    def __init__(self, values: StringTable, offsets: np.ndarray, codes: np.ndarray, present: np.ndarray):
+        self.values = values
+        self.offsets = offsets
+        self.codes = codes
+        self.present = present
+
+    @classmethod
+    def build(cls, rows: List[object]) -> "_SetColumn":
+        table: Dict[str, int] = {}
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        present = np.zeros(len(rows), dtype=np.bool_)
+        codes: List[int] = []
+        for i, v in enumerate(rows):
+            if v is not None:
+                present[i] = True
+                codes.extend(table.setdefault(x, len(table)) for x in sorted(v))
+            offsets[i + 1] = len(codes)
+        return cls(StringTable.from_strings(table), offsets, np.array(codes, dtype=np.int32), present)
+
+    def save(self, prefix: str):
+        self.values.save(prefix)
+        np.save(f"{prefix}_rows.npy", self.offsets)
+        np.save(f"{prefix}_codes.npy", self.codes)
+        np.save(f"{prefix}_present.npy", self.present)
+
+    @classmethod
+    def load(cls, prefix: str) -> "_SetColumn":
+        return cls(StringTable.load(prefix), np.load(f"{prefix}_rows.npy", mmap_mode="r"),
+                   np.load(f"{prefix}_codes.npy", mmap_mode="r"), np.load(f"{prefix}_present.npy", mmap_mode="r"))
+
+    def get(self, i: int):
+        if not self.present[i]:
+            return None
+        return set(self.values.take(self.codes[self.offsets[i]:self.offsets[i + 1]]))
+
+_COLUMN_KINDS = {"str": _StrColumn, "set": _SetColumn}
+
+def _column_kind(values) -> str:
+    kinds = {("set" if isinstance(v, (set, frozenset)) else "str") for v in values if v is not None}
+    for v in values:
+        if v is not None and not isinstance(v, (str, set, frozenset)):
+            raise TypeError(f"Unsupported attribute value for CSR storage: {v!r}")
+    if len(kinds) > 1:
+        raise TypeError("Attribute mixes string and set values")
+    return kinds.pop() if kinds else "str"
+
+class _NodeView:
+    def __init__(self, graph: "CSRGraph"):
+        self._g = graph
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self)
+        return ((self._g.node_keys[i], self._g._node_data(i)) for i in range(len(self._g)))
+
+    def __getitem__(self, key: str) -> Dict[str, object]:
+        return self._g._node_data(self._g.node_id(key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._g.node_keys)
+
+    def __len__(self) -> int:
+        return len(self._g)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._g
+
+class CSRGraph:
+    """
+    Read-only directed (multi)graph with interned string node ids, CSR adjacency
+    and columnar node/edge attributes, saved as .npy files and loaded through mmap.
+
+    It implements the part of the networkx API the reasoner uses: `nodes(data=True)`,
+    `nodes[n]`, `out_edges(n, data=True)`, `successors`, `has_edge` and `in`.
+    Node and out-edge order are preserved from the source graph.
+    """
+
+    def __init__(self, node_keys: StringTable, indptr: np.ndarray, indices: np.ndarray,
+                 node_columns: Dict[str, object], edge_columns: Dict[str, object]):
+        self.node_keys = node_keys
+        self.indptr = indptr
+        self.indices = indices
+        self.node_columns = node_columns
+        self.edge_columns = edge_columns
+        self.nodes = _NodeView(self)
+        self._ids: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_networkx(cls, G) -> "CSRGraph":
+        keys = list(G.nodes())
+        ids = {k: i for i, k in enumerate(keys)}
+        node_attrs = {a for _, d in G.nodes(data=True) for a in d}
+        node_columns = {}
+        for a in sorted(node_attrs):
+            rows = [G.nodes[k].get(a) for k in keys]
+            node_columns[a] = _COLUMN_KINDS[_column_kind(rows)].build(rows)
+
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        targets, edge_data = [], []
+        for i, u in enumerate(keys):
+            for _, v, d in G.out_edges(u, data=True):
+                targets.append(ids[v])
+                edge_data.append(d)
+            indptr[i + 1] = len(targets)
+        edge_columns = {}
+        for a in sorted({a for d in edge_data for a in d}):
+            rows = [d.get(a) for d in edge_data]
+            edge_columns[a] = _COLUMN_KINDS[_column_kind(rows)].build(rows)
+
+        key_table = StringTable.from_strings(keys)
+        return cls(key_table, indptr, np.array(targets, dtype=np.int32), node_columns, edge_columns)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.node_keys.save(os.path.join(path, "nodes"))
+        np.save(os.path.join(path, "indptr.npy"), self.indptr)
+        np.save(os.path.join(path, "indices.npy"), self.indices)
+        schema = {"node_columns": {}, "edge_columns": {}}
+        for scope, columns in (("node", self.node_columns), ("edge", self.edge_columns)):
+            for name, col in columns.items():
+                kind = "set" if isinstance(col, _SetColumn) else "str"
+                schema[f"{scope}_columns"][name] = kind
+                col.save(os.path.join(path, f"{scope}_{name}"))
+        schema["n_nodes"] = len(self)
+        schema["n_edges"] = self.number_of_edges()
+        with open(os.path.join(path, "schema.json"), "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "CSRGraph":
+        with open(os.path.join(path, "schema.json"), encoding="utf-8") as f:
+            schema = json.load(f)
+        columns = {}
+        for scope in ("node", "edge"):
+            columns[scope] = {name: _COLUMN_KINDS[kind].load(os.path.join(path, f"{scope}_{name}"))
+                              for name, kind in schema[f"{scope}_columns"].items()}
+        return cls(StringTable.load(os.path.join(path, "nodes")),
+                   np.load(os.path.join(path, "indptr.npy"), mmap_mode="r"),
+                   np.load(os.path.join(path, "indices.npy"), mmap_mode="r"),
+                   columns["node"], columns["edge"])
+
+    def __len__(self) -> int:
+        return len(self.node_keys)
+
+    def number_of_nodes(self) -> int:
+        return len(self)
+
+    def number_of_edges(self) -> int:
+        return int(self.indptr[-1])
+
+    def node_id(self, key: str) -> int:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return i
+
+    def _find(self, key: str) -> int:
+        ids = self._ids
+        if ids is None:
+            # Decoded once on first lookup (one pass over the key blob); every later lookup is a dict hit
+            n = len(self.node_keys)
+            ids = self._ids = dict(zip(self.node_keys.take(np.arange(n)), range(n)))
+        return ids.get(key, -1)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def _node_data(self, i: int) -> Dict[str, object]:
+        data = {}
+        for name, col in self.node_columns.items():
+            v = col.get(i)
+            if v is not None:
+                data[name] = v
+        return data
+
+    def _edge_data(self, e: int) -> Dict[str, object]:
+        data = {}
+        for name, col in self.edge_columns.items():
+            v = col.get(e)
+            if v is not None:
+                data[name] = v
+        return data
+
+    def node_type(self, key: str):
+        return self.nodes[key].get("type")
+
+    def node_label(self, key: str):
+        return self.nodes[key].get("label")
+
+    def node_cuis(self, key: str) -> Set[str]:
+        return self.nodes[key].get("cuis", set())
+
+    def successor_ids(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def successors(self, key: str) -> Iterator[str]:
+        for j in dict.fromkeys(self.successor_ids(self.node_id(key)).tolist()):
+            yield self.node_keys[j]
+
+    def out_edges(self, key: str, data: bool = False):
+        i = self.node_id(key)
+        for e in range(int(self.indptr[i]), int(self.indptr[i + 1])):
+            v = self.node_keys[self.indices[e]]
+            yield (key, v, self._edge_data(e)) if data else (key, v)
+
+    def has_edge(self, u: str, v: str) -> bool:
+        i, j = self._find(u), self._find(v)
+        if i < 0 or j < 0:
+            return False
+        return bool(np.any(self.successor_ids(i) == j))
+
+def csr_path_for(graph_path: str) -> str:
+    """The CSR directory `convert_kg_to_csr` writes next to a pickled graph."""
+    return os.path.splitext(graph_path)[0] + ".csr"
+
+def resolve_graph_path(path: str) -> str:
+    """
+    `path`, or the CSR copy next to it when that exists and is at least as new as the
+    pickle (so a rebuilt pickle is not shadowed by a stale conversion).
+    """
+    if os.path.isdir(path):
+        return path
+    schema = os.path.join(csr_path_for(path), "schema.json")
+    if os.path.exists(schema) and (not os.path.exists(path) or os.path.getmtime(schema) >= os.path.getmtime(path)):
+        return csr_path_for(path)
+    return path
+
+def load_graph(path: str):
+    """
+    Load a graph artifact: a CSRGraph directory through mmap, or a pickled networkx graph.
+    A pickle path loads its current CSR copy instead when there is one (see `resolve_graph_path`).
+    """
+    path = resolve_graph_path(path)
+    if os.path.isdir(path):
+        return CSRGraph.load(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
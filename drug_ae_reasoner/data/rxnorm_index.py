@@ -0,0 +1,170 @@
+import os
+import json
+import logging
+from typing import Dict, Set, Iterable, Tuple
+import numpy as np
+from ..utils.string_table import StringTable
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = "rxnorm_index"
+
+def index_dir_for(rrf_dir: str) -> str:
+    return os.path.join(rrf_dir, INDEX_DIRNAME)
+
+def _source_stamp(rrf_dir: str) -> Dict[str, int]:
+    st = os.stat(os.path.join(rrf_dir, "RXNCONSO.RRF"))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def is_index_current(index_dir: str, rrf_dir: str) -> bool:
+    meta_path = os.path.join(index_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("source") == _source_stamp(rrf_dir)
+
+def _trigrams(b: bytes) -> Set[int]:
+    return {(b[i] << 16) | (b[i + 1] << 8) | b[i + 2] for i in range(len(b) - 2)}
+
+class RxNormIndex:
+    """
+    Sorted table of lower-cased RxNorm names with a byte-trigram postings index.
+
+    A lookup intersects the postings of the query's trigrams and only runs the
+    substring check on the surviving names, so it returns the same CUI set as
+    scanning every name while touching a tiny fraction of them.
+    """
+
+    def __init__(self, names: StringTable, cuis: StringTable, name_cui_offsets: np.ndarray,
+                 name_cui_ids: np.ndarray, gram_keys: np.ndarray, gram_offsets: np.ndarray,
+                 postings: np.ndarray):
+        self.names = names
+        self.cuis = cuis
+        self.name_cui_offsets = name_cui_offsets
+        self.name_cui_ids = name_cui_ids
+        self.gram_keys = gram_keys
+        self.gram_offsets = gram_offsets
+        self.postings = postings
+        self._blob_bytes = None
+
+    @classmethod
+    def build(cls, pairs: Iterable[Tuple[str, str]]) -> "RxNormIndex":
+        name_to_cuis: Dict[str, Set[str]] = {}
+        for cui, name in pairs:
+            name_to_cuis.setdefault(name, set()).add(cui)
+        names = sorted(name_to_cuis)
+        cuis = sorted({c for cs in name_to_cuis.values() for c in cs})
+        cui_ids = {c: i for i, c in enumerate(cuis)}
+
+        name_cui_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        ids = []
+        gram_chunks, owner_chunks = [], []
+        for i, name in enumerate(names):
+            row = sorted(cui_ids[c] for c in name_to_cuis[name])
+            ids.extend(row)
+            name_cui_offsets[i + 1] = len(ids)
+            grams = _trigrams(name.encode("utf-8"))
+            if grams:
+                gram_chunks.append(np.fromiter(grams, dtype=np.uint32, count=len(grams)))
+                owner_chunks.append(np.full(len(grams), i, dtype=np.int32))
+
+        if gram_chunks:
+            all_grams = np.concatenate(gram_chunks)
+            owners = np.concatenate(owner_chunks)
+        else:
+            all_grams = np.zeros(0, dtype=np.uint32)
+            owners = np.zeros(0, dtype=np.int32)
+        order = np.lexsort((owners, all_grams))
+        all_grams, owners = all_grams[order], owners[order]
+        gram_keys, starts = np.unique(all_grams, return_index=True)
+        gram_offsets = np.append(starts, len(all_grams)).astype(np.int64)
+
+        return cls(StringTable.from_strings(names), StringTable.from_strings(cuis),
+                   name_cui_offsets, np.array(ids, dtype=np.int32),
+                   gram_keys, gram_offsets, owners)
+
+    @classmethod
+    def from_rrf(cls, rrf_dir: str) -> "RxNormIndex":
+        from .rxnorm_loader import iter_rxnorm_names
+        return cls.build(iter_rxnorm_names(rrf_dir))
+
+    def save(self, index_dir: str, rrf_dir: str = None):
+        os.makedirs(index_dir, exist_ok=True)
+        self.names.save(os.path.join(index_dir, "names"))
+        self.cuis.save(os.path.join(index_dir, "cuis"))
+        np.save(os.path.join(index_dir, "name_cui_offsets.npy"), self.name_cui_offsets)
+        np.save(os.path.join(index_dir, "name_cui_ids.npy"), self.name_cui_ids)
+        np.save(os.path.join(index_dir, "gram_keys.npy"), self.gram_keys)
+        np.save(os.path.join(index_dir, "gram_offsets.npy"), self.gram_offsets)
+        np.save(os.path.join(index_dir, "postings.npy"), self.postings)
+        meta = {"n_names": len(self.names), "n_cuis": len(self.cuis)}
+        if rrf_dir is not None:
+            meta["source"] = _source_stamp(rrf_dir)
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "RxNormIndex":
+        def arr(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+        return cls(StringTable.load(os.path.join(index_dir, "names")),
+                   StringTable.load(os.path.join(index_dir, "cuis")),
+                   arr("name_cui_offsets.npy"), arr("name_cui_ids.npy"),
+                   arr("gram_keys.npy"), arr("gram_offsets.npy"), arr("postings.npy"))
+
+    def _candidate_names(self, q: bytes) -> np.ndarray:
+        grams = np.array(sorted(_trigrams(q)), dtype=np.uint32)
+        pos = np.searchsorted(self.gram_keys, grams)
+        if np.any(pos >= len(self.gram_keys)) or np.any(self.gram_keys[np.minimum(pos, len(self.gram_keys) - 1)] != grams):
+            return np.zeros(0, dtype=np.int32)
+        lists = sorted((self.postings[self.gram_offsets[p]:self.gram_offsets[p + 1]] for p in pos), key=len)
+        cand = np.asarray(lists[0])
+        for lst in lists[1:]:
+            if not len(cand):
+                break
+            cand = np.intersect1d(cand, lst, assume_unique=True)
+        return cand
+
+    def _scan_names(self, q: bytes) -> Set[int]:
+        # Queries shorter than a trigram: scan the blob directly and keep
+        # matches that do not straddle two names. The bytes copy is made once.
+        if self._blob_bytes is None:
+            self._blob_bytes = self.names.blob.tobytes()
+        blob = self._blob_bytes
+        hits = []
+        start = blob.find(q)
+        while start != -1:
+            hits.append(start)
+            start = blob.find(q, start + 1)
+        if not hits:
+            return set()
+        hits = np.array(hits, dtype=np.int64)
+        owners = np.searchsorted(self.names.offsets, hits, side="right") - 1
+        inside = hits + len(q) <= self.names.offsets[owners + 1]
+        return set(owners[inside].tolist())
+
+    def lookup_name_ids(self, drug: str) -> np.ndarray:
+        q = drug.lower().encode("utf-8")
+        if not q:
+            return np.arange(len(self.names))
+        if len(q) < 3:
+            return np.array(sorted(self._scan_names(q)), dtype=np.int64)
+        cand = self._candidate_names(q)
+        if not len(cand):
+            return cand.astype(np.int64)
+        blob = self.names.blob
+        starts = self.names.offsets[cand].tolist()
+        ends = self.names.offsets[cand + 1].tolist()
+        keep = [q in bytes(blob[a:b]) for a, b in zip(starts, ends)]
+        return cand[np.array(keep, dtype=bool)].astype(np.int64)
+
+    def lookup(self, drug: str) -> Set[str]:
+        name_ids = self.lookup_name_ids(drug)
+        if not len(name_ids):
+            return set()
+        starts = self.name_cui_offsets[name_ids]
+        counts = self.name_cui_offsets[name_ids + 1] - starts
+        rel = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cui_ids = np.unique(self.name_cui_ids[np.repeat(starts, counts) + rel])
+        return set(self.cuis.take(cui_ids))
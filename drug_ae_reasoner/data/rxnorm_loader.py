@@ -1,26 +1,39 @@
 import os
-from typing import Set, Dict
+from typing import Set, Dict, Iterator, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
-def load_rxnorm(rrf_dir: str) -> Dict[str, Set[str]]:
-    logger.info("Loading RxNorm mappings...")
-    cui_to_names = {}
+def iter_rxnorm_names(rrf_dir: str) -> Iterator[Tuple[str, str]]:
     with open(os.path.join(rrf_dir, "RXNCONSO.RRF"), encoding="utf-8") as f:
         for line in f:
             parts = line.rstrip().split("|")
             cui, lang, suppress, name = parts[0], parts[1], parts[16], parts[14]
             if lang != "ENG" or suppress == "Y":
                 continue
-            cui_to_names.setdefault(cui, set()).add(name.lower())
+            yield cui, name.lower()
+
+def load_rxnorm(rrf_dir: str) -> Dict[str, Set[str]]:
+    logger.info("Loading RxNorm mappings...")
+    cui_to_names = {}
+    for cui, name in iter_rxnorm_names(rrf_dir):
+        cui_to_names.setdefault(cui, set()).add(name)
     logger.info(f"Loaded {len(cui_to_names)} CUIs")
     return cui_to_names
 
 def get_input_cuis(drug: str, rrf_dir: str) -> Set[str]:
-    mapping = load_rxnorm(rrf_dir)
+    from .rxnorm_index import RxNormIndex, index_dir_for, is_index_current
+    index_dir = index_dir_for(rrf_dir)
+    if is_index_current(index_dir, rrf_dir):
+        return require_input_cuis(drug, RxNormIndex.load(index_dir).lookup(drug))
+    return match_input_cuis(drug, load_rxnorm(rrf_dir))
+
+def match_input_cuis(drug: str, mapping: Dict[str, Set[str]]) -> Set[str]:
     norm = drug.lower()
     matched = {c for c, names in mapping.items() if any(norm in nm for nm in names)}
+    return require_input_cuis(drug, matched)
+
+def require_input_cuis(drug: str, matched: Set[str]) -> Set[str]:
     if not matched:
         raise ValueError(f"No RxNorm CUI found for '{drug}'")
     logger.info(f"Matched CUIs for drug '{drug}': {matched}")
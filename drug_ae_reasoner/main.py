@@ -1,14 +1,101 @@
+import sys
 import argparse
 from .config import RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH
-from .data.cadec_loader import get_cadec_drug_nodes, get_cadec_ae_pairs
-from .utils.similarity_search import build_cadec_ae_oae_mapping, build_input_ae_oae_list
-from .utils.path_reasoner import find_top_drug_to_input_ae_paths
 
-def main():
-    parser = argparse.ArgumentParser(description="Trace semantic paths from a drug to adverse effects using CADEC and OAE KGs.")
-    parser.add_argument("--drug", type=str, required=True, help="Drug name (e.g., 'metformin')")
-    parser.add_argument("--aes", type=str, required=True, nargs='+', help="List of adverse effect labels (e.g., 'nausea' 'vomiting')")
-    args = parser.parse_args()
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "serve":
+        from .utils.server import main as serve_main
+        return serve_main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="Trace semantic paths from a drug to adverse effects using CADEC and OAE KGs.",
+                                     epilog="Run `drug_ae_reasoner serve --help` for the HTTP service.")
+    parser.add_argument("--drug", type=str, help="Drug name (e.g., 'metformin')")
+    parser.add_argument("--drugs", type=str, nargs='+',
+                        help="Several drugs to compare against the same --aes; prints each drug's paths and a cross-drug ranking")
+    parser.add_argument("--aes", type=str, nargs='+', help="List of adverse effect labels (e.g., 'nausea' 'vomiting')")
+    parser.add_argument("--max-hops", type=int, default=1, help="Maximum subClassOf hops between OAE nodes on a path")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                        help="Output verbalized paths (text) or one JSON record per path (jsonl)")
+    parser.add_argument("--batch", type=str, help="CSV or JSONL file of drug/AE-list queries; results are streamed as JSONL")
+    parser.add_argument("--output", type=str, help="Write --batch/--screen results to this file instead of stdout")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for --batch")
+    parser.add_argument("--screen", action="store_true",
+                        help="Score every CADEC drug against --aes and write a drug x AE score table as CSV")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute the query instead of reading or writing the result cache")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-stage time, cache hit rate and peak RSS breakdown to stderr")
+    parser.add_argument("--profile-out", type=str,
+                        help="Also write the profile as a Chrome trace (JSON) to this file; implies --profile")
+    args = parser.parse_args(argv)
+    if args.screen and not args.aes:
+        parser.error("--screen requires --aes")
+    if args.drugs and not args.aes:
+        parser.error("--drugs requires --aes")
+    if args.batch is None and not args.screen and not args.drugs and (args.drug is None or not args.aes):
+        parser.error("--drug and --aes are required unless --batch, --screen or --drugs is given")
+
+    if not (args.profile or args.profile_out):
+        return run(args)
+    from .utils.profiling import profile
+    with profile() as prof:
+        run(args)
+    print("\n--- Profile ---", file=sys.stderr)
+    print(prof.format_breakdown(), file=sys.stderr)
+    if args.profile_out:
+        prof.save(args.profile_out)
+        print(f"Chrome trace written to: {args.profile_out}", file=sys.stderr)
+
+def run(args):
+    if args.no_cache:
+        from .utils import result_cache
+        result_cache.result_cache = None
+    if args.screen:
+        import csv
+        from .utils.matrix_engine import MatrixEngine
+        from .utils.session import ReasonerSession
+        session = ReasonerSession(RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH)
+        engine = MatrixEngine(session, max_hops=args.max_hops)
+        aes = list(dict.fromkeys(args.aes))
+        scores = engine.score(aes)
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(["drug_node", "drug"] + aes)
+            for (node_id, label, _), row in zip(engine.drugs, scores):
+                writer.writerow([node_id, label] + [f"{v:.6f}" if v > -float("inf") else "" for v in row])
+        finally:
+            if args.output:
+                out.close()
+        return
+
+    if args.batch is not None:
+        from .utils.batch import read_queries, run_batch
+        from .utils.session import ReasonerSession
+        session = ReasonerSession(RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH)
+        queries = list(read_queries(args.batch))
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            run_batch(session, queries, out, workers=args.workers, max_hops=args.max_hops)
+        finally:
+            if args.output:
+                out.close()
+        return
+
+    if args.drugs:
+        return run_drugs(args)
+
+    if args.format == "jsonl":
+        import json
+        from .utils.session import ReasonerSession
+        session = ReasonerSession(RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH)
+        for record in session.iter_query_records(args.drug, args.aes, max_hops=args.max_hops):
+            print(json.dumps(record, ensure_ascii=False))
+        return
+
+    # Imported here so `--help` and argument errors do not pay for the reasoning stack
+    from .utils.path_reasoner import find_top_drug_to_input_ae_paths
 
     print(f"[INFO] Running Drug-AE Path Reasoning for drug: {args.drug}")
     print(f"[INFO] Input AE terms: {args.aes}")
@@ -20,7 +107,8 @@ def main():
         cadec_kg_path=CADEC_KG_PATH,
         oae_index_path=OAE_INDEX_PATH,
         oae_label_map_path=OAE_LABEL_MAP_PATH,
-        oae_graph_path=OAE_GRAPH_PATH
+        oae_graph_path=OAE_GRAPH_PATH,
+        max_hops=args.max_hops
     )
 
     if connected:
@@ -33,5 +121,34 @@ def main():
     for v in verbalizations:
         print(v)
 
+def run_drugs(args):
+    import json
+    from .utils.path_reasoner import find_top_paths_for_drugs
+    out = find_top_paths_for_drugs(args.drugs, args.aes, RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH,
+                                   OAE_GRAPH_PATH, max_hops=args.max_hops)
+    n_aes = len(set(args.aes))
+    if args.format == "jsonl":
+        for rank, (drug, connected, covered, best) in enumerate(out["ranking"], 1):
+            top_paths, verbalizations = out["results"][drug][1], out["results"][drug][4]
+            print(json.dumps({"drug": drug, "rank": rank, "connected": connected, "covered_aes": covered,
+                              "best_score": best, "verbalizations": verbalizations,
+                              "top_paths": [{"input_ae": inp, "oae_path": nodes, "score": score}
+                                            for _, inp, nodes, score in top_paths]}, ensure_ascii=False))
+        for drug, error in out["errors"].items():
+            print(json.dumps({"drug": drug, "error": error}, ensure_ascii=False))
+        return
+
+    print(f"[INFO] Ranking {len(out['ranking'])} drugs against input AE terms: {args.aes}")
+    for drug, error in out["errors"].items():
+        print(f"[WARN] {drug}: {error}")
+    print("\n--- Drug Ranking ---\n")
+    for rank, (drug, connected, covered, best) in enumerate(out["ranking"], 1):
+        status = f"{covered}/{n_aes} AEs, best score {best:.4f}" if connected else "no real paths"
+        print(f"{rank:>3}. {drug}: {status}")
+    for drug, *_ in out["ranking"]:
+        print(f"\n--- Verbalized Reasoning Paths: {drug} ---\n")
+        for v in out["results"][drug][4]:
+            print(v)
+
 if __name__ == "__main__":
     main()
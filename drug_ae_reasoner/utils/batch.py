@@ -0,0 +1,143 @@
+import sys
+import csv
+import json
+import logging
+import multiprocessing as mp
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+import numpy as np
+from . import encoding
+from .encoding import encode_batch
+from .session import ReasonerSession
+
+logger = logging.getLogger(__name__)
+
+AE_SEPARATOR = ";"
+
+# (index in the input file, drug, input AEs, optional caller-supplied id)
+Query = Tuple[int, str, List[str], Optional[str]]
+
+def _split_aes(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(ae).strip() for ae in value if str(ae).strip()]
+    return [ae.strip() for ae in str(value).split(AE_SEPARATOR) if ae.strip()]
+
+def read_queries(path: str) -> Iterator[Query]:
+    """
+    Read batch queries from a JSONL file ({"drug": ..., "aes": [...]}) or a CSV file
+    with `drug` and `aes` columns, AEs separated by ";". An optional `id` field is
+    passed through to the results.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for i, row in enumerate(rows):
+            yield i, str(row["drug"]).strip(), _split_aes(row["aes"]), row.get("id")
+
+def group_by_drug(queries: List[Query]) -> List[Tuple[str, List[Query]]]:
+    """Group queries by drug, keeping first-appearance order of drugs and file order within a drug."""
+    groups: Dict[str, List[Query]] = {}
+    for q in queries:
+        groups.setdefault(q[1], []).append(q)
+    return list(groups.items())
+
+def lookup_drugs(session: ReasonerSession, groups: List[Tuple[str, List[Query]]]) -> Dict[str, object]:
+    """CADEC drug->AE pairs for every drug of the batch, or the lookup error message for drugs with no match."""
+    found = {}
+    for drug, _ in groups:
+        try:
+            found[drug] = session.get_cadec_ae_pairs(session.get_cadec_drug_nodes(drug))
+        except ValueError as e:
+            found[drug] = str(e)
+    return found
+
+def preencode(session: ReasonerSession, groups: List[Tuple[str, List[Query]]], cadec_pairs: Dict[str, object],
+              n_cadec: int = 5, cadec_ae_threshold: float = 0.7) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Encode every distinct input AE of the batch, and every CADEC AE label the
+    precomputed map does not answer, in one pass. Returns, per drug, the embeddings
+    its queries will look up, so the per-query searches only hit the embedding cache.
+    """
+    needed = {}
+    for drug, qs in groups:
+        texts = [ae for _, _, aes, _ in qs for ae in aes]
+        pairs = cadec_pairs[drug]
+        if not isinstance(pairs, str):
+            cadec_labels = sorted({ae for _, ae, _ in pairs})
+            texts += session.online_cadec_labels(cadec_labels, n_cadec, cadec_ae_threshold)
+        needed[drug] = list(dict.fromkeys(texts))
+    texts = list(dict.fromkeys(t for ts in needed.values() for t in ts))
+    vecs = dict(zip(texts, encode_batch(texts))) if texts else {}
+    return {drug: {t: vecs[t] for t in ts} for drug, ts in needed.items()}
+
+# Set in the parent before the pool forks, so workers share its pages instead of reloading
+_session: Optional[ReasonerSession] = None
+
+def _init_worker():
+    # Only the parent appends to the on-disk embedding store
+    encoding.set_store(None)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(1)
+
+def run_group(job) -> List[str]:
+    drug, queries, params, cadec_pairs, vectors = job
+    n_cadec = params.get("n_cadec", 5)
+    cadec_ae_threshold = params.get("cadec_ae_threshold", 0.7)
+    # Encoded by the parent, which may have loaded SapBERT only after this worker forked
+    encoding.embedding_cache.put_many(list(vectors), list(vectors.values()))
+    if isinstance(cadec_pairs, str):
+        drug_ctx, error = None, cadec_pairs
+    else:
+        drug_ctx, error = _session.drug_context(drug, n_cadec, cadec_ae_threshold, cadec_pairs), None
+    lines = []
+    for index, _, aes, qid in queries:
+        result = {"index": index, "drug": drug, "aes": aes}
+        if qid is not None:
+            result["id"] = qid
+        if error is not None:
+            result["error"] = error
+        else:
+            paths = list(_session.iter_query_records(drug, aes, drug_ctx=drug_ctx, **params))
+            result["connected"] = bool(paths) and paths[0]["connected"]
+            result["paths"] = paths
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return lines
+
+def run_batch(session: ReasonerSession, queries: List[Query], out: TextIO, workers: int = 1, **params) -> int:
+    """
+    Answer `queries` and write one JSON line per query to `out`, grouped by drug.
+    Each line carries the query's `index` in the input file. With `workers > 1` the
+    groups are spread over forked processes that share the already loaded session.
+    The pool forks before SapBERT is loaded (torch and its thread pools do not
+    survive a fork), and workers receive the embeddings they need with each group.
+    """
+    global _session
+    _session = session
+    groups = group_by_drug(queries)
+    cadec_pairs = lookup_drugs(session, groups)
+
+    pool = None
+    if workers > 1 and "fork" in mp.get_all_start_methods():
+        pool = mp.get_context("fork").Pool(workers, initializer=_init_worker)
+    elif workers > 1:
+        logger.warning("fork is unavailable on this platform; running the batch in one process")
+
+    n = 0
+    try:
+        n_cadec, cadec_ae_threshold = params.get("n_cadec", 5), params.get("cadec_ae_threshold", 0.7)
+        vectors = preencode(session, groups, cadec_pairs, n_cadec, cadec_ae_threshold)
+        n_texts = len({t for vs in vectors.values() for t in vs})
+        logger.info(f"{len(queries)} queries, {len(groups)} drugs, {n_texts} distinct AE labels encoded")
+        jobs = ((drug, qs, params, cadec_pairs[drug], vectors[drug]) for drug, qs in groups)
+        results = pool.imap(run_group, jobs) if pool is not None else map(run_group, jobs)
+        for lines in results:
+            for line in lines:
+                out.write(line + "\n")
+            out.flush()
+            n += len(lines)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return n
@@ -0,0 +1,98 @@
+import os
+import json
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .encoding import STORE_KEY
+from .oae_index import load_index_meta
+from .similarity_search import search_oae
+from .string_table import StringTable
+
+def _file_stamp(path: str) -> Dict[str, int]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def source_stamp(index_path: str, label_map_path: str) -> Dict[str, object]:
+    """
+    What a precomputed mapping depends on besides the CADEC labels: the encoder (model
+    and backend), the OAE index with its type and search parameters, and the labels.
+    """
+    index_meta = load_index_meta(index_path) or {}
+    return {"model": STORE_KEY, "index": _file_stamp(index_path), "labels": _file_stamp(label_map_path),
+            "index_type": index_meta.get("type", "flat_l2"), "index_params": index_meta.get("params", {})}
+
+class CadecOAEMap:
+    """
+    Precomputed top-N OAE candidates for every CADEC adverse-effect label.
+
+    Row i of `oae_ids`/`sims` holds the FAISS top-`top_n` hits for `keys[i]`, in
+    rank order. Hits below `min_sim` are stored as -1, so a query with
+    `n_cadec <= top_n` and `cadec_ae_threshold >= min_sim` gives the same result
+    as `search_cadec_ae_oae_mapping`.
+    """
+
+    def __init__(self, keys: StringTable, oae_ids: np.ndarray, sims: np.ndarray, meta: Dict[str, object]):
+        self.keys = keys
+        self.oae_ids = oae_ids
+        self.sims = sims
+        self.meta = meta
+        self._rows = {key: i for i, key in enumerate(keys)}
+
+    @property
+    def top_n(self) -> int:
+        return self.meta["top_n"]
+
+    @property
+    def min_sim(self) -> float:
+        return self.meta["min_sim"]
+
+    @classmethod
+    def build(cls, ae_labels: Sequence[str], index, top_n: int, min_sim: float, meta: Dict[str, object],
+              chunk_size: int = 4096) -> "CadecOAEMap":
+        keys = sorted(set(ae_labels))
+        oae_ids = np.full((len(keys), top_n), -1, dtype=np.int32)
+        sims = np.zeros((len(keys), top_n), dtype=np.float32)
+        for start in range(0, len(keys), chunk_size):
+            chunk_sims, chunk_ids = search_oae(keys[start:start + chunk_size], index, top_n)
+            keep = (chunk_sims >= min_sim) & (chunk_ids >= 0)
+            oae_ids[start:start + len(chunk_ids)] = np.where(keep, chunk_ids, -1)
+            sims[start:start + len(chunk_ids)] = np.where(keep, chunk_sims, 0.0)
+        return cls(StringTable.from_strings(keys), oae_ids, sims, dict(meta, top_n=top_n, min_sim=min_sim))
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.keys.save(os.path.join(path, "keys"))
+        np.save(os.path.join(path, "oae_ids.npy"), self.oae_ids)
+        np.save(os.path.join(path, "sims.npy"), self.sims)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(self.meta, n_labels=len(self.keys)), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "CadecOAEMap":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(StringTable.load(os.path.join(path, "keys")),
+                   np.load(os.path.join(path, "oae_ids.npy"), mmap_mode="r"),
+                   np.load(os.path.join(path, "sims.npy"), mmap_mode="r"), meta)
+
+    def is_current(self, index_path: str, label_map_path: str) -> bool:
+        stamp = source_stamp(index_path, label_map_path)
+        return all(self.meta.get(k) == v for k, v in stamp.items())
+
+    def covers(self, n_cadec: int, cadec_ae_threshold: float) -> bool:
+        return n_cadec <= self.top_n and cadec_ae_threshold >= self.min_sim
+
+    def __contains__(self, ae_label: str) -> bool:
+        return ae_label in self._rows
+
+    def lookup(self, ae_cadec_list: Sequence[str], oae_labels: List[str], n_cadec: int = 5,
+               cadec_ae_threshold: float = 0.7) -> Dict[str, List[Tuple[str, float]]]:
+        """Mapping for the labels present in the table; callers search the rest online."""
+        mapping: Dict[str, List[Tuple[str, float]]] = {}
+        for ae_label in ae_cadec_list:
+            row = self._rows.get(ae_label)
+            if row is None:
+                continue
+            ids, sims = self.oae_ids[row, :n_cadec], self.sims[row, :n_cadec]
+            keep = (ids >= 0) & (sims >= cadec_ae_threshold)
+            mapping[ae_label] = [(oae_labels[idx], sim) for idx, sim in zip(ids[keep].tolist(), sims[keep].tolist())]
+        return mapping
@@ -0,0 +1,179 @@
+import os
+import json
+import inspect
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# `torch` runs SentenceTransformer in fp32; the others run an exported graph on ONNX Runtime
+BACKENDS = ("torch", "onnx", "onnx_int8")
+ONNX_FILES = {"onnx": "model.onnx", "onnx_int8": "model_int8.onnx"}
+ENCODER_META = "encoder.json"
+
+def pooling_mode(model_dir: str) -> str:
+    """The pooling of a saved SentenceTransformer ("cls", "max" or "mean"; mean when unspecified)."""
+    modules_path = os.path.join(model_dir, "modules.json")
+    if not os.path.exists(modules_path):
+        return "mean"
+    with open(modules_path, encoding="utf-8") as f:
+        modules = json.load(f)
+    for module in modules:
+        if module.get("type", "").endswith("Pooling"):
+            with open(os.path.join(model_dir, module["path"], "config.json"), encoding="utf-8") as f:
+                config = json.load(f)
+            if config.get("pooling_mode_cls_token"):
+                return "cls"
+            if config.get("pooling_mode_max_tokens"):
+                return "max"
+            return "mean"
+    return "mean"
+
+def max_seq_length(model_dir: str, model_config) -> int:
+    path = os.path.join(model_dir, "sentence_bert_config.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            length = json.load(f).get("max_seq_length")
+        if length:
+            return int(length)
+    return int(model_config.max_position_embeddings)
+
+def pool(hidden: np.ndarray, mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "cls":
+        return hidden[:, 0]
+    mask = mask[:, :, None].astype(hidden.dtype)
+    if mode == "max":
+        return np.where(mask > 0, hidden, -np.inf).max(axis=1)
+    return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+def export_onnx(model_dir: str, out_dir: str, opset: int = 14, quantize: bool = True) -> Dict[str, object]:
+    """
+    Export the transformer of the SentenceTransformer saved in `model_dir` to
+    `out_dir/model.onnx` (token embeddings; pooling is recorded and applied by
+    `OnnxEncoder`), plus a dynamically int8-quantized `model_int8.onnx`.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir).eval()
+    os.makedirs(out_dir, exist_ok=True)
+
+    sample = tokenizer(["nausea", "elevated liver enzymes"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class TokenEmbeddings(torch.nn.Module):
+        # Positional inputs in `input_names` order; forward()'s own argument order varies across transformers versions
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    # Newer torch defaults to the dynamo exporter, which needs onnxscript; the TorchScript one does not
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(TokenEmbeddings().eval(), tuple(sample[name] for name in input_names),
+                          os.path.join(out_dir, ONNX_FILES["onnx"]),
+                          input_names=input_names, output_names=["last_hidden_state"], dynamic_axes=dynamic,
+                          opset_version=opset, do_constant_folding=True, **kwargs)
+    tokenizer.save_pretrained(out_dir)
+
+    files = {"onnx": ONNX_FILES["onnx"]}
+    if quantize:
+        quantize_int8(out_dir)
+        files["onnx_int8"] = ONNX_FILES["onnx_int8"]
+    meta = {"source": os.path.abspath(model_dir), "pooling": pooling_mode(model_dir),
+            "max_length": max_seq_length(model_dir, model.config), "inputs": input_names,
+            "dim": int(model.config.hidden_size), "opset": opset, "files": files}
+    with open(os.path.join(out_dir, ENCODER_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def quantize_int8(out_dir: str):
+    """Dynamic (weight-only, activations quantized on the fly) int8 quantization of model.onnx."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    src = os.path.join(out_dir, ONNX_FILES["onnx"])
+    dst = os.path.join(out_dir, ONNX_FILES["onnx_int8"])
+    # Quantizing a graph with shape-inference gaps is more reliable after preprocessing
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        pre = os.path.join(out_dir, "model_pre.onnx")
+        quant_pre_process(src, pre, skip_symbolic_shape=True)
+        src = pre
+    except Exception:
+        pre = None
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+    if pre and os.path.exists(pre):
+        os.remove(pre)
+
+class OnnxEncoder:
+    """
+    SapBERT on ONNX Runtime, exposing the `encode(texts, batch_size=...)` subset of
+    SentenceTransformer that `utils.encoding` uses.
+    """
+
+    def __init__(self, onnx_dir: str, backend: str = "onnx", threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        with open(os.path.join(onnx_dir, ENCODER_META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if backend not in self.meta["files"]:
+            raise FileNotFoundError(f"No {backend} model in {onnx_dir}; run export_sapbert_onnx first")
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(onnx_dir, self.meta["files"][backend]), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64, **_) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.meta["dim"]), dtype=np.float32)
+        # Sort by length so each batch pads to similar lengths, then restore the input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: List[np.ndarray] = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                 max_length=self.meta["max_length"], return_tensors="np")
+            feeds = {name: enc[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            for i, vec in zip(idx, pool(hidden, enc["attention_mask"], self.meta["pooling"])):
+                out[i] = vec
+        return np.vstack(out).astype(np.float32)
+
+def load_encoder(backend: str, model_dir: str, onnx_dir: str):
+    """The encoder for `backend`; the torch backend is a SentenceTransformer loaded from `model_dir`."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_dir)
+    return OnnxEncoder(onnx_dir, backend)
+
+def make_tiny_bert(model_dir: str, texts: Sequence[str], hidden_size: int = 32, layers: int = 2, seed: int = 0):
+    """
+    Save a randomly initialized BERT with a word-level vocabulary built from `texts`
+    as a mean-pooled SentenceTransformer, for exercising export and validation offline.
+    """
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    torch.manual_seed(seed)
+    os.makedirs(model_dir, exist_ok=True)
+    words = sorted({w for t in texts for w in t.lower().replace("-", " ").split()})
+    with open(os.path.join(model_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words) + "\n")
+    tokenizer = BertTokenizerFast(os.path.join(model_dir, "vocab.txt"))
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=hidden_size, num_hidden_layers=layers,
+                        num_attention_heads=2, intermediate_size=hidden_size * 2, max_position_embeddings=64)
+    BertModel(config).save_pretrained(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    transformer = models.Transformer(model_dir, max_seq_length=64)
+    SentenceTransformer(modules=[transformer, models.Pooling(hidden_size, "mean")]).save(model_dir)
+    return model_dir
@@ -1,30 +1,350 @@
 import numpy as np
 import os
-from sentence_transformers import SentenceTransformer
+import re
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+from ..config import EMBED_BATCH_SIZE, EMBED_CACHE_SIZE, EMBED_STORE_DIR, ENCODER_BACKEND, ONNX_MODEL_DIR
+from . import profiling
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
 
 MODEL_NAME = "cambridgeltl/SapBERT-from-PubMedBERT-fulltext"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "local_models", "sapbert")
+# Quantized backends produce slightly different vectors, so they get their own on-disk store
+STORE_KEY = MODEL_NAME if ENCODER_BACKEND == "torch" else f"{MODEL_NAME}-{ENCODER_BACKEND}"
+
+_model = None
+_model_lock = threading.Lock()
+# One encode at a time: torch already spreads a batch over every core, and the fast
+# tokenizer behind SentenceTransformer is not safe to call from several threads
+_encode_lock = threading.Lock()
 
-# Check if local model exists
-if os.path.isdir(MODEL_DIR) and os.path.exists(os.path.join(MODEL_DIR, "config.json")):
-    print(f"[INFO] Loading SapBERT from local cache: {MODEL_DIR}")
-    model = SentenceTransformer(MODEL_DIR)
-else:
+def load_model():
+    if ENCODER_BACKEND != "torch":
+        from .encoder_backends import OnnxEncoder
+        print(f"[INFO] Loading SapBERT ({ENCODER_BACKEND}) from: {ONNX_MODEL_DIR}")
+        return OnnxEncoder(ONNX_MODEL_DIR, ENCODER_BACKEND)
+    from sentence_transformers import SentenceTransformer
+    # Check if local model exists
+    if os.path.isdir(MODEL_DIR) and os.path.exists(os.path.join(MODEL_DIR, "config.json")):
+        print(f"[INFO] Loading SapBERT from local cache: {MODEL_DIR}")
+        return SentenceTransformer(MODEL_DIR)
     print(f"[INFO] Downloading SapBERT model from HuggingFace...")
     model = SentenceTransformer(MODEL_NAME)
     os.makedirs(MODEL_DIR, exist_ok=True)
     model.save(MODEL_DIR)
     print(f"[INFO] SapBERT saved locally to: {MODEL_DIR}")
+    return model
+
+def get_model():
+    """
+    Return the shared SapBERT model, loading it on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+def set_model(model, store_key: Optional[str] = None):
+    """
+    Replace the shared model with any object exposing `encode(texts, batch_size=...)`,
+    e.g. an offline stand-in for benchmarks. Clears the in-process embedding cache and
+    detaches the on-disk store, unless `store_key` names a store for this model's vectors.
+    """
+    global _model
+    with _model_lock:
+        _model = model
+    set_store(store_key)
+    embedding_cache.clear()
+
+def __getattr__(name):
+    # `encoding.model` used to be loaded at import time; keep it reachable lazily
+    if name == "model":
+        return get_model()
+    if name == "embedding_store":
+        return get_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class EmbeddingCache:
+    """
+    In-process LRU cache of normalized embeddings, bounded to `max_size` entries.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_size: int = EMBED_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(text)
+            if vec is not None:
+                self._data.move_to_end(text)
+            return vec
+
+    def get_many(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """The cached subset of `texts`, taking the lock once."""
+        found = {}
+        with self._lock:
+            for text in texts:
+                vec = self._data.get(text)
+                if vec is not None:
+                    self._data.move_to_end(text)
+                    found[text] = vec
+        return found
+
+    def put(self, text: str, vec: np.ndarray):
+        self.put_many([text], [vec])
+
+    def put_many(self, texts: Sequence[str], vecs: Sequence[np.ndarray]):
+        with self._lock:
+            for text, vec in zip(texts, vecs):
+                self._data[text] = vec
+                self._data.move_to_end(text)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, text: str) -> bool:
+        with self._lock:
+            return text in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path`, held against other processes (flock, or msvcrt on Windows)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk embedding store for one model: a raw float32 matrix read
+    through mmap plus a JSON-lines key table mapping each text to its row. Appends
+    hold a lock file, so processes can share a store; a store that cannot be read or
+    written only costs re-encoding.
+    """
+
+    def __init__(self, root: str, model_name: str):
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.keys_path = os.path.join(self.dir, "keys.jsonl")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, "lock")
+        self.model_name = model_name
+        self.dim = None
+        self._rows = {}
+        self._n = 0  # rows in use; duplicate keys from older stores map to their last row
+        self._keys_size = 0  # bytes of keys.jsonl covered by `_rows`
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        try:
+            with _file_lock(self.lock_path):
+                self._sync()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable embedding store {self.dir}: {e}")
+            self._rows, self._n, self._keys_size, self._matrix = {}, 0, 0, None
+
+    def _sync(self):
+        """Re-read the store, cutting both files back to the rows present in both. Call under the file lock."""
+        with open(self.meta_path, encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        keys, ends = [], []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                for line in f:
+                    # A torn last line (no newline, or not JSON) is dropped with everything after it
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        keys.append(json.loads(line))
+                    except ValueError:
+                        break
+                    ends.append((ends[-1] if ends else 0) + len(line))
+        row_bytes = 4 * self.dim
+        n = min(len(keys), _size(self.vectors_path) // row_bytes)
+        keys_size = ends[n - 1] if n else 0
+        if _size(self.keys_path) > keys_size:
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(keys_size)
+        if _size(self.vectors_path) > n * row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+        self._rows = {k: i for i, k in enumerate(keys[:n])}
+        self._n, self._keys_size = n, keys_size
+        self._remap()
+
+    def _remap(self):
+        n = self._n
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim)) if n else None
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(text)
+            if row is None:
+                return None
+            return np.array(self._matrix[row])
+
+    def put_many(self, texts: Sequence[str], vecs: np.ndarray):
+        with self._lock:
+            try:
+                self._put_many(texts, vecs)
+            except (OSError, ValueError) as e:
+                # Whatever half of the append landed is cut back by the next `_sync`
+                logger.warning(f"Could not write to embedding store {self.dir}: {e}")
+
+    def _put_many(self, texts: Sequence[str], vecs: np.ndarray):
+        if not any(t not in self._rows for t in texts):
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        with _file_lock(self.lock_path):
+            # Another process appended since we last looked: pick up its rows first
+            if os.path.exists(self.meta_path) and (
+                    self.dim is None or _size(self.keys_path) != self._keys_size
+                    or _size(self.vectors_path) != self._n * 4 * self.dim):
+                self._sync()
+            first = {}
+            for i, t in enumerate(texts):
+                if t not in self._rows:
+                    first.setdefault(t, i)
+            if not first:
+                return
+            texts = list(first)
+            vecs = np.ascontiguousarray(np.asarray(vecs)[list(first.values())], dtype=np.float32)
+            if self.dim is None:
+                self.dim = int(vecs.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+            lines = "".join(json.dumps(t) + "\n" for t in texts).encode("utf-8")
+            with open(self.vectors_path, "ab") as f:
+                f.write(vecs.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(lines)
+            for t in texts:
+                self._rows[t] = self._n
+                self._n += 1
+            self._keys_size += len(lines)
+        self._remap()
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
 
 # Simple cache to avoid redundant embeddings
-embedding_cache = {}
+embedding_cache = EmbeddingCache(EMBED_CACHE_SIZE)
+# The on-disk store is opened on first use: loading it reads its whole key table
+_store: Optional[DiskEmbeddingStore] = None
+_store_key: Optional[str] = STORE_KEY if EMBED_STORE_DIR else None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[DiskEmbeddingStore]:
+    """
+    Return the on-disk embedding store of the current model, opening it on first use,
+    or None when the store is disabled or detached.
+    """
+    global _store
+    if _store is None and _store_key is not None:
+        with _store_lock:
+            if _store is None and _store_key is not None:
+                _store = DiskEmbeddingStore(EMBED_STORE_DIR, _store_key)
+    return _store
+
+def set_store(store_key: Optional[str]):
+    """Persist vectors under `store_key` from now on, or detach the on-disk store with None."""
+    global _store, _store_key
+    with _store_lock:
+        _store, _store_key = None, store_key if EMBED_STORE_DIR else None
+
+def _normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms > 0, norms, 1.0)
+
+def encode_texts(texts: Sequence[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Encode `texts` with SapBERT and L2-normalize the rows, bypassing every cache.
+    """
+    model = get_model()
+    with _encode_lock:
+        vecs = model.encode(list(texts), batch_size=batch_size)
+    return _normalize_rows(vecs)
+
+def encode_batch(texts: Sequence[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    unique = list(dict.fromkeys(texts))
+    found = embedding_cache.get_many(unique)
+    store = get_store() if len(found) < len(unique) else None
+    missing: List[str] = []
+    from_store = {}
+    for text in unique:
+        if text in found:
+            continue
+        vec = store.get(text) if store is not None else None
+        if vec is None:
+            missing.append(text)
+        else:
+            from_store[text] = vec
+    store_hits = len(from_store)
+    if from_store:
+        embedding_cache.put_many(list(from_store), list(from_store.values()))
+        found.update(from_store)
+    if profiling.enabled():
+        profiling.count("embedding_cache.hit", len(found) - store_hits)
+        profiling.count("embedding_cache.miss", len(missing) + store_hits)
+        if store is not None:
+            profiling.count("store.hit", store_hits)
+            profiling.count("store.miss", len(missing))
+
+    if missing:
+        with profiling.span("sapbert.encode", texts=len(missing)):
+            vecs = encode_texts(missing, batch_size)
+        found.update(zip(missing, vecs))
+        embedding_cache.put_many(missing, vecs)
+        if store is not None:
+            store.put_many(missing, vecs)
+
+    if not found:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([found[t] for t in texts])
 
 def encode_text(text: str) -> np.ndarray:
-    if text in embedding_cache:
-        return embedding_cache[text]
-    vec = model.encode([text])[0]
-    vec = np.array(vec, dtype=np.float32)
-    norm = np.linalg.norm(vec)
-    normalized = vec / (norm if norm > 0 else 1.0)
-    embedding_cache[text] = normalized
-    return normalized
+    return encode_batch([text])[0]
@@ -0,0 +1,219 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .encoding import encode_batch
+from .session import ReasonerSession, render_result
+
+DEFAULT_PARAMS = dict(n_cadec=5, cadec_ae_threshold=0.7, n_input=5, input_ae_threshold=0.7,
+                      n_paths=5, n_disconnect=3, max_hops=1)
+
+class _Job:
+    __slots__ = ("future", "drug", "aes", "key", "params", "pairs", "cadec_labels", "texts",
+                 "drug_ctx", "oae_input", "found")
+
+    def __init__(self, future: Future, drug: str, aes: List[str], key, params: Dict[str, object]):
+        # Resolves to the `_search` output; callers' futures render their own drug from it
+        self.future = future
+        self.drug = drug
+        self.aes = aes
+        self.key = key
+        self.params = params
+
+class QueryExecutor:
+    """
+    Answers a stream of `ReasonerSession.query` calls with the stages pipelined across
+    queries, each stage on its own threads and connected by bounded queues:
+
+      normalize  RxNorm + CADEC lookups, labels still to encode   `workers` threads
+      encode     SapBERT over every queued query's labels at once  1 thread
+      search     CADEC AE -> OAE and input AE -> OAE (FAISS)       `workers` threads
+      paths      top-k path search and fallbacks                   `workers` threads
+      verbalize  result cache, narrative strings                   `workers` threads
+
+    FAISS and torch release the GIL, so one query's encoding overlaps others' lookups
+    and searches. At most `max_pending` queries are in flight; `submit` blocks beyond
+    that. While the result cache is on, a query with the same key as one still in
+    flight waits for its search. Results equal `session.query`'s and `map` yields them
+    in submission order.
+    """
+
+    def __init__(self, session: ReasonerSession, workers: int = 4, max_pending: int = 64,
+                 max_encode_batch: int = 32, **params):
+        self.session = session
+        self.params = dict(DEFAULT_PARAMS, **params)
+        self.max_encode_batch = max_encode_batch
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Cache key -> search future of a query still in the pipeline, so repeats wait for it instead
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._submitted, self._encode_q, self._search_q, self._paths_q, self._verbalize_q = (
+            queue.Queue(max_pending) for _ in range(5))
+        stages = [(self._normalize, self._submitted, self._encode_q), (None, self._encode_q, self._search_q),
+                  (self._search, self._search_q, self._paths_q), (self._paths, self._paths_q, self._verbalize_q),
+                  (self._verbalize, self._verbalize_q, None)]
+        # (input queue, threads) per stage, in pipeline order
+        self._stages: List[Tuple[queue.Queue, List[threading.Thread]]] = []
+        for fn, inbox, outbox in stages:
+            if fn is None:
+                threads = [threading.Thread(target=self._encode_loop, args=(inbox, outbox),
+                                            name="executor-encode", daemon=True)]
+            else:
+                threads = [threading.Thread(target=self._stage_loop, args=(fn, inbox, outbox),
+                                            name=f"executor-{fn.__name__.lstrip('_')}-{i}", daemon=True) for i in range(workers)]
+            self._stages.append((inbox, threads))
+            for t in threads:
+                t.start()
+        self._closed = False
+
+    def submit(self, drug: str, ae_input_list: Sequence[str], **params) -> Future:
+        """Queue one query; the future resolves to the `query` tuple or raises its error (e.g. ValueError)."""
+        if self._closed:
+            raise RuntimeError("QueryExecutor is closed")
+        params = dict(self.params, **params)
+        future: Future = Future()
+        key, entry = self.session.cached_result(drug, ae_input_list, params)
+        if entry is not None:
+            future.set_result(render_result(drug, *entry))
+            return future
+        if key is not None:
+            with self._inflight_lock:
+                running = self._inflight.get(key)
+                if running is None:
+                    search = self._inflight[key] = Future()
+            if running is not None:
+                running.add_done_callback(lambda done: self._render(future, drug, done))
+                return future
+            search.add_done_callback(lambda _: self._forget(key))
+        else:
+            search = Future()
+        search.add_done_callback(lambda done: self._render(future, drug, done))
+        self._slots.acquire()
+        search.add_done_callback(lambda _: self._slots.release())
+        self._submitted.put(_Job(search, drug, list(ae_input_list), key, params))
+        return future
+
+    @staticmethod
+    def _render(future: Future, drug: str, search: Future):
+        error = search.exception()
+        if error is not None:
+            future.set_exception(error)
+            return
+        top_paths, fb_drug, fb_ae, context = search.result()
+        try:
+            future.set_result(render_result(drug, top_paths, fb_drug, fb_ae, context[:3], context[3]))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _forget(self, key: str):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def map(self, queries: Iterable[Tuple[str, Sequence[str]]], return_exceptions: bool = False) -> Iterator:
+        """
+        Submit (drug, AE list) pairs from `queries`, which may be a lazy stream, and yield
+        their results in submission order. Failed queries raise, or are yielded as the
+        exception with `return_exceptions=True`.
+        """
+        futures: "queue.Queue[Optional[Future]]" = queue.Queue()
+
+        def feed():
+            try:
+                for drug, aes in queries:
+                    futures.put(self.submit(drug, aes))
+            except BaseException as e:
+                failed: Future = Future()
+                failed.set_exception(e)
+                futures.put(failed)
+            futures.put(None)
+
+        threading.Thread(target=feed, name="executor-feed", daemon=True).start()
+        while True:
+            future = futures.get()
+            if future is None:
+                return
+            error = future.exception()
+            if error is None:
+                yield future.result()
+            elif return_exceptions:
+                yield error
+            else:
+                raise error
+
+    def close(self):
+        """Finish every submitted query, then stop the stage threads."""
+        if self._closed:
+            return
+        self._closed = True
+        # Stage by stage, so a stage only stops once everything upstream has been handed to it
+        for inbox, threads in self._stages:
+            inbox.put(None)
+            for t in threads:
+                t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _stage_loop(self, fn, inbox: queue.Queue, outbox: Optional[queue.Queue]):
+        while True:
+            job = inbox.get()
+            if job is None:
+                # Wait for sibling workers to drain the queue, then pass the stop marker on
+                inbox.put(None)
+                return
+            try:
+                fn(job)
+            except Exception as e:
+                job.future.set_exception(e)
+                continue
+            if outbox is not None:
+                outbox.put(job)
+
+    def _encode_loop(self, inbox: queue.Queue, outbox: queue.Queue):
+        while True:
+            batch = [inbox.get()]
+            # Take whatever else is already queued, so one SapBERT call covers several queries
+            while batch[-1] is not None and len(batch) < self.max_encode_batch:
+                try:
+                    batch.append(inbox.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [job for job in batch if job is not None]
+            if jobs:
+                texts = dict.fromkeys(text for job in jobs for text in job.texts)
+                try:
+                    if texts:
+                        encode_batch(list(texts))
+                except Exception as e:
+                    for job in jobs:
+                        job.future.set_exception(e)
+                    jobs = []
+                for job in jobs:
+                    outbox.put(job)
+            if batch[-1] is None:
+                return
+
+    def _normalize(self, job: _Job):
+        session, p = self.session, job.params
+        job.pairs = session.get_cadec_ae_pairs(session.get_cadec_drug_nodes(job.drug))
+        job.cadec_labels = sorted({ae for _, ae, _ in job.pairs})
+        job.texts = session.online_cadec_labels(job.cadec_labels, p["n_cadec"], p["cadec_ae_threshold"]) + job.aes
+
+    def _search(self, job: _Job):
+        session, p = self.session, job.params
+        mapping = session.build_cadec_ae_oae_mapping(job.cadec_labels, p["n_cadec"], p["cadec_ae_threshold"])
+        job.drug_ctx = (job.pairs, mapping)
+        job.oae_input = session.build_input_ae_oae_list(job.aes, p["n_input"], p["input_ae_threshold"])
+
+    def _paths(self, job: _Job):
+        job.found = self.session._search(job.drug, job.aes, drug_ctx=job.drug_ctx, oae_input=job.oae_input,
+                                         **job.params)
+
+    def _verbalize(self, job: _Job):
+        # Rendering runs in the done callbacks, once per waiting caller
+        self.session.remember_result(job.key, job.found)
+        job.future.set_result(job.found)
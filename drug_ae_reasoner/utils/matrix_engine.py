@@ -0,0 +1,185 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+import scipy.sparse as sp
+from ..data.cadec_loader import collect_cadec_ae_pairs
+from .path_reasoner import PathIndex, top_drug_to_input_ae_paths
+from .reachability import ReachabilityIndex
+from .session import ReasonerSession
+from .verbalizer import iter_path_records, render_path_record
+
+def _expand(X: sp.csr_matrix, Y: sp.csr_matrix, rows: slice) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For every stored (i, k) of X[rows] and (k, j) of Y, return (i, j, X[i, k], Y[k, j]):
+    the terms of the (i, j) entry of the product X @ Y, before any reduction.
+    """
+    start, stop = rows.start, rows.stop
+    lo, hi = X.indptr[start], X.indptr[stop]
+    x_rows = np.repeat(np.arange(start, stop), np.diff(X.indptr[start:stop + 1]))
+    ks, x_vals = X.indices[lo:hi], X.data[lo:hi]
+    lengths = Y.indptr[ks + 1] - Y.indptr[ks]
+    total = int(lengths.sum())
+    # Positions into Y.indices/Y.data: each k contributes the range Y.indptr[k] .. Y.indptr[k + 1]
+    seg_starts = np.repeat(Y.indptr[ks] - np.cumsum(lengths) + lengths, lengths)
+    pos = seg_starts + np.arange(total)
+    return np.repeat(x_rows, lengths), Y.indices[pos], np.repeat(x_vals, lengths), Y.data[pos]
+
+def _reduce_max(i: np.ndarray, j: np.ndarray, vals: np.ndarray, n_cols: int):
+    key = i.astype(np.int64) * n_cols + j
+    order = np.argsort(key, kind="stable")
+    key, vals = key[order], vals[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    return key[starts] // n_cols, key[starts] % n_cols, np.maximum.reduceat(vals, starts)
+
+def max_product(X: sp.csr_matrix, Y: sp.csr_matrix, combine: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                chunk_terms: int = 1 << 22) -> sp.csr_matrix:
+    """
+    Semiring product over stored entries: out[i, j] = max_k combine(X[i, k], Y[k, j]).
+    Entries with no term are absent (not zero). Rows of X are processed in blocks so
+    that roughly `chunk_terms` terms are materialized at a time.
+    """
+    X, Y = sp.csr_matrix(X), sp.csr_matrix(Y)
+    shape = (X.shape[0], Y.shape[1])
+    # Terms contributed by each row of X, cumulated, to cut rows into blocks of ~chunk_terms
+    cum = np.r_[0, np.cumsum(np.diff(Y.indptr)[X.indices])][X.indptr]
+    cuts = np.searchsorted(cum, np.arange(chunk_terms, cum[-1], chunk_terms), side="right")
+    bounds = np.unique(np.r_[0, cuts, X.shape[0]])
+    parts = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        i, j, x, y = _expand(X, Y, slice(int(start), int(stop)))
+        if len(i):
+            parts.append(_reduce_max(i, j, combine(x, y), shape[1]))
+    if not parts:
+        return sp.csr_matrix(shape, dtype=np.float64)
+    i, j, v = (np.concatenate(a) for a in zip(*parts))
+    # Blocks cover disjoint rows, so no coordinate repeats across them
+    return sp.csr_matrix((v.astype(np.float64), (i, j)), shape=shape)
+
+class MatrixEngine:
+    """
+    Scores every CADEC drug node against a list of input AEs in one pass.
+
+    With the per-query pipeline's definitions, the best path score of (drug d, input i) is
+    max over OAE pairs (o, o') with o' reachable from o of B[d, o] + T[o', i], where
+      A: drug -> CADEC AE (KG edges),  S: CADEC AE -> OAE candidate similarity,
+      B[d, o] = S[o, o] if d has a CADEC AE labelled o, else 0, for every o with some A[d, k] * S[k, o]
+               (the path scoring keys the CADEC similarity on the OAE node itself),
+      R: OAE -> OAE within max_hops (identity included),  T: OAE -> input AE similarity.
+    M[o, i] = max over R[o, o'] of T[o', i] is computed first, then scores = B (max,+) M.
+    """
+
+    def __init__(self, session: ReasonerSession, n_cadec: int = 5, cadec_ae_threshold: float = 0.7,
+                 max_hops: int = 1):
+        self.session = session
+        self.n_cadec = n_cadec
+        self.cadec_ae_threshold = cadec_ae_threshold
+        self.max_hops = max_hops
+
+        G = session.cadec_kg
+        self.drugs: List[Tuple[str, str, set]] = [(n, d.get("label", "UnknownDrug"), d.get("cuis", set()))
+                                                 for n, d in G.nodes(data=True) if d.get("type") == "drug"]
+        drug_pairs = [collect_cadec_ae_pairs([drug], G) for drug in self.drugs]
+        self.cadec_aes = sorted({ae for pairs in drug_pairs for _, ae, _ in pairs})
+        ae_ids = {ae: k for k, ae in enumerate(self.cadec_aes)}
+        a_rows = [(d, ae_ids[ae]) for d, pairs in enumerate(drug_pairs) for ae in {ae for _, ae, _ in pairs}]
+        self.A = self._matrix(a_rows, [1.0] * len(a_rows), (len(self.drugs), len(self.cadec_aes)))
+
+        mapping = session.build_cadec_ae_oae_mapping(self.cadec_aes, n_cadec, cadec_ae_threshold)
+        # OAE id space: graph nodes in graph order, then any index label that is not a graph node
+        self.oae_nodes: List[str] = list(session.oae_graph.nodes())
+        self.oae_ids: Dict[str, int] = {o: i for i, o in enumerate(self.oae_nodes)}
+        s_rows, s_vals = [], []
+        self_ae, self_sim = {}, {}
+        for ae, cands in mapping.items():
+            for oae, sim in cands:
+                s_rows.append((ae_ids[ae], self._oae_id(oae)))
+                s_vals.append(sim)
+                if ae == oae:
+                    self_ae[s_rows[-1][1]], self_sim[s_rows[-1][1]] = ae_ids[ae], sim
+        self.S = self._matrix(s_rows, s_vals, (len(self.cadec_aes), len(self.oae_nodes)))
+        # Candidates reached through any CADEC AE; zeros stay stored so they still make paths
+        self.B = max_product(self.A, self.S, lambda x, y: np.zeros_like(y))
+        rows = np.repeat(np.arange(self.B.shape[0]), np.diff(self.B.indptr))
+        for t in np.flatnonzero(np.isin(self.B.indices, list(self_ae))):
+            o = int(self.B.indices[t])
+            if self.A[rows[t], self_ae[o]]:
+                self.B.data[t] = self_sim[o]
+        self.R = self._reachability()
+
+    def _oae_id(self, oae: str) -> int:
+        if oae not in self.oae_ids:
+            self.oae_ids[oae] = len(self.oae_nodes)
+            self.oae_nodes.append(oae)
+        return self.oae_ids[oae]
+
+    @staticmethod
+    def _matrix(coords, vals, shape) -> sp.csr_matrix:
+        if not coords:
+            return sp.csr_matrix(shape, dtype=np.float64)
+        i, j = zip(*coords)
+        # COO -> CSR sums duplicates; coordinates here are unique by construction
+        return sp.csr_matrix((np.asarray(vals, dtype=np.float64), (i, j)), shape=shape)
+
+    def _reachability(self) -> sp.csr_matrix:
+        G, n = self.session.oae_graph, len(self.oae_nodes)
+        n_graph = G.number_of_nodes()
+        coords = [(o, o) for o in range(n)]
+        if self.max_hops <= 1:
+            for u in range(n_graph):
+                coords.extend((u, self.oae_ids[v]) for v in G.successors(self.oae_nodes[u]))
+        else:
+            reach = self.session.oae_reach
+            if reach is None or reach.max_depth < self.max_hops:
+                sources = [self.oae_nodes[o] for o in np.unique(self.B.indices) if o < n_graph]
+                reach = ReachabilityIndex.build(G, self.max_hops, sources=sources)
+            for u in range(n_graph):
+                lo, hi = int(reach.indptr[u]), int(reach.indptr[u + 1])
+                near = reach.dists[lo:hi] <= self.max_hops
+                coords.extend((u, int(v)) for v in reach.targets[lo:hi][near])
+        coords = list(dict.fromkeys(coords))
+        return self._matrix(coords, [1.0] * len(coords), (n, n))
+
+    def input_similarities(self, ae_input_list: Sequence[str], n_input: int = 5,
+                           input_ae_threshold: float = 0.7) -> Tuple[List[Tuple[str, str, float]], sp.csr_matrix]:
+        oae_input = self.session.build_input_ae_oae_list(list(ae_input_list), n_input, input_ae_threshold)
+        cols = {ae: i for i, ae in enumerate(ae_input_list)}
+        sims: Dict[Tuple[int, int], float] = {}
+        for inp, oae, sim in oae_input:
+            # The per-query pipeline keeps the last similarity seen for an (input, OAE) pair
+            sims[(self._oae_id(oae), cols[inp])] = sim
+        n = len(self.oae_nodes)
+        if self.R.shape[0] < n:
+            # Index labels first seen here are only reachable from themselves
+            self.R = sp.block_diag([self.R, sp.identity(n - self.R.shape[0])], format="csr")
+            self.B = sp.csr_matrix((self.B.data, self.B.indices, self.B.indptr), shape=(self.B.shape[0], n))
+        T = self._matrix(list(sims), list(sims.values()), (n, len(ae_input_list)))
+        return oae_input, T
+
+    def score(self, ae_input_list: Sequence[str], n_input: int = 5, input_ae_threshold: float = 0.7) -> np.ndarray:
+        """
+        Dense (n_drugs x n_inputs) matrix of best path scores; -inf where no path exists.
+        Row order is `self.drugs`, column order is `ae_input_list`.
+        """
+        ae_input_list = list(dict.fromkeys(ae_input_list))
+        _, T = self.input_similarities(ae_input_list, n_input, input_ae_threshold)
+        M = max_product(self.R, T, lambda x, y: y)
+        scores = max_product(self.B, M, np.add)
+        out = np.full(scores.shape, -np.inf)
+        coo = scores.tocoo()
+        out[coo.row, coo.col] = coo.data
+        return out
+
+    def explain(self, row: int, input_ae: str, n_paths: int = 5, n_input: int = 5,
+                input_ae_threshold: float = 0.7) -> List[Dict[str, object]]:
+        """Top paths behind one cell of `score`, as verbalizer records (best first)."""
+        node_id, label, cuis = self.drugs[row]
+        cadec_pairs = collect_cadec_ae_pairs([(node_id, label, cuis)], self.session.cadec_kg)
+        cadec_pairs, cadec_ae_oae = self.session.drug_context(label, self.n_cadec, self.cadec_ae_threshold,
+                                                              cadec_pairs)
+        oae_input = self.session.build_input_ae_oae_list([input_ae], n_input, input_ae_threshold)
+        index = PathIndex(cadec_ae_oae, oae_input, cadec_pairs)
+        top = top_drug_to_input_ae_paths(label, cadec_ae_oae, oae_input, self.session.oae_graph, n_paths,
+                                         self.max_hops, self.session.oae_reach, index)
+        return list(iter_path_records(label, cadec_pairs, cadec_ae_oae, oae_input, top, index))
+
+    def verbalize(self, row: int, input_ae: str, **kwargs) -> List[str]:
+        return [render_path_record(r) for r in self.explain(row, input_ae, **kwargs)]
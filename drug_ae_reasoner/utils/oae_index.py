@@ -0,0 +1,123 @@
+import os
+import json
+import math
+from typing import Dict, Optional
+import numpy as np
+
+# Every type indexes L2-normalized SapBERT vectors. "l2" indexes return squared L2
+# distances (similarity = 1 - D / 2); "ip" indexes return the cosine directly.
+INDEX_TYPES: Dict[str, str] = {
+    "flat_l2": "l2",   # exact, the original index
+    "flat_ip": "ip",   # exact, scores are similarities
+    "hnsw": "ip",      # graph-based approximate search, full vectors
+    "ivfpq": "l2",     # inverted lists + product quantization, smallest
+    "sq8": "ip",       # 8-bit scalar quantization, 4x smaller
+    "fp16": "ip",      # float16 scalar quantization, 2x smaller
+}
+
+# faiss.METRIC_INNER_PRODUCT, so score conversion does not need to import faiss
+METRIC_INNER_PRODUCT = 0
+
+DEFAULT_PARAMS: Dict[str, Dict[str, object]] = {
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 128},
+    "ivfpq": {"nlist": None, "pq_m": None, "nbits": 8, "nprobe": 16},
+}
+
+# Index parameters that only affect search and can be changed after loading
+SEARCH_PARAMS = {"nprobe": "nprobe", "ef_search": "efSearch"}
+
+def meta_path_for(index_path: str) -> str:
+    return index_path + ".json"
+
+def similarities(index, D: np.ndarray) -> np.ndarray:
+    """Convert the distances returned by `index.search` to cosine similarities."""
+    if getattr(index, "metric_type", None) == METRIC_INNER_PRODUCT:
+        return D
+    return 1.0 - D / 2.0
+
+def _pq_m(dim: int) -> int:
+    # Largest divisor of dim giving sub-vectors of at least 8 dimensions, capped at 64 codes
+    for m in range(min(64, max(1, dim // 8)), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def resolve_params(index_type: str, dim: int, n: int, **params) -> Dict[str, object]:
+    """Fill in defaults, sizing IVF-PQ from the number of vectors and the dimension."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; choose from {', '.join(INDEX_TYPES)}")
+    resolved = dict(DEFAULT_PARAMS.get(index_type, {}))
+    resolved.update({k: v for k, v in params.items() if v is not None and k in resolved})
+    if index_type == "ivfpq":
+        if resolved["nlist"] is None:
+            resolved["nlist"] = max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+        if resolved["pq_m"] is None:
+            resolved["pq_m"] = _pq_m(dim)
+        # k-means needs at least 2^nbits training points per sub-quantizer
+        resolved["nbits"] = max(1, min(resolved["nbits"], int(math.log2(max(n, 2)))))
+        resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+    return resolved
+
+def make_index(index_type: str, dim: int, params: Dict[str, object]):
+    """An empty (possibly untrained) FAISS index of `index_type` for `dim`-dimensional vectors."""
+    import faiss
+    if index_type == "flat_l2":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "flat_ip":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+    if index_type == "ivfpq":
+        quantizer = faiss.IndexFlatL2(dim)
+        # faiss keeps a reference to the quantizer for the lifetime of the index
+        return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["nbits"])
+    qtype = faiss.ScalarQuantizer.QT_8bit if index_type == "sq8" else faiss.ScalarQuantizer.QT_fp16
+    return faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+
+def build_index(index_type: str, vectors: np.ndarray, chunk_size: int = 4096, train_size: int = 100000,
+                seed: int = 0, **params):
+    """
+    Build an `index_type` index over `vectors` (an array or memmap), training on a
+    random sample of at most `train_size` rows and adding the rows chunk by chunk.
+    Returns (index, meta).
+    """
+    n, dim = vectors.shape
+    resolved = resolve_params(index_type, dim, n, **params)
+    index = make_index(index_type, dim, resolved)
+    if not index.is_trained:
+        rows = np.sort(np.random.default_rng(seed).choice(n, size=min(n, train_size), replace=False))
+        index.train(np.ascontiguousarray(vectors[rows], dtype=np.float32))
+    for start in range(0, n, chunk_size):
+        index.add(np.ascontiguousarray(vectors[start:start + chunk_size], dtype=np.float32))
+    meta = {"type": index_type, "metric": INDEX_TYPES[index_type], "dim": int(dim), "n": int(n), "params": resolved}
+    apply_search_params(index, meta)
+    return index, meta
+
+def apply_search_params(index, meta: Dict[str, object], **overrides):
+    """Set nprobe / efSearch on a loaded index from its metadata, or from `overrides` when given."""
+    params = dict(meta.get("params", {}))
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    names = {name: params[key] for key, name in SEARCH_PARAMS.items() if params.get(key) is not None}
+    if not names:
+        return index
+    import faiss
+    space = faiss.ParameterSpace()
+    for name, value in names.items():
+        space.set_index_parameter(index, name, value)
+    return index
+
+def save_index(index, meta: Dict[str, object], index_path: str):
+    import faiss
+    faiss.write_index(index, index_path)
+    with open(meta_path_for(index_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+def load_index_meta(index_path: str) -> Optional[Dict[str, object]]:
+    """The metadata written next to the index, or None for indexes built before it existed (flat L2)."""
+    path = meta_path_for(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -1,47 +1,168 @@
-import pickle
-import networkx as nx
-from typing import List, Tuple, Dict, DefaultDict
-from collections import defaultdict
-from .similarity_search import build_input_ae_oae_list, build_cadec_ae_oae_mapping
-from ..data.cadec_loader import get_cadec_ae_pairs, get_cadec_drug_nodes
-from .verbalizer import verbalize_drug_to_input_ae_paths
+import heapq
+from typing import List, Tuple, Dict, Optional, TYPE_CHECKING
+from ..data.csr_graph import load_graph
+from .reachability import ReachabilityIndex, shortest_path
+
+if TYPE_CHECKING:
+    import networkx as nx
 
 def find_drug_to_input_ae_paths(drug_label: str,
                                 cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
                                 oae_input_list: List[Tuple[str, str, float]],
-                                graph_path: str) -> List[Tuple[str, str, List[str]]]:
-    with open(graph_path, "rb") as f:
-        G: nx.Graph = pickle.load(f)
+                                graph_path: str, max_hops: int = 1) -> List[Tuple[str, str, List[str]]]:
+    G = load_graph(graph_path)
+    return search_drug_to_input_ae_paths(drug_label, cadec_ae_oae_dict, oae_input_list, G, max_hops)
+
+class OAEConnector:
+    """
+    Answers "is oae_in reachable from oae_cand within max_hops?" and returns the
+    OAE node path. One hop is a direct has_edge check; longer searches use a
+    ReachabilityIndex (built on the fly from the candidate nodes if none is given)
+    and reconstruct the path with a bounded BFS.
+    """
+
+    def __init__(self, G: "nx.Graph", max_hops: int = 1, reach: ReachabilityIndex = None):
+        self.G = G
+        self.max_hops = max_hops
+        self.reach = reach
+        self._memo: Dict[Tuple[str, str], List[str]] = {}
+
+    def prepare(self, sources):
+        if self.max_hops > 1 and (self.reach is None or self.reach.max_depth < self.max_hops):
+            self.reach = ReachabilityIndex.build(self.G, self.max_hops, sources=sources)
+
+    def path(self, oae_cand: str, oae_in: str):
+        key = (oae_cand, oae_in)
+        if key not in self._memo:
+            if oae_cand == oae_in:
+                found = [oae_cand]
+            elif self.max_hops <= 1:
+                found = [oae_cand, oae_in] if self.G.has_edge(oae_cand, oae_in) else None
+            else:
+                d = self.reach.distance(oae_cand, oae_in)
+                found = shortest_path(self.G, oae_cand, oae_in, d) if d is not None and d <= self.max_hops else None
+            self._memo[key] = found
+        return self._memo[key]
 
+def search_drug_to_input_ae_paths(drug_label: str,
+                                  cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
+                                  oae_input_list: List[Tuple[str, str, float]],
+                                  G: "nx.Graph", max_hops: int = 1,
+                                  reach: ReachabilityIndex = None) -> List[Tuple[str, str, List[str]]]:
     paths = []
     input_map: Dict[str, List[str]] = {}
     for inp_label, oae_node, _ in oae_input_list:
         input_map.setdefault(inp_label, []).append(oae_node)
 
+    connector = OAEConnector(G, max_hops, reach)
+    connector.prepare({oae for lst in cadec_ae_oae_dict.values() for oae, _ in lst})
     for cadec_ae, oae_candidates in cadec_ae_oae_dict.items():
         for oae_cand, _ in oae_candidates:
             for inp_label, oae_in_nodes in input_map.items():
                 for oae_in in oae_in_nodes:
-                    if oae_cand == oae_in:
-                        paths.append((drug_label, inp_label, [oae_cand]))
-                    elif G.has_edge(oae_cand, oae_in):
-                        paths.append((drug_label, inp_label, [oae_cand, oae_in]))
+                    path_nodes = connector.path(oae_cand, oae_in)
+                    if path_nodes is not None:
+                        paths.append((drug_label, inp_label, list(path_nodes)))
     return paths
 
-def rank_drug_ae_paths(raw_paths, cadec_ae_oae_dict, oae_input_list, n_paths=5):
-    cadec_sim = {(ae, oae): sim for ae, lst in cadec_ae_oae_dict.items() for oae, sim in lst}
-    input_sim = {(inp, oae): sim for inp, oae, sim in oae_input_list}
+class PathIndex:
+    """
+    Lookup tables shared by path ranking and verbalization, built once per query:
+    OAE node -> the similarity keyed by (node, node) that ranking scores with, OAE node ->
+    first CADEC AE listing it (verbalized) and best CADEC AE (AE fallback),
+    (input AE, OAE node) -> similarity, and CADEC AE -> CUI string.
+    """
+
+    def __init__(self, cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
+                 oae_input_list: List[Tuple[str, str, float]],
+                 cadec_pairs: List[Tuple[str, str, str]] = ()):
+        self.best_cadec: Dict[str, Tuple[str, float]] = {}
+        self.first_cadec: Dict[str, Tuple[str, float]] = {}
+        self.self_sim: Dict[str, float] = {}
+        for ae, lst in cadec_ae_oae_dict.items():
+            for oae, sim in lst:
+                best = self.best_cadec.get(oae)
+                if best is None or sim > best[1]:
+                    self.best_cadec[oae] = (ae, sim)
+                self.first_cadec.setdefault(oae, (ae, sim))
+                if ae == oae:
+                    self.self_sim[oae] = sim
+        self.input_sim = {(inp, oae): sim for inp, oae, sim in oae_input_list}
+        self.cui_map = {ae: cui for _, ae, cui in cadec_pairs}
+
+    def cadec_for(self, oae: str) -> Tuple[Optional[str], float]:
+        return self.best_cadec.get(oae, (None, 0.0))
+
+    def score(self, inp_label: str, path_nodes: List[str]) -> float:
+        return self.self_sim.get(path_nodes[0], 0.0) + self.input_sim.get((inp_label, path_nodes[-1]), 0.0)
+
+def rank_drug_ae_paths(raw_paths, cadec_ae_oae_dict, oae_input_list, n_paths=5, index: PathIndex = None):
+    index = index or PathIndex(cadec_ae_oae_dict, oae_input_list)
     scored = []
     for drug_label, inp_label, path_nodes in raw_paths:
-        oae_cand = path_nodes[0]
-        oae_in = path_nodes[-1]
-        sim1 = cadec_sim.get((path_nodes[0], oae_cand), 0.0)
-        sim2 = input_sim.get((inp_label, oae_in), 0.0)
-        score = sim1 + sim2
-        scored.append((drug_label, inp_label, path_nodes, score))
+        scored.append((drug_label, inp_label, path_nodes, index.score(inp_label, path_nodes)))
     scored.sort(key=lambda x: x[3], reverse=True)
     return scored[:n_paths]
 
+def top_drug_to_input_ae_paths(drug_label: str,
+                               cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
+                               oae_input_list: List[Tuple[str, str, float]],
+                               G: "nx.Graph", n_paths: int = 5, max_hops: int = 1,
+                               reach: ReachabilityIndex = None,
+                               index: PathIndex = None) -> List[Tuple[str, str, List[str], float]]:
+    """
+    Best-first equivalent of `rank_drug_ae_paths(search_drug_to_input_ae_paths(...))`.
+
+    A path's score is fully determined by its (OAE candidate, input OAE node) pair,
+    so pairs are visited in non-increasing score order over the two lists sorted by
+    similarity, and connectivity is only checked for pairs that can still make the
+    top `n_paths`. Pairs with equal scores are emitted in the order the exhaustive
+    search would produce them, so the result is identical to the sorted list.
+    """
+    if n_paths is None or n_paths < 0:
+        raw_paths = search_drug_to_input_ae_paths(drug_label, cadec_ae_oae_dict, oae_input_list, G, max_hops, reach)
+        return rank_drug_ae_paths(raw_paths, cadec_ae_oae_dict, oae_input_list, n_paths, index)
+    index = index or PathIndex(cadec_ae_oae_dict, oae_input_list)
+
+    input_map: Dict[str, List[str]] = {}
+    for inp_label, oae_node, _ in oae_input_list:
+        input_map.setdefault(inp_label, []).append(oae_node)
+    # Both lists are kept in exhaustive-search order; their positions are the tie-break keys
+    cands = [oae_cand for oae_candidates in cadec_ae_oae_dict.values() for oae_cand, _ in oae_candidates]
+    targets = [(inp_label, oae_in) for inp_label, nodes in input_map.items() for oae_in in nodes]
+    if not cands or not targets or n_paths == 0:
+        return []
+    s1 = [index.self_sim.get(c, 0.0) for c in cands]
+    s2 = [index.input_sim.get(t, 0.0) for t in targets]
+    order1 = sorted(range(len(cands)), key=lambda i: -s1[i])
+    order2 = sorted(range(len(targets)), key=lambda j: -s2[j])
+
+    connector = OAEConnector(G, max_hops, reach)
+    connector.prepare(set(cands))
+    pair_score = lambda a, b: s1[order1[a]] + s2[order2[b]]
+    heap = [(-pair_score(0, 0), 0, 0)]
+    seen = {(0, 0)}
+    top: List[Tuple[str, str, List[str], float]] = []
+    while heap and len(top) < n_paths:
+        # Pop every pair tied at the current best score before ordering and checking them
+        score = -heap[0][0]
+        tied = []
+        while heap and -heap[0][0] == score:
+            _, a, b = heapq.heappop(heap)
+            tied.append((order1[a], order2[b]))
+            for na, nb in ((a + 1, b), (a, b + 1)):
+                if na < len(order1) and nb < len(order2) and (na, nb) not in seen:
+                    seen.add((na, nb))
+                    heapq.heappush(heap, (-pair_score(na, nb), na, nb))
+        for i, j in sorted(tied):
+            inp_label, oae_in = targets[j]
+            path_nodes = connector.path(cands[i], oae_in)
+            if path_nodes is not None:
+                top.append((drug_label, inp_label, list(path_nodes), score))
+                if len(top) == n_paths:
+                    break
+    return top
+
 def generate_fallback_drug_paths(drug_label, cadec_pairs, cadec_ae_oae_dict, n_disconnect):
     edges = [(ae_c, oae, sim) for ae_c, neigh in cadec_ae_oae_dict.items() for oae, sim in neigh]
     edges.sort(key=lambda x: x[2], reverse=True)
@@ -51,20 +172,16 @@ def generate_fallback_drug_paths(drug_label, cadec_pairs, cadec_ae_oae_dict, n_d
         fallback.append((drug_label, fallback_label, [oae], sim))
     return fallback
 
-def generate_fallback_ae_paths(ae_input_list, cadec_pairs, cadec_ae_oae_dict, oae_input_list, n_disconnect):
-    rev: DefaultDict[str, List[Tuple[str, float]]] = defaultdict(list)
-    for ca, neigh in cadec_ae_oae_dict.items():
-        for oae, s in neigh:
-            rev[oae].append((ca, s))
-
+def generate_fallback_ae_paths(ae_input_list, cadec_pairs, cadec_ae_oae_dict, oae_input_list, n_disconnect,
+                               index: PathIndex = None):
+    index = index or PathIndex(cadec_ae_oae_dict, oae_input_list)
     fallback = []
     for inp_ae in ae_input_list:
         neighbors = [(i, o, s) for i, o, s in oae_input_list if i == inp_ae]
         neighbors.sort(key=lambda x: x[2], reverse=True)
         for _, oae, sim_inp in neighbors[:n_disconnect]:
-            candidates = rev.get(oae, [])
-            if candidates:
-                cae, _ = max(candidates, key=lambda x: x[1])
+            cae, _ = index.cadec_for(oae)
+            if cae is not None:
                 parents = [d for d, ae, _ in cadec_pairs if ae == cae]
                 drug2 = parents[0] if parents else "__no_drug2__"
             else:
@@ -76,22 +193,32 @@ def find_top_drug_to_input_ae_paths(drug, ae_input_list, rx_path, cadec_kg_path,
                                     oae_index_path, oae_label_map_path, oae_graph_path,
                                     n_cadec=5, cadec_ae_threshold=0.7,
                                     n_input=5, input_ae_threshold=0.7,
-                                    n_paths=5, n_disconnect=3):
-    drug_nodes = get_cadec_drug_nodes(drug, rx_path, cadec_kg_path)
-    cadec_pairs = get_cadec_ae_pairs(drug_nodes, cadec_kg_path)
-    ae_cadec_list = sorted({ae for _, ae, _ in cadec_pairs})
-    cadec_ae_oae = build_cadec_ae_oae_mapping(ae_cadec_list, oae_index_path, oae_label_map_path,
-                                              n_cadec, cadec_ae_threshold)
-    oae_input = build_input_ae_oae_list(ae_input_list, oae_index_path, oae_label_map_path,
-                                        n_input, input_ae_threshold)
-    raw_paths = find_drug_to_input_ae_paths(drug, cadec_ae_oae, oae_input, oae_graph_path)
-    top_paths = rank_drug_ae_paths(raw_paths, cadec_ae_oae, oae_input, n_paths)
-    if top_paths:
-        verb = verbalize_drug_to_input_ae_paths(drug, cadec_pairs, cadec_ae_oae, oae_input, top_paths)
-        return True, top_paths, [], [], verb
-
-    fb_drug = generate_fallback_drug_paths(drug, cadec_pairs, cadec_ae_oae, n_disconnect)
-    fb_ae = generate_fallback_ae_paths(ae_input_list, cadec_pairs, cadec_ae_oae, oae_input, n_disconnect)
-    all_fb = fb_drug + fb_ae
-    verb_fb = verbalize_drug_to_input_ae_paths(drug, cadec_pairs, cadec_ae_oae, oae_input, all_fb)
-    return False, [], fb_drug, fb_ae, verb_fb
+                                    n_paths=5, n_disconnect=3, max_hops=1):
+    from .session import ReasonerSession, render_result
+    from . import result_cache as results
+    params = dict(n_cadec=n_cadec, cadec_ae_threshold=cadec_ae_threshold, n_input=n_input,
+                  input_ae_threshold=input_ae_threshold, n_paths=n_paths, n_disconnect=n_disconnect,
+                  max_hops=max_hops)
+    # A repeated query is answered from the cache without loading any artifact
+    stamp = results.artifact_stamp(rx_path, cadec_kg_path, oae_index_path, oae_label_map_path, oae_graph_path)
+    _, entry = results.lookup(drug, ae_input_list, params, stamp)
+    if entry is not None:
+        return render_result(drug, *entry)
+    session = ReasonerSession(rx_path, cadec_kg_path, oae_index_path, oae_label_map_path, oae_graph_path)
+    return session.query(drug, ae_input_list, **params)
+
+def find_top_paths_for_drugs(drugs, ae_input_list, rx_path, cadec_kg_path,
+                             oae_index_path, oae_label_map_path, oae_graph_path,
+                             n_cadec=5, cadec_ae_threshold=0.7,
+                             n_input=5, input_ae_threshold=0.7,
+                             n_paths=5, n_disconnect=3, max_hops=1):
+    """
+    `find_top_drug_to_input_ae_paths` for several drugs against one AE list, sharing the
+    input-AE and CADEC AE -> OAE searches. See `ReasonerSession.query_many` for the result.
+    """
+    from .session import ReasonerSession
+    session = ReasonerSession(rx_path, cadec_kg_path, oae_index_path, oae_label_map_path, oae_graph_path)
+    return session.query_many(drugs, ae_input_list,
+                              n_cadec=n_cadec, cadec_ae_threshold=cadec_ae_threshold,
+                              n_input=n_input, input_ae_threshold=input_ae_threshold,
+                              n_paths=n_paths, n_disconnect=n_disconnect, max_hops=max_hops)
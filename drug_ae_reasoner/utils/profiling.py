@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Peak RSS comes from getrusage where it exists (not on Windows), else from psutil if installed
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# The active Profiler, or None. Instrumented code only checks this global, so with
+# profiling off a span is one function call returning a shared no-op context manager.
+_active: Optional["Profiler"] = None
+
+def max_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None where it cannot be measured."""
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return rss if sys.platform == "darwin" else rss * 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # peak_wset is the peak working set on Windows; elsewhere fall back to the current RSS
+        return getattr(info, "peak_wset", info.rss)
+    return None
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else n / 2 ** 20
+
+def _fmt_mb(mb: Optional[float], width: int) -> str:
+    return f"{'n/a':>{width}}" if mb is None else f"{mb:>{width}.1f}"
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start", "rss")
+
+    def __init__(self, profiler: "Profiler", name: str, args: Optional[Dict[str, object]]):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.rss = max_rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        rss = None if self.rss is None else max_rss_bytes() - self.rss
+        self.profiler._record(self.name, self.start, end, rss, self.args)
+        return False
+
+class Profiler:
+    """
+    Collects timed spans and counters from the instrumented pipeline stages:
+    per-stage wall time and call counts, how much each stage raised the process's
+    peak RSS, cache hit/miss counters, and a Chrome trace of every span.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events: List[tuple] = []
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _record(self, name, start, end, rss_growth, args):
+        with self._lock:
+            self.events.append((name, start, end, rss_growth, threading.get_ident(), args))
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def stages(self) -> List[Dict[str, object]]:
+        """Per-span-name totals, in order of first appearance."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for name, start, end, rss_growth, _, _ in sorted(self.events, key=lambda e: e[1]):
+            s = stats.setdefault(name, {"name": name, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rss_growth_mb": 0.0})
+            ms = (end - start) * 1e3
+            s["calls"] += 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+            # None once any span of the stage could not measure RSS
+            if s["rss_growth_mb"] is not None:
+                s["rss_growth_mb"] = None if rss_growth is None else s["rss_growth_mb"] + rss_growth / 2 ** 20
+        for s in stats.values():
+            s["mean_ms"] = s["total_ms"] / s["calls"]
+        return list(stats.values())
+
+    def cache_hit_rates(self) -> Dict[str, float]:
+        """Hit rate of every cache reported through `<cache>.hit` / `<cache>.miss` counters."""
+        rates = {}
+        for key in self.counters:
+            if key.endswith(".hit"):
+                cache = key[:-len(".hit")]
+                total = self.counters[key] + self.counters.get(cache + ".miss", 0)
+                rates[cache] = self.counters[key] / total if total else 0.0
+        return rates
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "wall_ms": (time.perf_counter() - self.started) * 1e3,
+            "peak_rss_mb": _mb(max_rss_bytes()),
+            "stages": self.stages(),
+            "counters": dict(self.counters),
+            "cache_hit_rates": self.cache_hit_rates(),
+        }
+
+    def format_breakdown(self) -> str:
+        report = self.report()
+        lines = [f"{'stage':<28}{'calls':>7}{'total ms':>12}{'mean ms':>10}{'max ms':>10}{'+rss MB':>9}"]
+        for s in report["stages"]:
+            lines.append(f"{s['name']:<28}{s['calls']:>7}{s['total_ms']:>12.2f}{s['mean_ms']:>10.2f}"
+                         f"{s['max_ms']:>10.2f}{_fmt_mb(s['rss_growth_mb'], 9)}")
+        for cache, rate in sorted(report["cache_hit_rates"].items()):
+            hits, misses = self.counters[cache + ".hit"], self.counters.get(cache + ".miss", 0)
+            lines.append(f"cache {cache}: {rate:.1%} hits ({hits} hit / {misses} miss)")
+        others = {k: v for k, v in sorted(report["counters"].items()) if not k.endswith((".hit", ".miss"))}
+        if others:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in others.items()))
+        peak = report["peak_rss_mb"]
+        lines.append(f"wall {report['wall_ms']:.1f} ms, peak RSS " + ("n/a" if peak is None else f"{peak:.1f} MB"))
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, object]:
+        """Trace Event Format (chrome://tracing, Perfetto); the summary rides along under `otherData`."""
+        pid = os.getpid()
+        events = []
+        for name, start, end, rss_growth, tid, args in self.events:
+            event = {"name": name, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": (start - self.started) * 1e6, "dur": (end - start) * 1e6}
+            event["args"] = dict(args or {}, rss_growth_mb=_mb(rss_growth))
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.report()}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+def span(name: str, **args):
+    """Time the enclosed block as stage `name` when a profiler is active; a no-op otherwise."""
+    profiler = _active
+    if profiler is None:
+        return _NULL_SPAN
+    return _Span(profiler, name, args or None)
+
+def count(name: str, n: int = 1):
+    profiler = _active
+    if profiler is not None:
+        profiler.count(name, n)
+
+def enabled() -> bool:
+    return _active is not None
+
+@contextmanager
+def profile(profiler: Profiler = None):
+    """
+    Collect spans from everything run inside the block, e.g.
+
+        with profile() as prof:
+            session.query("lipitor", ["nausea"])
+        print(prof.format_breakdown())
+    """
+    global _active
+    previous, _active = _active, profiler or Profiler()
+    try:
+        yield _active
+    finally:
+        _active = previous
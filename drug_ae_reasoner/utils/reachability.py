@@ -0,0 +1,127 @@
+import os
+import json
+from collections import deque
+from typing import Iterable, List, Optional
+import numpy as np
+from .string_table import StringTable
+
+UNBOUNDED = 255
+
+class ReachabilityIndex:
+    """
+    Precomputed descendant->ancestor closure of a directed graph.
+
+    Row i holds every node reachable from node i (following edge direction,
+    i.e. up the subClassOf hierarchy) within `max_depth` hops, sorted by node
+    id, together with the minimum hop count. A k-hop connectivity check is one
+    binary search in a short row.
+    """
+
+    def __init__(self, nodes: StringTable, indptr: np.ndarray, targets: np.ndarray,
+                 dists: np.ndarray, max_depth: int, n_edges: int):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.targets = targets
+        self.dists = dists
+        self.max_depth = max_depth
+        self.n_edges = n_edges
+        self._ids = {key: i for i, key in enumerate(nodes)}
+
+    @classmethod
+    def build(cls, G, max_depth: Optional[int] = None, sources: Optional[Iterable[str]] = None) -> "ReachabilityIndex":
+        """
+        BFS from every node (or only from `sources`) up to `max_depth` hops.
+        Rows for nodes that are not sources are left empty.
+        """
+        keys = list(G.nodes())
+        ids = {k: i for i, k in enumerate(keys)}
+        limit = UNBOUNDED if max_depth is None else min(max_depth, UNBOUNDED)
+        wanted = set(ids) if sources is None else {s for s in sources if s in ids}
+
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        targets: List[np.ndarray] = []
+        dists: List[np.ndarray] = []
+        for i, src in enumerate(keys):
+            if src in wanted:
+                seen = {src: 0}
+                queue = deque([src])
+                while queue:
+                    node = queue.popleft()
+                    d = seen[node]
+                    if d >= limit:
+                        continue
+                    for nxt in G.successors(node):
+                        if nxt not in seen:
+                            seen[nxt] = d + 1
+                            queue.append(nxt)
+                del seen[src]
+                row = sorted((ids[n], d) for n, d in seen.items())
+                targets.append(np.array([t for t, _ in row], dtype=np.int32))
+                dists.append(np.array([d for _, d in row], dtype=np.uint8))
+                indptr[i + 1] = indptr[i] + len(row)
+            else:
+                indptr[i + 1] = indptr[i]
+        cat = lambda parts, dt: np.concatenate(parts) if parts else np.zeros(0, dtype=dt)
+        return cls(StringTable.from_strings(keys), indptr, cat(targets, np.int32), cat(dists, np.uint8),
+                   limit, G.number_of_edges())
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.nodes.save(os.path.join(path, "nodes"))
+        np.save(os.path.join(path, "indptr.npy"), self.indptr)
+        np.save(os.path.join(path, "targets.npy"), self.targets)
+        np.save(os.path.join(path, "dists.npy"), self.dists)
+        meta = {"max_depth": self.max_depth, "n_nodes": len(self.nodes), "n_edges": self.n_edges,
+                "n_pairs": int(len(self.targets))}
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "ReachabilityIndex":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(StringTable.load(os.path.join(path, "nodes")),
+                   np.load(os.path.join(path, "indptr.npy"), mmap_mode="r"),
+                   np.load(os.path.join(path, "targets.npy"), mmap_mode="r"),
+                   np.load(os.path.join(path, "dists.npy"), mmap_mode="r"),
+                   meta["max_depth"], meta["n_edges"])
+
+    def matches(self, G) -> bool:
+        """True if this index was built from a graph with the same nodes, in order, and edge count as G."""
+        return self.n_edges == G.number_of_edges() and len(self.nodes) == G.number_of_nodes() \
+            and all(a == b for a, b in zip(self.nodes, G.nodes()))
+
+    def distance(self, u: str, v: str) -> Optional[int]:
+        """Minimum number of hops from u to v, or None if v is not reachable within max_depth."""
+        i, j = self._ids.get(u), self._ids.get(v)
+        if i is None or j is None:
+            return None
+        if i == j:
+            return 0
+        row = self.targets[self.indptr[i]:self.indptr[i + 1]]
+        k = int(np.searchsorted(row, j))
+        if k < len(row) and row[k] == j:
+            return int(self.dists[self.indptr[i] + k])
+        return None
+
+def shortest_path(G, u: str, v: str, max_hops: int) -> Optional[List[str]]:
+    """First shortest path u -> ... -> v in successor order, at most `max_hops` edges long."""
+    if u == v:
+        return [u]
+    parent = {u: None}
+    frontier = [u]
+    for _ in range(max_hops):
+        nxt_frontier = []
+        for node in frontier:
+            for nxt in G.successors(node):
+                if nxt in parent:
+                    continue
+                parent[nxt] = node
+                if nxt == v:
+                    path = [v]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    return path[::-1]
+                nxt_frontier.append(nxt)
+        frontier = nxt_frontier
+    return None
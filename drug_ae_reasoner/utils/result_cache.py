@@ -0,0 +1,214 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from ..config import RESULT_CACHE_SIZE, RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+from ..data.csr_graph import resolve_graph_path
+from .encoding import STORE_KEY
+from .oae_index import meta_path_for
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+def path_stamp(path: str):
+    """Size and mtime of a file, of every file under a directory, or None if the path is missing."""
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    if os.path.isdir(path):
+        return {os.path.relpath(os.path.join(root, name), path): path_stamp(os.path.join(root, name))
+                for root, _, files in os.walk(path) for name in sorted(files)}
+    return None
+
+def artifact_stamp(rx_path: str, cadec_kg_path: str, oae_index_path: str, oae_label_map_path: str,
+                   oae_graph_path: str) -> str:
+    """
+    Digest of the five query artifacts (plus the index metadata and the encoder); changes
+    whenever one is rebuilt. Graphs are stamped as `load_graph` will read them (pickle or CSR copy).
+    """
+    stamp = {
+        "rxnorm": path_stamp(rx_path), "cadec_kg": path_stamp(resolve_graph_path(cadec_kg_path)),
+        "oae_index": path_stamp(oae_index_path), "oae_index_meta": path_stamp(meta_path_for(oae_index_path)),
+        "oae_labels": path_stamp(oae_label_map_path), "oae_graph": path_stamp(resolve_graph_path(oae_graph_path)),
+        "encoder": STORE_KEY,
+    }
+    return hashlib.sha256(json.dumps(stamp, sort_keys=True).encode("utf-8")).hexdigest()
+
+# Layout of the cached values (see `session.render_result`); part of every key
+ENTRY_FORMAT = 2
+
+def canonical_query(drug: str, ae_input_list: Sequence[str]) -> Tuple[str, List[str]]:
+    """
+    The form a query is keyed by: the drug lower-cased, as RxNorm matching sees it, and
+    the AEs as given, whose order and repeats decide tie-breaks and fallbacks.
+    """
+    return drug.lower(), list(ae_input_list)
+
+def query_key(drug: str, ae_input_list: Sequence[str], params: Dict[str, object], stamp: str) -> str:
+    drug, ae_input_list = canonical_query(drug, ae_input_list)
+    payload = json.dumps([drug, ae_input_list, params, stamp, ENTRY_FORMAT], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskResultStore:
+    """
+    One pickle per key under `root`, evicted least-recently-used first (by mtime,
+    refreshed on every hit) once the directory grows past `max_bytes`. Writes are
+    atomic, so forked workers and concurrent processes can share a directory. An
+    unreadable entry is a miss and a failed write is skipped; neither fails a query.
+    """
+
+    def __init__(self, root: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".pkl")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield st.st_mtime_ns, st.st_size, path
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Truncated, corrupt or written by an incompatible version
+            logger.debug(f"Ignoring unreadable result cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry {path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Down to 90% of the budget, so a full store is not rescanned on every put
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in list(self._entries()):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._size = 0
+
+class ResultCache:
+    """
+    Query results keyed by `query_key`: an in-process LRU of `max_size` entries in
+    front of an optional `DiskResultStore`. Cached values are shared, so treat them
+    as read-only. Safe to share between threads.
+    """
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, disk_dir: Optional[str] = RESULT_CACHE_DIR,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_size = max_size
+        self.disk = DiskResultStore(disk_dir, max_bytes) if disk_dir else None
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._remember(key, value)
+                profiling.count("result_cache.disk_hit")
+        profiling.count("result_cache.hit" if value is not None else "result_cache.miss")
+        return value
+
+    def put(self, key: str, value):
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Shared by every session; set to None to disable result caching
+result_cache = ResultCache() if RESULT_CACHE_SIZE > 0 or RESULT_CACHE_DIR else None
+
+def lookup(drug: str, ae_input_list: Sequence[str], params: Dict[str, object], stamp: str):
+    """
+    (key, cached entry or None) for a query, or (None, None) while caching is off.
+    Entries hold the search, not its drug-specific text, so spellings of a drug that
+    share a key each get their own paths and verbalizations from `render_result`.
+    """
+    if result_cache is None:
+        return None, None
+    key = query_key(drug, ae_input_list, params, stamp)
+    return key, result_cache.get(key)
+
+def store(key: Optional[str], result):
+    if key is not None and result_cache is not None:
+        result_cache.put(key, result)
@@ -0,0 +1,301 @@
+import json
+import math
+import time
+import asyncio
+import argparse
+import logging
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..config import (RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH,
+                      SERVE_HOST, SERVE_PORT, ENCODE_MAX_BATCH, ENCODE_MAX_LATENCY_MS, SERVE_MAX_TOP_N,
+                      SERVE_MAX_HOPS)
+from .encoding import embedding_cache, encode_batch, get_model
+from .session import ReasonerSession
+
+logger = logging.getLogger(__name__)
+
+QUERY_PARAMS = {"n_cadec": int, "cadec_ae_threshold": float, "n_input": int, "input_ae_threshold": float,
+                "n_paths": int, "n_disconnect": int, "max_hops": int}
+# Accepted (min, max) of each integer parameter; None leaves that side open
+PARAM_RANGES = {"n_cadec": (1, SERVE_MAX_TOP_N), "n_input": (1, SERVE_MAX_TOP_N), "max_hops": (1, SERVE_MAX_HOPS),
+                "n_paths": (0, None), "n_disconnect": (0, None)}
+
+def _coerce(name: str, value):
+    # JSON numbers only, without truncation: 1.7 is not an int, and true/false are not numbers
+    kind = QUERY_PARAMS[name]
+    if isinstance(value, bool) or not isinstance(value, (int, float) if kind is float else int):
+        raise HTTPError(400, f"Invalid value for {name!r}: {value!r} (expected {kind.__name__})")
+    try:
+        value = kind(value)
+    except OverflowError:  # an integer too large for a float
+        value = math.inf
+    if kind is float and not math.isfinite(value):
+        raise HTTPError(400, f"Invalid value for {name!r}: {value!r} (expected a finite number)")
+    lo, hi = PARAM_RANGES.get(name, (None, None))
+    if (lo is not None and value < lo) or (hi is not None and value > hi):
+        bounds = f">= {lo}" if hi is None else f"between {lo} and {hi}"
+        raise HTTPError(400, f"Invalid value for {name!r}: {value!r} (expected {bounds})")
+    return value
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error"}
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    """
+    Collects the texts that concurrent requests need encoded and runs them as one
+    `encode_batch` call on the model executor, as soon as `max_batch` texts are
+    queued or the oldest waiter has waited `max_latency` seconds. Vectors land in
+    the shared embedding cache, so the search that follows only does lookups.
+    """
+
+    def __init__(self, executor, max_batch: int = ENCODE_MAX_BATCH,
+                 max_latency: float = ENCODE_MAX_LATENCY_MS / 1000.0):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._pending: Dict[str, None] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.texts_encoded = 0
+
+    async def encode(self, texts: Sequence[str]):
+        missing = [t for t in dict.fromkeys(texts) if t not in embedding_cache]
+        if not missing:
+            return
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._pending.update(dict.fromkeys(missing))
+        self._waiters.append(waiter)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._flush)
+        await waiter
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        texts, waiters = list(self._pending), self._waiters
+        self._pending, self._waiters = {}, []
+        if not waiters:
+            return
+        self.batches += 1
+        self.texts_encoded += len(texts)
+        done = asyncio.get_running_loop().run_in_executor(self.executor, encode_batch, texts)
+        done.add_done_callback(lambda task: self._resolve(task, waiters))
+
+    @staticmethod
+    def _resolve(task: asyncio.Future, waiters: List[asyncio.Future]):
+        error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(None)
+
+class Metrics:
+    """Request counters plus latency percentiles and throughput over a sliding window."""
+
+    def __init__(self, window: int = 2048, rate_window_s: float = 60.0):
+        self.started = time.time()
+        self.requests = 0
+        self.status = Counter()
+        self.latencies = deque(maxlen=window)
+        self.rate_window_s = rate_window_s
+        self._recent = deque()
+
+    def observe(self, path: str, status: int, seconds: float):
+        now = time.time()
+        self.requests += 1
+        self.status[str(status)] += 1
+        if path == "/query":
+            self.latencies.append(seconds)
+            self._recent.append(now)
+        while self._recent and self._recent[0] < now - self.rate_window_s:
+            self._recent.popleft()
+
+    def snapshot(self, batcher: MicroBatcher) -> Dict[str, object]:
+        uptime = time.time() - self.started
+        lat = np.array(self.latencies) * 1e3
+        latency = {}
+        if len(lat):
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            latency = {"p50": p50, "p90": p90, "p99": p99, "mean": lat.mean(), "max": lat.max()}
+        return {
+            "uptime_s": round(uptime, 3),
+            "requests": self.requests,
+            "status": dict(self.status),
+            "queries_per_s": round(len(self._recent) / min(self.rate_window_s, max(uptime, 1e-9)), 3),
+            "latency_ms": {k: round(float(v), 3) for k, v in latency.items()},
+            "encoder": {"batches": batcher.batches, "texts": batcher.texts_encoded,
+                        "mean_batch": round(batcher.texts_encoded / batcher.batches, 2) if batcher.batches else 0.0},
+        }
+
+class ReasonerService:
+    """
+    Keeps a ReasonerSession resident and answers POST /query, GET /health and
+    GET /metrics over HTTP/1.1 with keep-alive. Graph search and FAISS run on a
+    thread pool; SapBERT runs on its own single-thread executor behind a MicroBatcher.
+    """
+
+    def __init__(self, session: ReasonerSession, search_threads: int = 4,
+                 max_batch: int = ENCODE_MAX_BATCH, max_latency_ms: float = ENCODE_MAX_LATENCY_MS,
+                 defaults: Dict[str, object] = None):
+        self.session = session
+        self.search_pool = ThreadPoolExecutor(search_threads, thread_name_prefix="search")
+        self.model_pool = ThreadPoolExecutor(1, thread_name_prefix="encode")
+        self.batcher = MicroBatcher(self.model_pool, max_batch, max_latency_ms / 1000.0)
+        self.metrics = Metrics()
+        self.defaults = defaults or {}
+
+    def _cadec_pairs(self, drug: str):
+        return self.session.get_cadec_ae_pairs(self.session.get_cadec_drug_nodes(drug))
+
+    def _records(self, drug: str, aes: List[str], cadec_pairs, params: Dict[str, object]):
+        drug_ctx = self.session.drug_context(drug, params.get("n_cadec", 5), params.get("cadec_ae_threshold", 0.7),
+                                             cadec_pairs)
+        return list(self.session.iter_query_records(drug, aes, drug_ctx=drug_ctx, **params))
+
+    @staticmethod
+    def parse_query(body: bytes) -> Tuple[str, List[str], Dict[str, object]]:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        drug, aes = payload.pop("drug", None), payload.pop("aes", None)
+        if not isinstance(drug, str) or not drug.strip():
+            raise HTTPError(400, "'drug' must be a non-empty string")
+        if not isinstance(aes, list) or not aes or not all(isinstance(ae, str) for ae in aes):
+            raise HTTPError(400, "'aes' must be a non-empty list of strings")
+        params = {}
+        for name, value in payload.items():
+            if name not in QUERY_PARAMS:
+                raise HTTPError(400, f"Unknown parameter {name!r}")
+            params[name] = _coerce(name, value)
+        return drug.strip(), aes, params
+
+    async def query(self, body: bytes) -> Dict[str, object]:
+        drug, aes, params = self.parse_query(body)
+        params = dict(self.defaults, **params)
+        # FAISS never returns more than ntotal hits; a larger k only allocates padding
+        ntotal = max(1, self.session.oae_index.ntotal)
+        for name in ("n_cadec", "n_input"):
+            if name in params:
+                params[name] = min(params[name], ntotal)
+        loop = asyncio.get_running_loop()
+        try:
+            cadec_pairs = await loop.run_in_executor(self.search_pool, self._cadec_pairs, drug)
+        except ValueError as e:
+            raise HTTPError(404, str(e))
+        cadec_labels = sorted({ae for _, ae, _ in cadec_pairs})
+        online = self.session.online_cadec_labels(cadec_labels, params.get("n_cadec", 5),
+                                                  params.get("cadec_ae_threshold", 0.7))
+        await self.batcher.encode(list(aes) + online)
+        paths = await loop.run_in_executor(self.search_pool, self._records, drug, aes, cadec_pairs, params)
+        return {"drug": drug, "aes": aes, "connected": bool(paths) and paths[0]["connected"], "paths": paths}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, object]]:
+        if path == "/query":
+            if method != "POST":
+                raise HTTPError(405, "Use POST /query")
+            return 200, await self.query(body)
+        if path == "/health":
+            return 200, {"status": "ok", "uptime_s": round(time.time() - self.metrics.started, 3)}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot(self.batcher)
+        raise HTTPError(404, f"No route for {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    logger.exception(f"Error while handling {method} {path}")
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                self.metrics.observe(path, status, time.perf_counter() - start)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = SERVE_HOST, port: int = SERVE_PORT):
+        # Load SapBERT before accepting connections so the first request does not pay for it
+        await asyncio.get_running_loop().run_in_executor(self.model_pool, get_model)
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+async def _read_request(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, object], keep_alive: bool):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="drug_ae_reasoner serve",
+                                     description="Serve drug-AE path queries over HTTP with resident artifacts.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--search-threads", type=int, default=4, help="Threads for graph and FAISS search")
+    parser.add_argument("--max-batch", type=int, default=ENCODE_MAX_BATCH, help="Texts per micro-batched encode")
+    parser.add_argument("--max-latency-ms", type=float, default=ENCODE_MAX_LATENCY_MS,
+                        help="Longest a request waits for its encode micro-batch to fill")
+    parser.add_argument("--max-hops", type=int, default=1, help="Default max_hops for queries that do not set it")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    session = ReasonerSession(RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH)
+    service = ReasonerService(session, args.search_threads, args.max_batch, args.max_latency_ms,
+                              defaults={"max_hops": args.max_hops})
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
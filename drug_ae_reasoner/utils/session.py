@@ -0,0 +1,246 @@
+import os
+import logging
+from typing import List, Tuple, Set, Dict
+from ..config import (RX_PATH, CADEC_KG_PATH, OAE_INDEX_PATH, OAE_LABEL_MAP_PATH, OAE_GRAPH_PATH, OAE_CLOSURE_PATH,
+                      CADEC_OAE_MAP_PATH)
+from ..data.rxnorm_loader import load_rxnorm, match_input_cuis, require_input_cuis
+from ..data.rxnorm_index import RxNormIndex, index_dir_for, is_index_current
+from ..data.csr_graph import load_graph
+from ..data.cadec_loader import find_cadec_drug_nodes, collect_cadec_ae_pairs
+from .similarity_search import load_oae_index, search_cadec_ae_oae_mapping, search_input_ae_oae_list
+from .path_reasoner import (PathIndex, top_drug_to_input_ae_paths,
+                            generate_fallback_drug_paths, generate_fallback_ae_paths)
+from .verbalizer import iter_path_records, verbalize_drug_to_input_ae_paths
+from .reachability import ReachabilityIndex
+from .cadec_oae_map import CadecOAEMap
+from .profiling import span, count
+from . import result_cache as results
+
+logger = logging.getLogger(__name__)
+
+def rank_drugs(query_results: Dict[str, tuple]) -> List[Tuple[str, bool, int, float]]:
+    """
+    Order drugs by how well their top paths explain the input AEs: connected first,
+    then by the number of distinct input AEs reached, then by the best path score.
+    Ties keep the input order.
+    """
+    rows = []
+    for drug, (connected, top_paths, *_) in query_results.items():
+        covered = len({inp_label for _, inp_label, _, _ in top_paths})
+        rows.append((drug, connected, covered, top_paths[0][3] if top_paths else None))
+    return sorted(rows, key=lambda r: (not r[1], -r[2], -(r[3] if r[3] is not None else float("-inf"))))
+
+def render_result(drug: str, top_paths, fb_drug, fb_ae, context, index: PathIndex = None):
+    """
+    The `query` tuple for `drug` from a result cache entry: `_search`'s paths and the
+    (CADEC pairs, CADEC AE -> OAE, input AE -> OAE) context. Paths and verbalizations
+    name the caller's drug, whichever spelling of it the entry was stored under.
+    """
+    top_paths = [(drug,) + tuple(p[1:]) for p in top_paths]
+    fb_drug = [(drug,) + tuple(p[1:]) for p in fb_drug]
+    cadec_pairs, cadec_ae_oae, oae_input = context
+    index = index or PathIndex(cadec_ae_oae, oae_input, cadec_pairs)
+    with span("verbalize"):
+        verb = verbalize_drug_to_input_ae_paths(drug, cadec_pairs, cadec_ae_oae, oae_input,
+                                                top_paths or fb_drug + fb_ae, index)
+    return bool(top_paths), top_paths, fb_drug, fb_ae, verb
+
+class ReasonerSession:
+    """
+    Holds the RxNorm map, CADEC KG, FAISS index, OAE labels and OAE graph in memory
+    so that many queries can be answered without reloading the artifacts.
+    """
+
+    def __init__(self, rx_path: str = RX_PATH, cadec_kg_path: str = CADEC_KG_PATH,
+                 oae_index_path: str = OAE_INDEX_PATH, oae_label_map_path: str = OAE_LABEL_MAP_PATH,
+                 oae_graph_path: str = OAE_GRAPH_PATH, oae_closure_path: str = OAE_CLOSURE_PATH,
+                 cadec_oae_map_path: str = CADEC_OAE_MAP_PATH):
+        # Stamped before loading, so a rebuild racing the load can only make the stamp stale, never wrong
+        self.artifact_stamp = results.artifact_stamp(rx_path, cadec_kg_path, oae_index_path, oae_label_map_path,
+                                                     oae_graph_path)
+        index_dir = index_dir_for(rx_path)
+        with span("load.rxnorm"):
+            if is_index_current(index_dir, rx_path):
+                self.rx_index, self.rx_map = RxNormIndex.load(index_dir), None
+            else:
+                self.rx_index, self.rx_map = None, load_rxnorm(rx_path)
+        with span("load.cadec_kg"):
+            self.cadec_kg = load_graph(cadec_kg_path)
+        with span("load.oae_index"):
+            self.oae_index, self.oae_labels = load_oae_index(oae_index_path, oae_label_map_path)
+        with span("load.oae_graph"):
+            self.oae_graph = load_graph(oae_graph_path)
+        self.oae_reach = None
+        if oae_closure_path and os.path.isdir(oae_closure_path):
+            with span("load.oae_closure"):
+                reach = ReachabilityIndex.load(oae_closure_path)
+            if reach.matches(self.oae_graph):
+                self.oae_reach = reach
+            else:
+                logger.warning(f"Ignoring stale OAE closure at {oae_closure_path}")
+        self.cadec_oae_map = None
+        if cadec_oae_map_path and os.path.isdir(cadec_oae_map_path):
+            with span("load.cadec_oae_map"):
+                cadec_map = CadecOAEMap.load(cadec_oae_map_path)
+            if cadec_map.is_current(oae_index_path, oae_label_map_path):
+                self.cadec_oae_map = cadec_map
+            else:
+                logger.warning(f"Ignoring stale CADEC AE -> OAE map at {cadec_oae_map_path}; rebuild it with build_cadec_oae_map")
+        logger.info("Reasoner session ready")
+
+    def get_input_cuis(self, drug: str) -> Set[str]:
+        with span("rxnorm.lookup"):
+            if self.rx_index is not None:
+                return require_input_cuis(drug, self.rx_index.lookup(drug))
+            return match_input_cuis(drug, self.rx_map)
+
+    def get_cadec_drug_nodes(self, drug: str) -> List[Tuple[str, str, Set[str]]]:
+        cuis = self.get_input_cuis(drug)
+        with span("cadec.drug_nodes"):
+            return find_cadec_drug_nodes(cuis, self.cadec_kg)
+
+    def get_cadec_ae_pairs(self, drug_nodes: List[Tuple[str, str, Set[str]]]) -> List[Tuple[str, str, str]]:
+        with span("cadec.ae_pairs"):
+            return collect_cadec_ae_pairs(drug_nodes, self.cadec_kg)
+
+    def online_cadec_labels(self, ae_cadec_list: List[str], n_cadec: int = 5,
+                            cadec_ae_threshold: float = 0.7) -> List[str]:
+        """The CADEC AE labels that the precomputed map cannot answer and must be encoded and searched."""
+        if self.cadec_oae_map is None or not self.cadec_oae_map.covers(n_cadec, cadec_ae_threshold):
+            return list(ae_cadec_list)
+        return [ae for ae in ae_cadec_list if ae not in self.cadec_oae_map]
+
+    def build_cadec_ae_oae_mapping(self, ae_cadec_list: List[str], n_cadec: int = 5,
+                                   cadec_ae_threshold: float = 0.7) -> Dict[str, List[Tuple[str, float]]]:
+        online = self.online_cadec_labels(ae_cadec_list, n_cadec, cadec_ae_threshold)
+        count("cadec_oae_map.hit", len(ae_cadec_list) - len(online))
+        count("cadec_oae_map.miss", len(online))
+        with span("search.cadec_ae_oae", labels=len(ae_cadec_list)):
+            if len(online) == len(ae_cadec_list):
+                return search_cadec_ae_oae_mapping(ae_cadec_list, self.oae_index, self.oae_labels,
+                                                   n_cadec, cadec_ae_threshold)
+            found = self.cadec_oae_map.lookup(ae_cadec_list, self.oae_labels, n_cadec, cadec_ae_threshold)
+            found.update(search_cadec_ae_oae_mapping(online, self.oae_index, self.oae_labels, n_cadec,
+                                                     cadec_ae_threshold))
+            return {ae: found[ae] for ae in ae_cadec_list}
+
+    def build_input_ae_oae_list(self, ae_input_list: List[str], n_input: int = 5,
+                                input_ae_threshold: float = 0.7) -> List[Tuple[str, str, float]]:
+        with span("search.input_ae_oae", labels=len(ae_input_list)):
+            return search_input_ae_oae_list(ae_input_list, self.oae_index, self.oae_labels,
+                                            n_input, input_ae_threshold)
+
+    def drug_context(self, drug: str, n_cadec: int = 5, cadec_ae_threshold: float = 0.7, cadec_pairs=None):
+        """The drug-dependent half of a query: (CADEC drug->AE pairs, CADEC AE -> OAE candidates)."""
+        if cadec_pairs is None:
+            cadec_pairs = self.get_cadec_ae_pairs(self.get_cadec_drug_nodes(drug))
+        ae_cadec_list = sorted({ae for _, ae, _ in cadec_pairs})
+        return cadec_pairs, self.build_cadec_ae_oae_mapping(ae_cadec_list, n_cadec, cadec_ae_threshold)
+
+    def _search(self, drug, ae_input_list, n_cadec, cadec_ae_threshold,
+                n_input, input_ae_threshold, n_paths, n_disconnect, max_hops, drug_ctx=None, oae_input=None):
+        cadec_pairs, cadec_ae_oae = drug_ctx or self.drug_context(drug, n_cadec, cadec_ae_threshold)
+        if oae_input is None:
+            oae_input = self.build_input_ae_oae_list(ae_input_list, n_input, input_ae_threshold)
+        with span("paths.top_k", max_hops=max_hops):
+            index = PathIndex(cadec_ae_oae, oae_input, cadec_pairs)
+            top_paths = top_drug_to_input_ae_paths(drug, cadec_ae_oae, oae_input, self.oae_graph, n_paths,
+                                                   max_hops, self.oae_reach, index)
+        if top_paths:
+            fb_drug, fb_ae = [], []
+        else:
+            with span("paths.fallback"):
+                fb_drug = generate_fallback_drug_paths(drug, cadec_pairs, cadec_ae_oae, n_disconnect)
+                fb_ae = generate_fallback_ae_paths(ae_input_list, cadec_pairs, cadec_ae_oae, oae_input,
+                                                   n_disconnect, index)
+        return top_paths, fb_drug, fb_ae, (cadec_pairs, cadec_ae_oae, oae_input, index)
+
+    def query(self, drug, ae_input_list, n_cadec=5, cadec_ae_threshold=0.7,
+              n_input=5, input_ae_threshold=0.7, n_paths=5, n_disconnect=3, max_hops=1):
+        """
+        (connected, top_paths, fallback_drug, fallback_ae, verbalizations). While
+        `result_cache.result_cache` is set, the search is cached under the query's key
+        (see `result_cache.lookup`) and only the verbalization is redone on a hit.
+        """
+        params = dict(n_cadec=n_cadec, cadec_ae_threshold=cadec_ae_threshold, n_input=n_input,
+                      input_ae_threshold=input_ae_threshold, n_paths=n_paths, n_disconnect=n_disconnect,
+                      max_hops=max_hops)
+        key, entry = self.cached_result(drug, ae_input_list, params)
+        if entry is not None:
+            return render_result(drug, *entry)
+        return self._query(drug, list(ae_input_list), key=key, **params)
+
+    def cached_result(self, drug: str, ae_input_list: List[str], params: Dict[str, object]):
+        """(cache key, cached entry for `render_result` or None) for a query against this session's artifacts."""
+        return results.lookup(drug, ae_input_list, params, self.artifact_stamp)
+
+    def remember_result(self, key, found):
+        """Cache `_search`'s output, less the path index, under `key`."""
+        top_paths, fb_drug, fb_ae, context = found
+        results.store(key, (top_paths, fb_drug, fb_ae, context[:3]))
+
+    def _query(self, drug, ae_input_list, n_cadec, cadec_ae_threshold,
+               n_input, input_ae_threshold, n_paths, n_disconnect, max_hops, drug_ctx=None, oae_input=None,
+               key=None):
+        with span("query"):
+            found = self._search(drug, ae_input_list, n_cadec, cadec_ae_threshold, n_input, input_ae_threshold,
+                                 n_paths, n_disconnect, max_hops, drug_ctx, oae_input)
+            self.remember_result(key, found)
+            top_paths, fb_drug, fb_ae, context = found
+            return render_result(drug, top_paths, fb_drug, fb_ae, context[:3], context[3])
+
+    def query_many(self, drugs, ae_input_list, n_cadec=5, cadec_ae_threshold=0.7,
+                   n_input=5, input_ae_threshold=0.7, n_paths=5, n_disconnect=3, max_hops=1):
+        """
+        Answer `query(drug, ae_input_list)` for every drug in `drugs` at once: the input
+        AEs are encoded and searched once, and the union of the drugs' CADEC AEs is
+        mapped to OAE in one pass. Returns a dict with
+          results: drug -> the `query` tuple, in input order
+          errors:  drug -> message, for drugs with no RxNorm match
+          ranking: [(drug, connected, covered input AEs, best path score)], best first
+        """
+        params = dict(n_cadec=n_cadec, cadec_ae_threshold=cadec_ae_threshold, n_input=n_input,
+                      input_ae_threshold=input_ae_threshold, n_paths=n_paths, n_disconnect=n_disconnect,
+                      max_hops=max_hops)
+        drugs, aes = list(dict.fromkeys(drugs)), list(ae_input_list)
+        found, errors, pending = {}, {}, {}
+        for drug in drugs:
+            key, hit = self.cached_result(drug, aes, params)
+            if hit is not None:
+                found[drug] = render_result(drug, *hit)
+                continue
+            try:
+                pending[drug] = (key, self.get_cadec_ae_pairs(self.get_cadec_drug_nodes(drug)))
+            except ValueError as e:
+                errors[drug] = str(e)
+
+        if pending:
+            cadec_aes = sorted({ae for _, pairs in pending.values() for _, ae, _ in pairs})
+            mapping = self.build_cadec_ae_oae_mapping(cadec_aes, n_cadec, cadec_ae_threshold)
+            oae_input = self.build_input_ae_oae_list(aes, n_input, input_ae_threshold)
+            for drug, (key, pairs) in pending.items():
+                drug_ctx = (pairs, {ae: mapping[ae] for ae in sorted({ae for _, ae, _ in pairs})})
+                found[drug] = self._query(drug, aes, drug_ctx=drug_ctx, oae_input=oae_input, key=key, **params)
+
+        ordered = {drug: found[drug] for drug in drugs if drug in found}
+        return {"results": ordered, "errors": errors, "ranking": rank_drugs(ordered)}
+
+    def iter_query_records(self, drug, ae_input_list, n_cadec=5, cadec_ae_threshold=0.7,
+                           n_input=5, input_ae_threshold=0.7, n_paths=5, n_disconnect=3, max_hops=1,
+                           drug_ctx=None):
+        """
+        Like `query`, but yield one structured record per path (see `iter_path_records`)
+        instead of building the narrative strings. Each record also carries `connected`
+        and `kind` ("path", "fallback_drug" or "fallback_ae"). `drug_ctx` lets callers
+        answering several AE lists for one drug pass a precomputed `drug_context`.
+        """
+        with span("query"):
+            top_paths, fb_drug, fb_ae, context = self._search(drug, ae_input_list, n_cadec, cadec_ae_threshold,
+                                                              n_input, input_ae_threshold, n_paths,
+                                                              n_disconnect, max_hops, drug_ctx)
+        groups = [("path", top_paths)] if top_paths else [("fallback_drug", fb_drug), ("fallback_ae", fb_ae)]
+        for kind, paths in groups:
+            for record in iter_path_records(drug, *context[:3], paths, context[3]):
+                record["connected"] = bool(top_paths)
+                record["kind"] = kind
+                yield record
@@ -1,46 +1,67 @@
 import pickle
 from typing import List, Tuple, Dict
 import numpy as np
-import faiss
-from ..utils.encoding import encode_text
+from ..utils.encoding import encode_batch
+from ..utils.profiling import span
+from .oae_index import apply_search_params, load_index_meta, similarities
 
-def build_cadec_ae_oae_mapping(ae_cadec_list: List[str], index_path: str, label_map_path: str,
-                                n_cadec: int = 5, cadec_ae_threshold: float = 0.7) -> Dict[str, List[Tuple[str, float]]]:
+def load_oae_index(index_path: str, label_map_path: str, **search_params):
+    """
+    Load the FAISS index and its label list. Search-time knobs (`nprobe`, `ef_search`)
+    come from the index metadata unless given here.
+    """
+    import faiss
     index = faiss.read_index(index_path)
+    apply_search_params(index, load_index_meta(index_path) or {}, **search_params)
     with open(label_map_path, 'rb') as f:
         oae_labels = pickle.load(f)
+    return index, oae_labels
+
+def search_oae(ae_labels: List[str], index, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    q = np.ascontiguousarray(encode_batch(ae_labels), dtype=np.float32)
+    with span("faiss.search", queries=len(ae_labels), k=k):
+        D, I = index.search(q, k)
+    sims = similarities(index, D)
+    return sims, I
+
+def build_cadec_ae_oae_mapping(ae_cadec_list: List[str], index_path: str, label_map_path: str,
+                                n_cadec: int = 5, cadec_ae_threshold: float = 0.7) -> Dict[str, List[Tuple[str, float]]]:
+    index, oae_labels = load_oae_index(index_path, label_map_path)
+    return search_cadec_ae_oae_mapping(ae_cadec_list, index, oae_labels, n_cadec, cadec_ae_threshold)
 
-    mapping = {}
-    for ae_label in ae_cadec_list:
-        vec = encode_text(ae_label)
-        q = np.array([vec.astype('float32')])
-        D, I = index.search(q, n_cadec)
-        sims = 1.0 - D[0] / 2.0
-        results = [(oae_labels[idx], float(sim)) for sim, idx in zip(sims, I[0]) if sim >= cadec_ae_threshold]
-        mapping[ae_label] = results
+def search_cadec_ae_oae_mapping(ae_cadec_list: List[str], index, oae_labels: List[str],
+                                n_cadec: int = 5, cadec_ae_threshold: float = 0.7) -> Dict[str, List[Tuple[str, float]]]:
+    mapping: Dict[str, List[Tuple[str, float]]] = {ae_label: [] for ae_label in ae_cadec_list}
+    if not ae_cadec_list:
+        return mapping
+    sims, I = search_oae(ae_cadec_list, index, n_cadec)
+    keep = (sims >= cadec_ae_threshold) & (I >= 0)
+
+    # Duplicate labels keep the result of their last occurrence, as before
+    last_row = {ae_label: row for row, ae_label in enumerate(ae_cadec_list)}
+    rows, cols = np.nonzero(keep)
+    for row, idx, sim in zip(rows.tolist(), I[rows, cols].tolist(), sims[rows, cols].tolist()):
+        ae_label = ae_cadec_list[row]
+        if last_row[ae_label] == row:
+            mapping[ae_label].append((oae_labels[idx], sim))
     return mapping
 
 def build_input_ae_oae_list(ae_input_list: List[str], index_path: str, label_map_path: str,
                             n_input: int = 5, input_ae_threshold: float = 0.7) -> List[Tuple[str, str, float]]:
-    index = faiss.read_index(index_path)
-    with open(label_map_path, 'rb') as f:
-        oae_labels = pickle.load(f)
+    index, oae_labels = load_oae_index(index_path, label_map_path)
+    return search_input_ae_oae_list(ae_input_list, index, oae_labels, n_input, input_ae_threshold)
+
+def search_input_ae_oae_list(ae_input_list: List[str], index, oae_labels: List[str],
+                             n_input: int = 5, input_ae_threshold: float = 0.7) -> List[Tuple[str, str, float]]:
+    if not ae_input_list:
+        return []
+    sims, I = search_oae(ae_input_list, index, n_input + 1)
+    hit_labels = np.array([oae_labels[idx] if idx >= 0 else None for idx in I.ravel().tolist()],
+                          dtype=object).reshape(I.shape)
+    queries = np.array(ae_input_list, dtype=object)[:, None]
+    keep = (sims >= input_ae_threshold) & (I >= 0) & (hit_labels != queries)
+    keep &= np.cumsum(keep, axis=1) <= n_input
 
-    oae_input_list = []
-    for ae_label in ae_input_list:
-        vec = encode_text(ae_label)
-        q = np.array([vec.astype('float32')])
-        D, I = index.search(q, n_input + 1)
-        sims = 1.0 - D[0] / 2.0
-        count = 0
-        for sim, idx in zip(sims, I[0]):
-            if sim < input_ae_threshold:
-                continue
-            oae_label = oae_labels[idx]
-            if oae_label == ae_label:
-                continue
-            oae_input_list.append((ae_label, oae_label, float(sim)))
-            count += 1
-            if count >= n_input:
-                break
-    return oae_input_list
+    rows, cols = np.nonzero(keep)
+    return [(ae_input_list[row], oae_label, sim)
+            for row, oae_label, sim in zip(rows.tolist(), hit_labels[rows, cols].tolist(), sims[rows, cols].tolist())]
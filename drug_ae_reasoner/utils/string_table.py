@@ -0,0 +1,53 @@
+import numpy as np
+from typing import Iterable, Iterator, List
+
+class StringTable:
+    """
+    Immutable list of strings stored as one UTF-8 byte blob plus an offsets array,
+    so it can be saved with numpy and loaded back through mmap without unpickling.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def save(self, prefix: str):
+        np.save(f"{prefix}_blob.npy", self.blob)
+        np.save(f"{prefix}_offsets.npy", self.offsets)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "StringTable":
+        mode = "r" if mmap else None
+        return cls(np.load(f"{prefix}_blob.npy", mmap_mode=mode),
+                   np.load(f"{prefix}_offsets.npy", mmap_mode=mode))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_bytes(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.get_bytes(i).decode("utf-8")
+
+    def take(self, ids) -> List[str]:
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return []
+        starts = self.offsets[ids]
+        ends = self.offsets[ids + 1]
+        lo = int(starts.min())
+        data = self.blob[lo:int(ends.max())].tobytes()
+        return [data[a - lo:b - lo].decode("utf-8") for a, b in zip(starts.tolist(), ends.tolist())]
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
@@ -1,44 +1,65 @@
-from typing import List, Tuple, Dict
+from typing import Dict, Iterable, Iterator, List, Tuple
+from .path_reasoner import PathIndex
+
+FALLBACK_CADEC_AE = "__fallback_ae__"
+
+def iter_path_records(drug_input: str,
+                      cadec_pairs: List[Tuple[str, str, str]],
+                      cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
+                      oae_input_list: List[Tuple[str, str, float]],
+                      top_paths: Iterable[Tuple[str, str, List[str], float]],
+                      index: PathIndex = None) -> Iterator[Dict[str, object]]:
+    """
+    Yield one JSON-serializable record per path: the drug, CADEC AE, OAE path and
+    input AE, plus every hop as {source, relation, target[, sim]} and the path score.
+    """
+    index = index or PathIndex(cadec_ae_oae_dict, oae_input_list, cadec_pairs)
+    for drug_lbl, inp_lbl, path, score in top_paths:
+        oae_from, oae_to = path[0], path[-1]
+        ae_cadec, sim1 = index.first_cadec.get(oae_from, (FALLBACK_CADEC_AE, 0.0))
+        cui_str = index.cui_map.get(ae_cadec, "N/A")
+        sim2 = index.input_sim.get((inp_lbl, oae_to), 0.0)
+        hops = [
+            {"source": drug_input, "relation": "normalizes_to", "target": drug_lbl, "cuis": cui_str},
+            {"source": drug_lbl, "relation": "causes", "target": ae_cadec},
+            {"source": ae_cadec, "relation": "is_similar_to", "target": oae_from, "sim": float(sim1)},
+        ]
+        for prev, nxt in zip(path, path[1:]):
+            hops.append({"source": prev, "relation": "relates_to", "target": nxt})
+        hops.append({"source": oae_to, "relation": "is_similar_to", "target": inp_lbl, "sim": float(sim2)})
+        yield {
+            "drug_input": drug_input,
+            "cadec_drug": drug_lbl,
+            "cadec_ae": ae_cadec,
+            "input_ae": inp_lbl,
+            "oae_path": list(path),
+            "hops": hops,
+            "score": float(score),
+        }
+
+def render_path_record(record: Dict[str, object]) -> str:
+    lines = []
+    for hop in record["hops"]:
+        if hop["relation"] == "normalizes_to":
+            lines.append(f"{hop['source']} normalizes_to CADEC_drug {hop['target']} via CUI(s)({hop['cuis']})")
+        elif hop["relation"] == "relates_to":
+            lines.append(f"{hop['source']} relates_to {hop['target']} (in OAE)")
+        elif "sim" in hop:
+            lines.append(f"{hop['source']} {hop['relation']} {hop['target']} (sim={hop['sim']:.2f})")
+        else:
+            lines.append(f"{hop['source']} {hop['relation']} {hop['target']}")
+    lines.append(f"# total path score = {record['score']:.2f}")
+    return "; ".join(lines)
+
+def iter_verbalized_paths(drug_input, cadec_pairs, cadec_ae_oae_dict, oae_input_list, top_paths,
+                          index: PathIndex = None) -> Iterator[str]:
+    for record in iter_path_records(drug_input, cadec_pairs, cadec_ae_oae_dict, oae_input_list, top_paths, index):
+        yield render_path_record(record)
 
 def verbalize_drug_to_input_ae_paths(drug_input: str,
                                      cadec_pairs: List[Tuple[str, str, str]],
                                      cadec_ae_oae_dict: Dict[str, List[Tuple[str, float]]],
                                      oae_input_list: List[Tuple[str, str, float]],
-                                     top_paths: List[Tuple[str, str, List[str], float]]) -> List[str]:
-    cui_map = {ae: cui for _, ae, cui in cadec_pairs}
-    cadec_sim = {(ae, oae): sim for ae, lst in cadec_ae_oae_dict.items() for oae, sim in lst}
-    input_sim = {(inp, oae): sim for inp, oae, sim in oae_input_list}
-    narratives = []
-    for drug_lbl, inp_lbl, path, score in top_paths:
-        if len(path) < 2:
-            ae_cadec = next((ae for ae, lst in cadec_ae_oae_dict.items() if any(o == path[0] for o, _ in lst)),"__fallback_ae__")
-            cui_str = cui_map.get(ae_cadec, "N/A")
-            
-            sim_to_input = input_sim.get((inp_lbl, path[0]), 0.0)
-            narratives.append("; ".join([
-                f"{drug_input} normalizes_to CADEC_drug {drug_lbl} via CUI(s)({cui_str})",
-                f"{drug_lbl} causes {ae_cadec}",
-                f"{ae_cadec} is_similar_to {path[0]} (sim={cadec_sim[(ae_cadec, path[0])]:.2f})",
-                f"{path[0]} is_similar_to {inp_lbl} (sim={sim_to_input:.2f})",
-                f"# total path score = {score:.2f}"
-            ]))
-            continue
-        oae_from, oae_to = path[0], path[-1]
-        middle = path[1:-1]
-        ae_cadec = next(ae for ae, lst in cadec_ae_oae_dict.items() if any(o == oae_from for o, _ in lst))
-        cui_str = cui_map[ae_cadec]
-        sim1 = cadec_sim.get((ae_cadec, path[0]), 0.0)
-        sim2 = input_sim.get((inp_lbl, oae_to), 0.0)
-        lines = [
-            f"{drug_input} normalizes_to CADEC_drug {drug_lbl} via CUI(s)({cui_str})",
-            f"{drug_lbl} causes {ae_cadec}",
-            f"{ae_cadec} is_similar_to {oae_from} (sim={sim1:.2f})"
-        ]
-        prev = oae_from
-        for nxt in middle + [oae_to]:
-            lines.append(f"{prev} relates_to {nxt} (in OAE)")
-            prev = nxt
-        lines.append(f"{oae_to} is_similar_to {inp_lbl} (sim={sim2:.2f})")
-        lines.append(f"# total path score = {score:.2f}")
-        narratives.append("; ".join(lines))
-    return narratives
+                                     top_paths: List[Tuple[str, str, List[str], float]],
+                                     index: PathIndex = None) -> List[str]:
+    return list(iter_verbalized_paths(drug_input, cadec_pairs, cadec_ae_oae_dict, oae_input_list, top_paths, index))
@@ -1,4 +1,5 @@
 import networkx as nx
+import io
 import os
 
 # Note: The `pickle` import was in the notebook's main/example usage, 
@@ -37,69 +38,115 @@ def extract_spans(tokens, col_index):
         spans.append((" ".join(current_span), current_tag))
     return spans
 
-def process_doc(doc_id, tokens, G):
+def cadec_doc_graph(doc_id, tokens):
     """
-    Process a single document from the CADEC file.
-    
-    Extracts spans from the ADR column (index 1) and Drug column (index 3).
-    If no drug span is found, uses the document ID’s prefix (e.g. "LIPITOR") as the drug.
-    Adds nodes and edges (both directions) to the graph G.
-    
-    The PMID is set to the full document ID (e.g., "LIPITOR.408" or "ARTHROTEC.36").
+    Nodes and edges of a single CADEC document, in the order `process_doc` adds them.
+    Returns ([(node, attrs), ...], [(u, v, relation), ...]).
     """
-    pmid = doc_id
     adr_spans = extract_spans(tokens, 1)
     drug_spans = extract_spans(tokens, 3)
-    
+
     if not drug_spans:
         fallback_drug = doc_id.split(".")[0]
         drug_spans = [(fallback_drug, None)]
-    
-    for drug_text, tag in drug_spans:
-        drug_node = f"drug_{drug_text.lower()}"
-        if drug_node not in G:
-            G.add_node(drug_node, label=drug_text, type="drug", doc=doc_id)
-    for adr_text, tag in adr_spans:
-        adr_node = f"adr_{adr_text.lower()}"
-        if adr_node not in G:
-            G.add_node(adr_node, label=adr_text, type="adverse_effect", doc=doc_id)
-    
+
+    nodes = [(f"drug_{drug_text.lower()}", dict(label=drug_text, type="drug", doc=doc_id))
+             for drug_text, _ in drug_spans]
+    nodes += [(f"adr_{adr_text.lower()}", dict(label=adr_text, type="adverse_effect", doc=doc_id))
+              for adr_text, _ in adr_spans]
+
+    edges = []
     for drug_text, _ in drug_spans:
         drug_node = f"drug_{drug_text.lower()}"
         for adr_text, _ in adr_spans:
             adr_node = f"adr_{adr_text.lower()}"
-            G.add_edge(drug_node, adr_node, relation="causes", pmid=pmid)
-            G.add_edge(adr_node, drug_node, relation="adr_of", pmid=pmid)
+            edges.append((drug_node, adr_node, "causes"))
+            edges.append((adr_node, drug_node, "adr_of"))
+    return nodes, edges
 
-def read_cadec_documents(filepath):
+def process_doc(doc_id, tokens, G):
     """
-    Read CADEC file and return a list of (doc_id, tokens) pairs.
-    Each document is represented as (doc_id, list_of_tokens).
+    Process a single document from the CADEC file.
+    
+    Extracts spans from the ADR column (index 1) and Drug column (index 3).
+    If no drug span is found, uses the document ID’s prefix (e.g. "LIPITOR") as the drug.
+    Adds nodes and edges (both directions) to the graph G.
+    
+    The PMID is set to the full document ID (e.g., "LIPITOR.408" or "ARTHROTEC.36").
+    """
+    nodes, edges = cadec_doc_graph(doc_id, tokens)
+    for node, attrs in nodes:
+        if node not in G:
+            G.add_node(node, **attrs)
+    for u, v, relation in edges:
+        G.add_edge(u, v, relation=relation, pmid=doc_id)
+
+def _iter_cadec_records(lines):
+    """
+    Parse CADEC lines (bytes, as read from a binary file) into (start, end, doc_id, tokens),
+    where [start, end) is the byte range that re-parses to exactly that document.
     """
-    documents = []
     doc_id = None
     tokens = []
-    
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                if doc_id is not None and tokens:
-                    documents.append((doc_id, tokens))
-                doc_id = None
+    start = None
+    pos = 0
+    for raw in lines:
+        line = raw.decode("utf-8").strip()
+        if not line:
+            if doc_id is not None and tokens:
+                yield start, pos, doc_id, tokens
+            doc_id = None
+            tokens = []
+            start = None
+        elif "\t" not in line:
+            if doc_id is not None and tokens:
+                yield start, pos, doc_id, tokens
                 tokens = []
-            elif "\t" not in line:
-                if doc_id is not None and tokens:
-                    documents.append((doc_id, tokens))
-                    tokens = []
-                doc_id = line.strip()
-            else:
-                parts = line.split("\t")
-                if len(parts) >= 6: # Ensure enough parts before appending
-                    tokens.append(parts)
-        if doc_id is not None and tokens: # Process the last document
-            documents.append((doc_id, tokens))
-    return documents
+                start = None
+            doc_id = line.strip()
+            start = pos if start is None else start
+        else:
+            parts = line.split("\t")
+            if len(parts) >= 6: # Ensure enough parts before appending
+                tokens.append(parts)
+                # Tokens seen before a header are kept by the next document
+                start = pos if start is None else start
+        pos += len(raw)
+    if doc_id is not None and tokens: # Process the last document
+        yield start, pos, doc_id, tokens
+
+def iter_cadec_documents(filepath):
+    """
+    Stream (doc_id, tokens) pairs from a CADEC file, one document in memory at a time.
+    """
+    with open(filepath, "rb") as f:
+        for _, _, doc_id, tokens in _iter_cadec_records(f):
+            yield doc_id, tokens
+
+def read_cadec_documents(filepath):
+    """
+    Read CADEC file and return a list of (doc_id, tokens) pairs.
+    Each document is represented as (doc_id, list_of_tokens).
+    """
+    return list(iter_cadec_documents(filepath))
+
+def index_cadec_documents(filepath):
+    """
+    Byte (start, end) span of every document in a CADEC file, in file order,
+    so documents can be shuffled and sharded without holding their tokens.
+    """
+    with open(filepath, "rb") as f:
+        return [(start, end) for start, end, _, _ in _iter_cadec_records(f)]
+
+def read_cadec_spans(filepath, spans):
+    """
+    Yield the (doc_id, tokens) pair at each byte span from `index_cadec_documents`.
+    """
+    with open(filepath, "rb") as f:
+        for start, end in spans:
+            f.seek(start)
+            for _, _, doc_id, tokens in _iter_cadec_records(io.BytesIO(f.read(end - start))):
+                yield doc_id, tokens
 
 def build_cadec_kg_from_docs(documents):
     """
@@ -128,6 +175,52 @@ def dedupe_cadec(G):
             H.add_edge(u, v, **data)
     return H
 
+class CadecKGBuilder:
+    """
+    Accumulates CADEC documents into ordered node and edge tables, keeping one edge
+    per unique (u, v, relation, pmid) as edges arrive, so the duplicate graph that
+    `dedupe_cadec` filters is never built. Builders for consecutive shards can be
+    merged in order; `to_graph` then gives the same graph as
+    `dedupe_cadec(build_cadec_kg_from_docs(documents))`.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        # u -> v -> {(relation, pmid): None}, in first-insertion order
+        self.adj = {}
+
+    def add_doc(self, doc_id, tokens):
+        nodes, edges = cadec_doc_graph(doc_id, tokens)
+        for node, attrs in nodes:
+            self.nodes.setdefault(node, attrs)
+        for u, v, relation in edges:
+            self.adj.setdefault(u, {}).setdefault(v, {})[(relation, doc_id)] = None
+
+    def add_docs(self, documents):
+        for doc_id, tokens in documents:
+            self.add_doc(doc_id, tokens)
+        return self
+
+    def merge(self, other):
+        """Append a builder for the documents that follow this one's."""
+        for node, attrs in other.nodes.items():
+            self.nodes.setdefault(node, attrs)
+        for u, targets in other.adj.items():
+            mine = self.adj.setdefault(u, {})
+            for v, keys in targets.items():
+                mine.setdefault(v, {}).update(keys)
+        return self
+
+    def to_graph(self):
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(self.nodes.items())
+        # Edges go in node order, as `dedupe_cadec` copies them; tables are released as we go
+        for u in self.nodes:
+            for v, keys in self.adj.pop(u, {}).items():
+                for relation, pmid in keys:
+                    G.add_edge(u, v, relation=relation, pmid=pmid)
+        return G
+
 def list_all_unique_drugs(G):
     """
     Returns a sorted list of unique drug names (by their label) in the KG.
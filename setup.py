@@ -8,6 +8,7 @@ setup(
     install_requires=[
         "sentence-transformers",
         "numpy",
+        "scipy",
         "faiss-cpu",
         "networkx",
     ],